@@ -1,200 +1,228 @@
-from datetime import datetime
-from textwrap import shorten
-from typing import Optional, Union
-
-import discord
-from discord.abc import Messageable
-from discord.errors import Forbidden
-from discord.ext.commands import Bot, Cog, Context, check, command, is_owner
-from discord.utils import get
-
-from config import CONFIG
-from database import Afk as DbAfk
-from database import User as DbUser
-from database import get_user
-
-
-def afk_access(ctx: Context) -> bool:
-    return any(
-        role.id in (CONFIG.guild.roles.afk_access, CONFIG.guild.roles.staff)
-        for role in ctx.author.roles
-    )
-
-
-class AfkCog(Cog, name='AFK'):
-    def __init__(self, bot: Bot):
-        self.bot = bot
-
-    @command(name='afk')
-    @check(afk_access)
-    async def afk_command(self, ctx: Context, *, reason: str) -> None:
-        """Marks you as AFK
-
-        Shows the given reason (shortened to 75 characters) when someone mentions you in Sunset City and adds `[AFK]` to your nickname
-
-        AFK status is automatically removed when you start typing or send a message in our server
-        """
-        reason = shorten(reason, 75, placeholder='...')
-
-        account = get_user(ctx.author.id)
-        afk = DbAfk(reason=reason, old_nick=ctx.author.nick)
-
-        try:
-            await ctx.author.edit(nick='[AFK] ' + ctx.author.display_name)
-        except Forbidden:
-            pass
-
-        account.afk = afk
-        account.save()
-
-        embed = discord.Embed(
-            title='You have been marked AFK', color=discord.Color.blurple()
-        )
-        embed.add_field(name='Reason', value=reason)
-        embed.set_footer(
-            text='This will be cleared automatically when you start typing in '
-            'Sunset City'
-        )
-
-        await ctx.send(embed=embed, delete_after=5)
-        await ctx.message.delete()
-
-    @command(name='removeafk')
-    @is_owner()
-    async def remove_afk(self, ctx: Context, user: discord.Member) -> None:
-        await self.remove_afk_if_needed(get_user(user.id), user, ctx.channel)
-        await ctx.message.add_reaction('✅')
-
-    async def remove_afk_if_needed(
-        self,
-        account: DbUser,
-        user: discord.Member,
-        channel: Optional[discord.TextChannel] = None,
-    ) -> None:
-        if account.afk is None:
-            return
-
-        if channel is None:
-            channel = self.bot.get_channel(CONFIG.guild.channels.chat)
-
-        try:
-            await user.edit(nick=account.afk.old_nick)
-        except Forbidden:
-            pass
-
-        await channel.send(
-            user.mention,
-            embed=discord.Embed(
-                title='Your AFK status has been removed',
-                color=discord.Color.blurple(),
-            ),
-            delete_after=4,
-        )
-
-        del account.afk
-        account.save()
-
-    @Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
-        if message.author.bot:
-            return
-
-        from_account = get_user(message.author.id)
-
-        if from_account is not None:
-            await self.remove_afk_if_needed(
-                from_account, message.author, message.channel
-            )
-
-        for mentioned_user in message.mentions:
-            if (
-                mentioned_user.bot
-                or self.bot.get_user(mentioned_user.id) is None
-            ):
-                return
-
-            mentioned_account = get_user(mentioned_user.id)
-
-            if (
-                mentioned_account is not None
-                and mentioned_account.afk is not None
-            ):
-                old_name = (
-                    mentioned_account.afk.old_nick
-                    if mentioned_account.afk.old_nick is not None
-                    else mentioned_user.name
-                )
-
-                embed = discord.Embed(
-                    title=f'{old_name} is currently AFK',
-                    color=discord.Color.gold(),
-                )
-                embed.add_field(
-                    name='Reason', value=mentioned_account.afk.reason
-                )
-                await message.reply(embed=embed, delete_after=8)
-
-    @Cog.listener()
-    async def on_typing(
-        self,
-        channel: Messageable,
-        user: Union[discord.User, discord.Member],
-        when: datetime,
-    ) -> None:
-        if user.bot or type(user) != discord.Member:
-            return
-
-        from_account = get_user(user.id)
-
-        if from_account is not None:
-            await self.remove_afk_if_needed(from_account, user, channel)
-
-    @Cog.listener()
-    async def on_raw_reaction_add(
-        self, payload: discord.RawReactionActionEvent
-    ) -> None:
-        user = self.bot.get_user(payload.user_id)
-
-        if user.bot or payload.member is None:
-            return
-
-        from_account = get_user(user.id)
-
-        if from_account is not None:
-            await self.remove_afk_if_needed(from_account, payload.member)
-
-    @Cog.listener()
-    async def on_user_update(
-        self, before: discord.User, after: discord.User
-    ) -> None:
-        member = get(self.bot.guilds, id=CONFIG.guild.id).get_member(after.id)
-
-        if member is None:
-            return
-
-        if member.bot:
-            return
-
-        from_account = get_user(member.id)
-
-        if from_account is not None:
-            await self.remove_afk_if_needed(from_account, member)
-
-    @Cog.listener()
-    async def on_invite_create(self, invite: discord.Invite) -> None:
-        user = self.bot.guilds[0].get_member(invite.inviter.id)
-
-        if user is None:
-            return
-
-        if user.bot:
-            return
-
-        from_account = get_user(user.id)
-
-        if from_account is not None:
-            await self.remove_afk_if_needed(from_account, user)
-
-
-def setup(bot: Bot) -> None:
-    bot.add_cog(AfkCog(bot))
+from datetime import datetime
+from textwrap import shorten
+from typing import Dict, Optional, Set, Union
+
+import discord
+from discord.abc import Messageable
+from discord.errors import Forbidden
+from discord.ext.commands import Bot, Cog, Context, check, command, is_owner
+from discord.utils import get
+
+from config import CONFIG
+from database import Afk as DbAfk
+from database import User as DbUser
+from pipeline import PIPELINE, MessageContext
+from profiles import PROFILES
+from repository import get_user, run_sync, update_user
+
+
+def afk_access(ctx: Context) -> bool:
+    return any(
+        role.id in (CONFIG.guild.roles.afk_access, CONFIG.guild.roles.staff)
+        for role in ctx.author.roles
+    )
+
+
+class AfkCog(Cog, name='AFK'):
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+        # Nearly nobody is AFK, so every listener checks this registry
+        # before touching the database
+        self.afk_users: Dict[int, DbAfk] = {}
+        # Users whose status was removed while the registry was loading,
+        # which the load mustn't bring back
+        self._removed_while_loading: Optional[Set[int]] = set()
+        self.bot.loop.create_task(self.load_afk_users())
+        PIPELINE.register('afk', self.process_message)
+
+    def cog_unload(self) -> None:
+        PIPELINE.unregister('afk')
+
+    async def load_afk_users(self) -> None:
+        # pylint: disable=no-member
+
+        accounts = await run_sync(
+            lambda: list(DbUser.objects(afk__exists=True).only('afk'))
+        )
+
+        removed, self._removed_while_loading = (
+            self._removed_while_loading,
+            None,
+        )
+
+        for account in accounts:
+            if account.id not in removed:
+                self.afk_users.setdefault(account.id, account.afk)
+
+    @command(name='afk')
+    @check(afk_access)
+    async def afk_command(self, ctx: Context, *, reason: str) -> None:
+        """Marks you as AFK
+
+        Shows the given reason (shortened to 75 characters) when someone mentions you in Sunset City and adds `[AFK]` to your nickname
+
+        AFK status is automatically removed when you start typing or send a message in our server
+        """
+        reason = shorten(reason, 75, placeholder='...')
+
+        account = await get_user(ctx.author.id)
+        afk = DbAfk(reason=reason, old_nick=ctx.author.nick)
+
+        try:
+            await ctx.author.edit(nick='[AFK] ' + ctx.author.display_name)
+        except Forbidden:
+            pass
+
+        await update_user(account, afk=afk)
+        self.afk_users[ctx.author.id] = afk
+        PROFILES.invalidate(ctx.author.id)
+
+        embed = discord.Embed(
+            title='You have been marked AFK', color=discord.Color.blurple()
+        )
+        embed.add_field(name='Reason', value=reason)
+        embed.set_footer(
+            text='This will be cleared automatically when you start typing in '
+            'Sunset City'
+        )
+
+        await ctx.send(embed=embed, delete_after=5)
+        await ctx.message.delete()
+
+    @command(name='removeafk')
+    @is_owner()
+    async def remove_afk(self, ctx: Context, user: discord.Member) -> None:
+        if user.id not in self.afk_users:
+            # The registry may still be loading, or may have missed it
+            account = await get_user(user.id)
+
+            if account.afk is not None:
+                self.afk_users.setdefault(user.id, account.afk)
+
+        await self.remove_afk_if_needed(user, ctx.channel)
+        await ctx.message.add_reaction('✅')
+
+    async def remove_afk_if_needed(
+        self,
+        user: discord.Member,
+        channel: Optional[discord.TextChannel] = None,
+    ) -> None:
+        # Popping first keeps simultaneous events from removing it twice
+        afk = self.afk_users.pop(user.id, None)
+
+        if afk is None:
+            return
+
+        if self._removed_while_loading is not None:
+            self._removed_while_loading.add(user.id)
+
+        if channel is None:
+            channel = self.bot.get_channel(CONFIG.guild.channels.chat)
+
+        try:
+            await user.edit(nick=afk.old_nick)
+        except Forbidden:
+            pass
+
+        await channel.send(
+            user.mention,
+            embed=discord.Embed(
+                title='Your AFK status has been removed',
+                color=discord.Color.blurple(),
+            ),
+            delete_after=4,
+        )
+
+        await update_user(await get_user(user.id), afk=None)
+        PROFILES.invalidate(user.id)
+
+    async def process_message(self, context: MessageContext) -> None:
+        if context.is_bot:
+            return
+
+        message = context.message
+
+        await self.remove_afk_if_needed(context.author, message.channel)
+
+        for mentioned_user in context.mentions:
+            afk = self.afk_users.get(mentioned_user.id)
+
+            if afk is not None:
+                old_name = (
+                    afk.old_nick
+                    if afk.old_nick is not None
+                    else mentioned_user.name
+                )
+
+                embed = discord.Embed(
+                    title=f'{old_name} is currently AFK',
+                    color=discord.Color.gold(),
+                )
+                embed.add_field(name='Reason', value=afk.reason)
+                await message.reply(embed=embed, delete_after=8)
+
+    @Cog.listener()
+    async def on_typing(
+        self,
+        channel: Messageable,
+        user: Union[discord.User, discord.Member],
+        when: datetime,
+    ) -> None:
+        if user.id not in self.afk_users:
+            return
+
+        if user.bot or type(user) != discord.Member:
+            return
+
+        await self.remove_afk_if_needed(user, channel)
+
+    @Cog.listener()
+    async def on_raw_reaction_add(
+        self, payload: discord.RawReactionActionEvent
+    ) -> None:
+        if payload.user_id not in self.afk_users:
+            return
+
+        user = self.bot.get_user(payload.user_id)
+
+        if user.bot or payload.member is None:
+            return
+
+        await self.remove_afk_if_needed(payload.member)
+
+    @Cog.listener()
+    async def on_user_update(
+        self, before: discord.User, after: discord.User
+    ) -> None:
+        if after.id not in self.afk_users:
+            return
+
+        member = get(self.bot.guilds, id=CONFIG.guild.id).get_member(after.id)
+
+        if member is None:
+            return
+
+        if member.bot:
+            return
+
+        await self.remove_afk_if_needed(member)
+
+    @Cog.listener()
+    async def on_invite_create(self, invite: discord.Invite) -> None:
+        if invite.inviter.id not in self.afk_users:
+            return
+
+        user = self.bot.guilds[0].get_member(invite.inviter.id)
+
+        if user is None:
+            return
+
+        if user.bot:
+            return
+
+        await self.remove_afk_if_needed(user)
+
+
+def setup(bot: Bot) -> None:
+    bot.add_cog(AfkCog(bot))
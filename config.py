@@ -1,5 +1,44 @@
-from pathlib import Path
-from dynamic_yaml import load
-
-with (Path(__file__).parent / 'config.yaml').open() as f:
-    CONFIG = load(f)
+from pathlib import Path
+from typing import Any, Dict
+
+from dynamic_yaml import load
+
+# Tuning settings that config.yaml doesn't have to set
+DEFAULTS = {
+    'database': {
+        'pool_size': 20,
+        'connect_timeout': 5,  # seconds
+        'socket_timeout': 10,  # seconds
+        'server_selection_timeout': 5,  # seconds
+        'user_cache': {
+            'max_size': 5000,
+            'ttl': 300,  # seconds
+        },
+    },
+    'guild': {
+        'greeting_window': 5,  # seconds
+    },
+    'xp': {
+        'flush_interval': 5,  # seconds
+        'flush_threshold': 500,
+    },
+}
+
+
+def set_defaults(config: Any, defaults: Dict[str, Any]) -> None:
+    """Fills in every setting the config leaves out, section by section"""
+
+    for key, value in defaults.items():
+        if isinstance(value, dict):
+            # The section is read back, since dynamic_yaml wraps it once
+            # it's stored
+            config.setdefault(key, {})
+            set_defaults(config[key], value)
+        else:
+            config.setdefault(key, value)
+
+
+with (Path(__file__).parent / 'config.yaml').open() as f:
+    CONFIG = load(f)
+
+set_defaults(CONFIG, DEFAULTS)
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Hashable, Optional
+
+
+class Cooldowns:
+    """Tracks which users are on cooldown, without a size limit
+
+    Every cooldown lasts the same amount of time, so keys are inserted in
+    the order they expire. Expired keys are swept off the front of the
+    ordered dict whenever a key is checked, which keeps memory bounded by
+    the number of users active within one cooldown period and makes every
+    check amortized O(1).
+    """
+
+    def __init__(
+        self, duration: float, clock: Callable[[], float] = monotonic
+    ):
+        self.duration = duration
+        self.clock = clock
+        self._expiry: 'OrderedDict[Hashable, float]' = OrderedDict()
+
+    def __len__(self) -> int:
+        self.sweep()
+        return len(self._expiry)
+
+    def __contains__(self, key: Hashable) -> bool:
+        expiry = self._expiry.get(key)
+        return expiry is not None and expiry > self.clock()
+
+    def sweep(self, now: Optional[float] = None) -> None:
+        """Removes every cooldown that has expired"""
+
+        if now is None:
+            now = self.clock()
+
+        expiry = self._expiry
+
+        while expiry:
+            key, expires = next(iter(expiry.items()))
+
+            if expires > now:
+                break
+
+            del expiry[key]
+
+    def hit(self, key: Hashable) -> bool:
+        """Starts a cooldown for a key unless it's already on one
+
+        Returns whether the key was already on cooldown. Checking and
+        starting the cooldown happen together, so two messages handled
+        back to back can't both get through.
+        """
+
+        now = self.clock()
+        self.sweep(now)
+
+        if key in self._expiry:
+            return True
+
+        self._expiry[key] = now + self.duration
+        return False
@@ -1,60 +1,240 @@
-from asyncio import get_event_loop
-from datetime import datetime
-from functools import cache
-
-import mongoengine
-from discord import Guild, Member
-
-from config import CONFIG
-
-mongoengine.connect(host=CONFIG.secrets.mongodb_url)
-
-
-@cache
-def level_to_xp(level: int) -> int:
-    return (level ** 3) + (level * 15)
-
-
-class Afk(mongoengine.EmbeddedDocument):
-    reason = mongoengine.StringField()
-    old_nick = mongoengine.StringField()
-
-    meta = {'strict': False}
-
-
-class User(mongoengine.Document):
-    user_id = mongoengine.IntField(primary_key=True)
-    xp = mongoengine.IntField(default=0, min_value=0)
-    afk = mongoengine.EmbeddedDocumentField(Afk, default=None)
-
-    meta = {'strict': False}
-
-    @property
-    def level(self) -> int:
-        result = 0
-
-        while True:
-            if self.xp >= level_to_xp(result + 1):
-                result += 1
-            else:
-                break
-
-        return result
-
-
-def get_user(user_id: int) -> User:
-    account = User.objects.with_id(user_id)   # pylint: disable=no-member
-
-    if account is not None:
-        return account
-
-    return User(user_id=user_id).save()
-
-
-class Topic(mongoengine.Document):
-    content = mongoengine.StringField()
-    thumbnail = mongoengine.URLField()
-    credit = mongoengine.StringField()
-    thumbnail_approved = mongoengine.BooleanField()
-
-    meta = {'strict': False}
+from asyncio import get_event_loop
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from functools import cache, partial
+from threading import Lock
+from time import monotonic
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import mongoengine
+from discord import Guild, Member
+from mongoengine.queryset.visitor import Q
+
+from config import CONFIG
+from leaderboard import LEADERBOARD
+
+mongoengine.connect(
+    host=CONFIG.secrets.mongodb_url,
+    maxPoolSize=CONFIG.database.pool_size,
+    connectTimeoutMS=CONFIG.database.connect_timeout * 1000,
+    socketTimeoutMS=CONFIG.database.socket_timeout * 1000,
+    serverSelectionTimeoutMS=CONFIG.database.server_selection_timeout * 1000,
+)
+
+
+@cache
+def level_to_xp(level: int) -> int:
+    return (level ** 3) + (level * 15)
+
+
+# Level 10,000 needs just over a trillion XP, so every realistic account
+# is covered by the table; anything above it falls back to counting up.
+MAX_TABLE_LEVEL = 10_000
+
+# LEVEL_THRESHOLDS[n] is the total XP needed to reach level n + 1
+LEVEL_THRESHOLDS: List[int] = [
+    level_to_xp(level) for level in range(1, MAX_TABLE_LEVEL + 1)
+]
+
+_table_level = partial(bisect_right, LEVEL_THRESHOLDS)
+
+
+def _count_up_level(xp: int, start: int) -> int:
+    result = start
+
+    while xp >= level_to_xp(result + 1):
+        result += 1
+
+    return result
+
+
+def xp_to_level(xp: int) -> int:
+    level = _table_level(xp)
+
+    if level == MAX_TABLE_LEVEL:
+        return _count_up_level(xp, level)
+
+    return level
+
+
+def xp_to_levels(xp_values: Iterable[int]) -> List[int]:
+    """Computes the levels for many XP values in a single pass"""
+
+    xp_values = list(xp_values)
+    levels = list(map(_table_level, xp_values))
+
+    if MAX_TABLE_LEVEL in levels:
+        return [
+            level
+            if level < MAX_TABLE_LEVEL
+            else _count_up_level(xp, level)
+            for xp, level in zip(xp_values, levels)
+        ]
+
+    return levels
+
+
+class Afk(mongoengine.EmbeddedDocument):
+    reason = mongoengine.StringField()
+    old_nick = mongoengine.StringField()
+
+    meta = {'strict': False}
+
+
+class UserCache:
+    """A thread-safe LRU cache of `User` documents whose entries expire
+
+    Queries run on the repository's thread pool, so every access is
+    guarded by a lock.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[int, Tuple[float, User]]' = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional['User']:
+        with self._lock:
+            entry = self._entries.get(user_id)
+
+            if entry is None or monotonic() - entry[0] > self.ttl:
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, account: 'User') -> None:
+        with self._lock:
+            self._entries[account.pk] = (monotonic(), account)
+            self._entries.move_to_end(account.pk)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+USER_CACHE = UserCache(
+    CONFIG.database.user_cache.max_size, CONFIG.database.user_cache.ttl
+)
+
+
+class User(mongoengine.Document):
+    user_id = mongoengine.IntField(primary_key=True)
+    xp = mongoengine.IntField(default=0, min_value=0)
+    afk = mongoengine.EmbeddedDocumentField(Afk, default=None)
+
+    meta = {
+        'strict': False,
+        'auto_create_index': False,
+        'indexes': [
+            # Leaderboard order, also used as the keyset pagination cursor
+            {'fields': ['-xp', '+user_id']},
+            # Only AFK users are indexed
+            {
+                'fields': ['afk'],
+                'partialFilterExpression': {'afk': {'$exists': True}},
+            },
+        ],
+    }
+
+    @property
+    def level(self) -> int:
+        return xp_to_level(self.xp)
+
+    def save(self, *args, **kwargs) -> 'User':
+        result = super().save(*args, **kwargs)
+        USER_CACHE.put(self)
+        return result
+
+    def delete(self, *args, **kwargs) -> None:
+        super().delete(*args, **kwargs)
+        USER_CACHE.invalidate(self.pk)
+        LEADERBOARD.remove(self.pk)
+
+
+def get_user(user_id: int) -> User:
+    account = USER_CACHE.get(user_id)
+
+    if account is not None:
+        return account
+
+    # pylint: disable=no-member
+
+    # Creates the account in the same round trip if it doesn't exist yet
+    account = User.objects(user_id=user_id).modify(
+        upsert=True, new=True, set_on_insert__xp=0
+    )
+    USER_CACHE.put(account)
+
+    return account
+
+
+class Topic(mongoengine.Document):
+    content = mongoengine.StringField()
+    thumbnail = mongoengine.URLField()
+    credit = mongoengine.StringField()
+    thumbnail_approved = mongoengine.BooleanField()
+
+    meta = {
+        'strict': False,
+        'auto_create_index': False,
+        'indexes': [
+            # Only topics with a photo waiting for review are indexed
+            {
+                'fields': ['thumbnail_approved', 'id'],
+                'partialFilterExpression': {
+                    'thumbnail': {'$exists': True},
+                    'thumbnail_approved': False,
+                },
+            },
+        ],
+    }
+
+
+def ensure_indexes() -> None:
+    User.ensure_indexes()
+    Topic.ensure_indexes()
+
+
+# Every query the bot runs often, for auditing their plans with explain()
+HOT_QUERIES: Dict[str, Callable[[], mongoengine.QuerySet]] = {
+    # pylint: disable=no-member
+    'User by ID': lambda: User.objects(user_id=0),
+    'Leaderboard': lambda: User.objects.order_by('-xp', '+user_id').limit(10),
+    'Leaderboard page': lambda: User.objects(
+        Q(xp__lt=0) | Q(xp=0, user_id__gt=0)
+    )
+    .order_by('-xp', '+user_id')
+    .limit(10),
+    'AFK users': lambda: User.objects(afk__exists=True).only('afk'),
+    'Unapproved photos': lambda: Topic.objects(
+        thumbnail__exists=True, thumbnail_approved=False
+    )
+    .order_by('id')
+    .limit(5),
+}
+
+
+def plan_stages(plan: dict) -> List[str]:
+    """Flattens an explain() plan into its stage names, outermost first"""
+
+    stages = [plan['stage']]
+
+    for child in [plan.get('inputStage'), *plan.get('inputStages', ())]:
+        if child is not None:
+            stages.extend(plan_stages(child))
+
+    return stages
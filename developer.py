@@ -1,39 +1,112 @@
-from discord import TextChannel
-from discord.ext.commands import Bot, Cog, Context, command
-
-
-class DeveloperCog(Cog, name='Developer'):
-    def __init__(self, bot: Bot):
-        self.bot = bot
-
-    async def cog_check(self, ctx: Context) -> bool:
-        return await self.bot.is_owner(ctx.author)
-
-    @command()
-    async def load(self, ctx: Context, extension: str) -> None:
-        """Loads an extension"""
-        self.bot.load_extension(extension)
-        await ctx.message.add_reaction('✅')
-
-    @command()
-    async def unload(self, ctx: Context, extension: str) -> None:
-        """Unloads an extension"""
-        self.bot.unload_extension(extension)
-        await ctx.message.add_reaction('✅')
-
-    @command(name='reload')
-    async def reload_(self, ctx: Context, extension: str) -> None:
-        """Reloads an extension"""
-        self.bot.reload_extension(extension)
-        await ctx.message.add_reaction('✅')
-
-    @command()
-    async def say(
-        self, ctx: Context, channel: TextChannel, *, message: str
-    ) -> None:
-        await channel.send(message)
-        await ctx.message.add_reaction('✅')
-
-
-def setup(bot: Bot) -> None:
-    bot.add_cog(DeveloperCog(bot))
+from discord import Color, Embed, TextChannel
+from discord.ext.commands import Bot, Cog, Context, command
+
+from database import HOT_QUERIES, USER_CACHE, plan_stages
+from pipeline import PIPELINE
+from repository import run_sync
+
+
+class DeveloperCog(Cog, name='Developer'):
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+    async def cog_check(self, ctx: Context) -> bool:
+        return await self.bot.is_owner(ctx.author)
+
+    @command()
+    async def load(self, ctx: Context, extension: str) -> None:
+        """Loads an extension"""
+        self.bot.load_extension(extension)
+        self.bot.dispatch('extensions_changed')
+        await ctx.message.add_reaction('✅')
+
+    @command()
+    async def unload(self, ctx: Context, extension: str) -> None:
+        """Unloads an extension"""
+        self.bot.unload_extension(extension)
+        self.bot.dispatch('extensions_changed')
+        await ctx.message.add_reaction('✅')
+
+    @command(name='reload')
+    async def reload_(self, ctx: Context, extension: str) -> None:
+        """Reloads an extension"""
+        self.bot.reload_extension(extension)
+        self.bot.dispatch('extensions_changed')
+        await ctx.message.add_reaction('✅')
+
+    @command()
+    async def say(
+        self, ctx: Context, channel: TextChannel, *, message: str
+    ) -> None:
+        await channel.send(message)
+        await ctx.message.add_reaction('✅')
+
+    @command(name='cachestats')
+    async def cache_stats(self, ctx: Context) -> None:
+        """Shows user cache statistics"""
+
+        lookups = USER_CACHE.hits + USER_CACHE.misses
+        hit_rate = USER_CACHE.hits / lookups if lookups else 0
+
+        embed = Embed(title='User Cache', color=Color.blurple())
+        embed.add_field(
+            name='Size',
+            value=f'{len(USER_CACHE):,}/{USER_CACHE.max_size:,}',
+        )
+        embed.add_field(name='Hits', value=f'{USER_CACHE.hits:,}')
+        embed.add_field(name='Misses', value=f'{USER_CACHE.misses:,}')
+        embed.add_field(name='Hit Rate', value=f'{hit_rate:.1%}')
+
+        await ctx.reply(embed=embed)
+
+    @command(name='indexaudit')
+    async def index_audit(self, ctx: Context) -> None:
+        """Explains every hot query and flags collection scans"""
+
+        embed = Embed(title='Index Audit', color=Color.green())
+
+        for name, query in HOT_QUERIES.items():
+            explanation = await run_sync(query().explain)
+
+            stages = plan_stages(explanation['queryPlanner']['winningPlan'])
+            stats = explanation.get('executionStats', {})
+
+            if 'COLLSCAN' in stages:
+                embed.color = Color.red()
+                name = f'⚠️ {name}'
+
+            embed.add_field(
+                name=name,
+                value='`{}`\n{:,} ms, {:,} examined, {:,} returned'.format(
+                    ' ← '.join(stages),
+                    stats.get('executionTimeMillis', 0),
+                    stats.get('totalDocsExamined', 0),
+                    stats.get('nReturned', 0),
+                ),
+                inline=False,
+            )
+
+        await ctx.reply(embed=embed)
+
+    @command(name='pipelinestats')
+    async def pipeline_stats(self, ctx: Context) -> None:
+        """Shows how long each message stage takes"""
+
+        embed = Embed(title='Message Pipeline', color=Color.blurple())
+
+        for name, stats in PIPELINE.stats.items():
+            if name not in PIPELINE.stages:
+                name = f'{name} (unregistered)'
+
+            embed.add_field(
+                name=name,
+                value='{:,} messages\n{:.2f} ms mean, {:.2f} ms max'.format(
+                    stats.count, stats.mean * 1000, stats.max * 1000
+                ),
+            )
+
+        await ctx.reply(embed=embed)
+
+
+def setup(bot: Bot) -> None:
+    bot.add_cog(DeveloperCog(bot))
@@ -1,14 +1,35 @@
-from random import choice
-from typing import Optional
+from typing import AsyncIterator, Optional
 
+from bson import ObjectId
 from discord import Color, Embed
 from discord.ext.commands import Bot, Cog, Context, group, is_owner
 from discord.ext.commands.core import has_role
-from requests import patch
+from dislash import (
+    ActionRow,
+    Button,
+    ButtonStyle,
+    MessageInteraction,
+    ResponseType,
+)
 
 from config import CONFIG
 from database import Topic
-from utils import confirm_buttons, get_random_documents
+from interactions import INTERACTIONS, encode_custom_id
+from pagination import LinePaginator
+from repository import run_sync
+from topics import (
+    TOPIC_INDEX,
+    TOPIC_POOL,
+    load_topic_index,
+    pending_photos,
+    review_photos,
+)
+from unbelievaboat import UNBELIEVABOAT
+from utils import CANCEL_ACTION, min_max_int, reject_click
+
+# Discord only previews the first five links in a message
+REVIEW_BATCH_SIZE = 5
+REVIEW_ACTION = 'photos'
 
 
 def topic_embed(document: Topic, *, check_approval: bool = True):
@@ -30,16 +51,27 @@ def topic_embed(document: Topic, *, check_approval: bool = True):
     return embed
 
 
+def describe_photos(count: int) -> str:
+    return 'this photo' if count == 1 else f'these {count} photos'
+
+
 class FunCog(Cog, name='Fun'):
     def __init__(self, bot: Bot):
         self.bot = bot
+        INTERACTIONS.register(REVIEW_ACTION, self.review_clicked)
+
+        if not TOPIC_INDEX.loaded:
+            self.bot.loop.create_task(load_topic_index())
+
+    def cog_unload(self) -> None:
+        INTERACTIONS.unregister(REVIEW_ACTION)
 
     @group()
     async def topic(self, ctx: Context) -> None:
         """Displays a conversation starter"""
 
         if ctx.invoked_subcommand is None:
-            document = get_random_documents(Topic, 1)[0]
+            document = await TOPIC_POOL.get()
 
             await ctx.reply(embed=topic_embed(document))
 
@@ -50,9 +82,13 @@ class FunCog(Cog, name='Fun'):
 
         topics = topics_str.splitlines()
 
-        for topic in topics:
-            document = Topic(content=topic)
-            document.save()
+        documents = await run_sync(
+            Topic.objects.insert, [Topic(content=topic) for topic in topics]
+        )
+        TOPIC_POOL.add(document.id for document in documents)
+
+        for document in documents:
+            TOPIC_INDEX.add(document.id, document.content)
 
         await ctx.reply(
             embed=Embed(
@@ -66,15 +102,50 @@ class FunCog(Cog, name='Fun'):
     async def search_topics(self, ctx: Context, *, query: str) -> None:
         """Searches existing topics"""
 
-        # pylint: disable=no-member
+        if not TOPIC_INDEX.loaded:
+            await ctx.reply(
+                embed=Embed(
+                    title='The topic index is still loading.',
+                    color=Color.red(),
+                )
+            )
+            return
 
-        embed = Embed(
-            title=f'Search results for: {query}', color=Color.blurple()
+        async def results() -> AsyncIterator[str]:
+            for topic_id, content in TOPIC_INDEX.ranked(query):
+                yield f'**{content}**\n*{topic_id}*'
+
+        # Every match can be paged through, but only the pages that are
+        # looked at get ranked
+        await LinePaginator.paginate_stream(
+            results(),
+            ctx,
+            Embed(title=f'Search results for: {query}', color=Color.blurple()),
+            max_lines=10,
         )
-        for doc in Topic.objects(__raw__={'$text': {'$search': query}})[:10]:
-            embed.add_field(name=doc.content, value=f'*{doc.id}*')
 
-        await ctx.reply(embed=embed)
+    @topic.command(name='edit', aliases=['e'])
+    @is_owner()
+    async def edit_topic(
+        self, ctx: Context, topic_id: str, *, content: str
+    ) -> None:
+        """Changes the content of a topic"""
+
+        # pylint: disable=no-member
+
+        document = await run_sync(Topic.objects.with_id, topic_id)
+
+        if document is None:
+            await ctx.reply(
+                embed=Embed(title='Topic not found', color=Color.red())
+            )
+            return
+
+        document.content = content
+        await run_sync(document.save)
+        TOPIC_INDEX.add(document.id, content)
+
+        await ctx.reply(embed=topic_embed(document, check_approval=False))
 
     @topic.command(name='photo', aliases=['p'])
     @has_role(CONFIG.xp.roles['5'])
@@ -90,7 +161,7 @@ class FunCog(Cog, name='Fun'):
 
         # pylint: disable=no-member
 
-        document = Topic.objects.with_id(topic_id)
+        document = await run_sync(Topic.objects.with_id, topic_id)
 
         if document.thumbnail:
             await ctx.reply(
@@ -104,28 +175,28 @@ class FunCog(Cog, name='Fun'):
         document.credit = credit
         document.thumbnail_approved = False
 
-        document.save()
+        await run_sync(document.save)
 
-        patch(
-            f'https://unbelievaboat.com/api/v1/guilds/{CONFIG.guild.id}/users/{ctx.author.id}',
-            headers={'Authorization': CONFIG.secrets.unbelievaboat_auth},
-            json={'cash': 20, 'reason': 'topic photo'},
-        ).json()
+        await UNBELIEVABOAT.add_balance(
+            ctx.author.id, cash=20, reason='topic photo'
+        )
 
         await ctx.reply(embed=topic_embed(document, check_approval=False))
 
     @topic.command(name='unapproved', aliases=['u', 'up'])
     @is_owner()
-    async def unapproved_topic_photo(self, ctx: Context) -> None:
-        """Searches for a topic with an unapproved photo"""
+    async def unapproved_topic_photo(
+        self, ctx: Context, count: min_max_int(1, REVIEW_BATCH_SIZE) = 1
+    ) -> None:
+        """Reviews the oldest unapproved topic photos
 
-        # pylint: disable=no-member
+        Up to five photos can be reviewed at once, and are all approved or
+        rejected together.
+        """
 
-        results = Topic.objects(
-            thumbnail__exists=True, thumbnail_approved=False
-        )
+        documents = await pending_photos(count)
 
-        if not results:
+        if not documents:
             await ctx.reply(
                 embed=Embed(
                     title='No more unapproved photos!', color=Color.red()
@@ -133,23 +204,87 @@ class FunCog(Cog, name='Fun'):
             )
             return
 
-        document = choice(results)
-
-        await ctx.reply(embed=topic_embed(document, check_approval=False))
+        if len(documents) == 1:
+            await ctx.reply(
+                embed=topic_embed(documents[0], check_approval=False)
+            )
+        else:
+            # Discord previews every image link in the message content
+            await ctx.reply(
+                '\n'.join(
+                    f'`{index}.` {document.thumbnail}'
+                    for index, document in enumerate(documents, start=1)
+                ),
+                embed=Embed(
+                    title='Unapproved photos',
+                    description='\n'.join(
+                        f'`{index}.` **{document.content}** - '
+                        f"{document.credit or 'No credit'}"
+                        for index, document in enumerate(documents, start=1)
+                    ),
+                    color=Color.blurple(),
+                ),
+            )
 
-        msg, on_click = await confirm_buttons(
-            ctx, 'Would you like to approve this photo?'
+        # The photos being reviewed travel in the buttons' custom IDs
+        topic_ids = b''.join(document.id.binary for document in documents)
+        photos = describe_photos(len(documents))
+
+        await ctx.send(
+            components=[
+                ActionRow(
+                    Button(
+                        style=ButtonStyle.green,
+                        label='Approve',
+                        custom_id=encode_custom_id(
+                            REVIEW_ACTION, b'\x01' + topic_ids
+                        ),
+                    ),
+                    Button(
+                        style=ButtonStyle.red,
+                        label='Reject',
+                        custom_id=encode_custom_id(
+                            REVIEW_ACTION, b'\x00' + topic_ids
+                        ),
+                    ),
+                    Button(
+                        style=ButtonStyle.grey,
+                        label='Cancel',
+                        custom_id=encode_custom_id(
+                            CANCEL_ACTION, ctx.author.id.to_bytes(8, 'big')
+                        ),
+                    ),
+                )
+            ],
+            embed=Embed(
+                title=f'Would you like to approve {photos}?',
+                color=Color.blurple(),
+            ),
         )
 
-        @on_click.matching_id('yes_button')
-        async def on_yes_button(inter):
-            document.thumbnail_approved = True
-            document.save()
+    async def review_clicked(
+        self, inter: MessageInteraction, payload: bytes
+    ) -> None:
+        # Only owners can start a review, so only owners can finish one
+        if await reject_click(inter, await self.bot.is_owner(inter.author)):
+            return
 
-            await msg.edit(
-                embed=Embed(title='Photo approved', color=Color.green()),
-                components=[],
-            )
+        approve = payload[0] == 1
+        topic_ids = [
+            ObjectId(payload[index : index + 12])
+            for index in range(1, len(payload), 12)
+        ]
+        photos = describe_photos(len(topic_ids))
+
+        await review_photos(topic_ids, approve=approve)
+
+        await inter.create_response(
+            type=ResponseType.UpdateMessage,
+            components=[],
+            embed=Embed(title=f'Approved {photos}', color=Color.green())
+            if approve
+            else Embed(title=f'Rejected {photos}', color=Color.red()),
+        )
 
 
 def setup(bot: Bot) -> None:
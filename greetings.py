@@ -0,0 +1,219 @@
+import asyncio
+from collections import deque
+from math import inf
+from sys import stderr
+from time import monotonic
+from traceback import print_exception
+from typing import Deque, List, Optional
+
+from discord import Color, Embed, HTTPException, Member, TextChannel
+from discord.ext.commands import Bot
+
+from config import CONFIG
+
+# The welcomer role is pinged at most once in this long
+WELCOMER_PING_INTERVAL = 120  # seconds
+
+# New DMs are rate limited much more tightly than channel messages
+DM_INTERVAL = 1  # seconds
+
+MAX_MESSAGE_LENGTH = 2000
+SUNSET_PINK = Color.from_rgb(158, 0, 89)
+
+UNREACHABLE_SUFFIX = (
+    ' - I tried to DM you information about our appeals system but '
+    "wasn't able to reach you - try out `!appeal` in "
+    '<#805164652794609684> to get the link!'
+)
+
+
+def join_in_chunks(items: List[str], suffix: str = '') -> List[str]:
+    """Joins items into as few messages as fit Discord's length limit"""
+
+    messages = []
+    current = ''
+
+    for item in items:
+        if current and len(current) + len(item) + len(suffix) + 1 > (
+            MAX_MESSAGE_LENGTH
+        ):
+            messages.append(current)
+            current = item
+        else:
+            current = f'{current} {item}' if current else item
+
+    if current:
+        messages.append(current)
+
+    return messages
+
+
+def log_failure(task: asyncio.Task) -> None:
+    """Reports a background task's error, which would go unseen otherwise"""
+
+    if not task.cancelled() and task.exception() is not None:
+        error = task.exception()
+        print_exception(type(error), error, error.__traceback__, file=stderr)
+
+
+class Greeter:
+    """Welcomes and says goodbye to members in batches
+
+    Joins and leaves are collected for `CONFIG.guild.greeting_window`
+    seconds after the first one, then announced together, so a raid or
+    a promotion doesn't turn into hundreds of separate messages. Welcome
+    DMs go out one at a time from a background queue.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.window = CONFIG.guild.greeting_window
+        # The monotonic clock can start near zero, so the first welcome
+        # must not look like it came right after a ping
+        self.last_ping = -inf
+        self._joins: List[Member] = []
+        self._leaves: List[Member] = []
+        self._flush: Optional[asyncio.Task] = None
+        self._dms: Deque[Member] = deque()
+        self._dm_worker: Optional[asyncio.Task] = None
+        self._unreachable: List[Member] = []
+        self._chat: Optional[TextChannel] = None
+        self._welcome: Optional[Embed] = None
+        self._appeals: Optional[Embed] = None
+
+    @property
+    def chat(self) -> TextChannel:
+        if self._chat is None:
+            self._chat = self.bot.get_channel(CONFIG.guild.channels.chat)
+
+        return self._chat
+
+    @property
+    def welcome_embed(self) -> Embed:
+        if self._welcome is None:
+            self._welcome = Embed(
+                title='Welcome to Sunset City!',
+                description='We hope you enjoy your time here! Make sure to '
+                'read through <#805161020946382871> so you know about our '
+                '__rules__, __channels__, and other __important '
+                'information__.\n\nReact in <#805309185826881566> for pings '
+                'and other roles.',
+                color=SUNSET_PINK,
+            )
+            self._welcome.add_field(
+                name='Contact staff:',
+                value='Just send <@814371132059680799> a message! '
+                "We'll get back to you as soon as possible.",
+                inline=True,
+            )
+            self._welcome.add_field(
+                name='Information center:',
+                value='**[Click here](https://sunset.bsoyka.me)** to access '
+                'our server rules and more.',
+                inline=True,
+            )
+            self._welcome.set_thumbnail(url=str(self.chat.guild.icon_url))
+
+        return self._welcome
+
+    @property
+    def appeals_embed(self) -> Embed:
+        if self._appeals is None:
+            self._appeals = Embed(
+                title='Sunset City Punishment Appeals',
+                description='If you ever need to appeal a strike, mute, ban, '
+                'or giveaway blacklist, click the link above. Welcome to the '
+                'server!',
+                url='https://sunset.bsoyka.me/appeals',
+                color=SUNSET_PINK,
+            )
+            self._appeals.set_thumbnail(url=str(self.chat.guild.icon_url))
+
+        return self._appeals
+
+    def member_joined(self, member: Member) -> None:
+        self._joins.append(member)
+        self._dms.append(member)
+
+        if self._dm_worker is None or self._dm_worker.done():
+            self._dm_worker = asyncio.create_task(self._send_dms())
+            self._dm_worker.add_done_callback(log_failure)
+
+        self._schedule_flush()
+
+    def member_left(self, member: Member) -> None:
+        # Members who leave before they're welcomed aren't announced at all
+        if member in self._joins:
+            self._joins.remove(member)
+        else:
+            self._leaves.append(member)
+
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush is None or self._flush.done():
+            self._flush = asyncio.create_task(self._flush_later())
+            self._flush.add_done_callback(log_failure)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+
+        joins, self._joins = self._joins, []
+        leaves, self._leaves = self._leaves, []
+
+        if joins:
+            await self._welcome_members(joins)
+
+        if len(leaves) == 1:
+            member = leaves[0]
+            await self.chat.send(
+                f'{member.name}#{member.discriminator} has left us.'
+            )
+        elif leaves:
+            names = [
+                f'{member.name}#{member.discriminator}' for member in leaves
+            ]
+
+            for message in join_in_chunks(names, ' have left us.'):
+                await self.chat.send(f'{message} have left us.')
+
+    async def _welcome_members(self, members: List[Member]) -> None:
+        ping = ''
+
+        if monotonic() - self.last_ping > WELCOMER_PING_INTERVAL:
+            ping = f' **<@&{CONFIG.guild.roles.welcomer}>**'
+            self.last_ping = monotonic()
+
+        messages = join_in_chunks([member.mention for member in members], ping)
+
+        # The welcome embed and the ping go with the last message
+        for message in messages[:-1]:
+            await self.chat.send(message)
+
+        await self.chat.send(messages[-1] + ping, embed=self.welcome_embed)
+
+    async def _send_dms(self) -> None:
+        while self._dms:
+            member = self._dms.popleft()
+
+            # Skips members who left before their DM came up
+            if member.guild.get_member(member.id) is not None:
+                try:
+                    await member.send(
+                        "Welcome to Sunset City! Here's some information "
+                        'about our appeals system:',
+                        embed=self.appeals_embed,
+                    )
+                except HTTPException:
+                    self._unreachable.append(member)
+
+            if not self._dms and self._unreachable:
+                unreachable, self._unreachable = self._unreachable, []
+
+                for message in join_in_chunks(
+                    [member.mention for member in unreachable],
+                    UNREACHABLE_SUFFIX,
+                ):
+                    await self.chat.send(message + UNREACHABLE_SUFFIX)
+
+            await asyncio.sleep(DM_INTERVAL)
@@ -1,428 +1,836 @@
-import itertools
-from collections import namedtuple
-from contextlib import suppress
-from typing import List, Union
-
-from discord import Color, Embed
-from discord.ext import commands
-from fuzzywuzzy import fuzz, process
-from fuzzywuzzy.utils import full_process
-
-from config import CONFIG
-from pagination import LinePaginator
-
-COMMANDS_PER_PAGE = 8
-PREFIX = CONFIG.bot.prefix
-
-NOT_ALLOWED_TO_RUN_MESSAGE = '***You cannot run this command.***\n\n'
-
-Category = namedtuple('Category', ['name', 'description', 'cogs'])
-
-
-class HelpQueryNotFound(ValueError):
-    """
-    Raised when a HelpSession Query doesn't match a command or cog.
-
-    Contains the custom attribute of ``possible_matches``.
-
-    Instances of this object contain a dictionary of any command(s) that
-    were close to matching the query, where keys are the possible
-    matched command names and values are the likeness match scores.
-    """
-
-    def __init__(self, arg: str, possible_matches: dict = None):
-        super().__init__(arg)
-        self.possible_matches = possible_matches
-
-
-class CustomHelpCommand(commands.HelpCommand):
-    """
-    An interactive instance for the bot help command.
-
-    Cogs can be grouped into custom categories. All cogs with the same
-    category will be displayed under a single category name in the help
-    output. Custom categories are defined inside the cogs as a class
-    attribute named `category`. A description can also be specified with
-    the attribute `category_description`. If a description is not found
-    in at least one cog, the default will be the regular description
-    (class docstring) of the first cog found in the category.
-    """
-
-    def __init__(self):
-        super().__init__(command_attrs={'help': 'Shows help for bot commands'})
-
-    async def command_callback(
-        self, ctx: commands.Context, *, command: str = None
-    ) -> None:
-        """Attempts to match the provided query with a valid command or cog."""
-
-        # the only reason we need to tamper with this is because d.py does not support "categories",
-        # so we need to deal with them ourselves.
-
-        bot = ctx.bot
-
-        if command is None:
-            # quick and easy, send bot help if command is none
-            mapping = self.get_bot_mapping()
-            await self.send_bot_help(mapping)
-            return
-
-        cog_matches = []
-        description = None
-        for cog in bot.cogs.values():
-            if hasattr(cog, 'category') and cog.category == command:
-                cog_matches.append(cog)
-                if hasattr(cog, 'category_description'):
-                    description = cog.category_description
-
-        if cog_matches:
-            category = Category(
-                name=command, description=description, cogs=cog_matches
-            )
-            await self.send_category_help(category)
-            return
-
-        # it's either a cog, group, command or subcommand; let the parent class deal with it
-        await super().command_callback(ctx, command=command)
-
-    async def get_all_help_choices(self) -> set:
-        """
-        Get all the possible options for getting help in the bot.
-
-        This will only display commands the author has permission to run.
-
-        These include:
-        - Category names
-        - Cog names
-        - Group command names (and aliases)
-        - Command names (and aliases)
-        - Subcommand names (with parent group and aliases for
-          subcommand, but not including aliases for group)
-
-        Options and choices are case sensitive.
-        """
-
-        # first get all commands including subcommands and full command name aliases
-        choices = set()
-        for command in await self.filter_commands(
-            self.context.bot.walk_commands()
-        ):
-            # the the command or group name
-            choices.add(str(command))
-
-            if isinstance(command, commands.Command):
-                # all aliases if it's just a command
-                choices.update(command.aliases)
-            else:
-                # otherwise we need to add the parent name in
-                choices.update(
-                    f'{command.full_parent_name} {alias}'
-                    for alias in command.aliases
-                )
-
-        # all cog names
-        choices.update(self.context.bot.cogs)
-
-        # all category names
-        choices.update(
-            cog.category
-            for cog in self.context.bot.cogs.values()
-            if hasattr(cog, 'category')
-        )
-        return choices
-
-    async def command_not_found(self, string: str) -> 'HelpQueryNotFound':
-        """
-        Handles when a query does not match a valid command, group, cog
-        or category.
-
-        Will return an instance of the `HelpQueryNotFound` exception
-        with the error message and possible matches.
-        """
-
-        choices = await self.get_all_help_choices()
-
-        # Run fuzzywuzzy's processor beforehand, and avoid matching if processed string is empty
-        # This avoids fuzzywuzzy from raising a warning on inputs with only non-alphanumeric characters
-        processed = full_process(string)
-        if processed:
-            result = process.extractBests(
-                processed,
-                choices,
-                scorer=fuzz.ratio,
-                score_cutoff=60,
-                processor=None,
-            )
-        else:
-            result = []
-
-        return HelpQueryNotFound(f'Query "{string}" not found.', dict(result))
-
-    async def subcommand_not_found(
-        self, command: commands.Command, string: str
-    ) -> 'HelpQueryNotFound':
-        """
-        Redirects the error to `command_not_found`.
-
-        `command_not_found` deals with searching and getting best
-        choices for both commands and subcommands.
-        """
-
-        return await self.command_not_found(
-            f'{command.qualified_name} {string}'
-        )
-
-    async def send_error_message(self, error: HelpQueryNotFound) -> None:
-        """Send the error message to the channel."""
-
-        embed = Embed(colour=Color.red(), title=str(error))
-
-        if getattr(error, 'possible_matches', None):
-            matches = '\n'.join(
-                f'`{match}`' for match in error.possible_matches
-            )
-            embed.description = f'**Did you mean:**\n{matches}'
-
-        await self.context.send(embed=embed)
-
-    async def command_formatting(self, command: commands.Command) -> Embed:
-        """
-        Takes a command and turns it into an embed.
-
-        It will add an author, command signature + help, aliases and a
-        note if the user can't run the command.
-        """
-
-        embed = Embed()
-        embed.set_author(name='Command Help')
-
-        parent = command.full_parent_name
-
-        name = str(command) if not parent else f'{parent} {command.name}'
-        command_details = f'**```{PREFIX}{name} {command.signature}```**\n'
-
-        # show command aliases
-        aliases = [
-            f'`{alias}`' if not parent else f'`{parent} {alias}`'
-            for alias in command.aliases
-        ]
-        aliases += [
-            f'`{alias}`' for alias in getattr(command, 'root_aliases', ())
-        ]
-        aliases = ', '.join(sorted(aliases))
-        if aliases:
-            command_details += f'**Can also use:** {aliases}\n\n'
-
-        # when command is disabled, show message about it,
-        # when other CommandError or user is not allowed to run command,
-        # add this to help message.
-        try:
-            if not await command.can_run(self.context):
-                command_details += NOT_ALLOWED_TO_RUN_MESSAGE
-        except commands.DisabledCommand:
-            command_details += '***This command is disabled.***\n\n'
-        except commands.CommandError:
-            command_details += NOT_ALLOWED_TO_RUN_MESSAGE
-
-        command_details += f"*{command.help or 'No details provided.'}*\n"
-        embed.description = command_details
-
-        return embed
-
-    async def send_command_help(self, command: commands.Command) -> None:
-        """Send help for a single command."""
-
-        embed = await self.command_formatting(command)
-        await self.context.send(embed=embed)
-
-    @staticmethod
-    def get_commands_brief_details(
-        commands_: List[commands.Command], return_as_list: bool = False
-    ) -> Union[List[str], str]:
-        """
-        Formats the prefix, command name and signature, and short doc
-        for an iterable of commands.
-
-        return_as_list is helpful for passing these command details into
-        the paginator as a list of command details.
-        """
-
-        details = []
-        for command in commands_:
-            signature = f' {command.signature}' if command.signature else ''
-            details.append(
-                f"\n**`{PREFIX}{command.qualified_name}{signature}`**\n*{command.short_doc or 'No details provided'}*"
-            )
-        if return_as_list:
-            return details
-        else:
-            return ''.join(details)
-
-    async def send_group_help(self, group: commands.Group) -> None:
-        """Sends help for a group command."""
-
-        subcommands = group.commands
-
-        if len(subcommands) == 0:
-            # no subcommands, just treat it like a regular command
-            await self.send_command_help(group)
-            return
-
-        # remove commands that the user can't run and are hidden, and sort by name
-        commands_ = await self.filter_commands(subcommands, sort=True)
-
-        embed = await self.command_formatting(group)
-
-        command_details = self.get_commands_brief_details(commands_)
-        if command_details:
-            embed.description += f'\n**Subcommands:**\n{command_details}'
-
-        await self.context.send(embed=embed)
-
-    async def send_cog_help(self, cog: commands.Cog) -> None:
-        """Send help for a cog."""
-
-        # sort commands by name, and remove any the user can't run or are hidden.
-        commands_ = await self.filter_commands(cog.get_commands(), sort=True)
-
-        embed = Embed()
-        embed.set_author(name='Command Help')
-        embed.description = f'**{cog.qualified_name}**\n*{cog.description}*'
-
-        command_details = self.get_commands_brief_details(commands_)
-        if command_details:
-            embed.description += f'\n\n**Commands:**\n{command_details}'
-
-        await self.context.send(embed=embed)
-
-    @staticmethod
-    def _category_key(command: commands.Command) -> str:
-        """
-        Returns a cog name of a given command for use as a key for
-        `sorted` and `groupby`.
-
-        A zero width space is used as a prefix for results with no cogs
-        to force them last in ordering.
-        """
-
-        if not command.cog:
-            return '**\u200bNo Category:**'
-
-        with suppress(AttributeError):
-            if command.cog.category:
-                return f'**{command.cog.category}**'
-        return f'**{command.cog_name}**'
-
-    async def send_category_help(self, category: Category) -> None:
-        """
-        Sends help for a bot category.
-
-        This sends a brief help for all commands in all cogs registered
-        to the category.
-        """
-
-        embed = Embed()
-        embed.set_author(name='Command Help')
-
-        all_commands = []
-        for cog in category.cogs:
-            all_commands.extend(cog.get_commands())
-
-        filtered_commands = await self.filter_commands(all_commands, sort=True)
-
-        command_detail_lines = self.get_commands_brief_details(
-            filtered_commands, return_as_list=True
-        )
-        description = f'**{category.name}**\n*{category.description}*'
-
-        if command_detail_lines:
-            description += '\n\n**Commands:**'
-
-        await LinePaginator.paginate(
-            command_detail_lines,
-            self.context,
-            embed,
-            prefix=description,
-            max_lines=COMMANDS_PER_PAGE,
-            max_size=2000,
-        )
-
-    async def send_bot_help(self, mapping: dict) -> None:
-        """Sends help for all bot commands and cogs."""
-
-        bot = self.context.bot
-
-        embed = Embed()
-        embed.set_author(name='Command Help')
-
-        filter_commands = await self.filter_commands(
-            bot.commands, sort=True, key=self._category_key
-        )
-
-        cog_or_category_pages = []
-
-        for cog_or_category, _commands in itertools.groupby(
-            filter_commands, key=self._category_key
-        ):
-            sorted_commands = sorted(_commands, key=lambda c: c.name)
-
-            if len(sorted_commands) == 0:
-                continue
-
-            command_detail_lines = self.get_commands_brief_details(
-                sorted_commands, return_as_list=True
-            )
-
-            # Split cogs or categories which have too many commands to fit in one page.
-            # The length of commands is included for later use when aggregating into pages for the paginator.
-            for index in range(0, len(sorted_commands), COMMANDS_PER_PAGE):
-                truncated_lines = command_detail_lines[
-                    index : index + COMMANDS_PER_PAGE
-                ]
-                joined_lines = ''.join(truncated_lines)
-                cog_or_category_pages.append(
-                    (
-                        f'**{cog_or_category}**{joined_lines}',
-                        len(truncated_lines),
-                    )
-                )
-
-        pages = []
-        counter = 0
-        page = ''
-        for page_details, length in cog_or_category_pages:
-            counter += length
-            if counter > COMMANDS_PER_PAGE:
-                # force a new page on paginator even if it falls short of the max pages
-                # since we still want to group categories/cogs.
-                counter = length
-                pages.append(page)
-                page = f'{page_details}\n\n'
-            else:
-                page += f'{page_details}\n\n'
-
-        if page:
-            # add any remaining command help that didn't get added in the last iteration above.
-            pages.append(page)
-
-        await LinePaginator.paginate(
-            pages, self.context, embed=embed, max_lines=1, max_size=2000
-        )
-
-
-class HelpCog(commands.Cog, name='Help'):
-    """Custom Embed Pagination Help feature."""
-
-    def __init__(self, bot: commands.Bot) -> None:
-        self.bot = bot
-        self.old_help_command = bot.help_command
-        bot.help_command = CustomHelpCommand()
-        bot.help_command.cog = self
-
-    def cog_unload(self) -> None:
-        """Reset the help command when the cog is unloaded."""
-        self.bot.help_command = self.old_help_command
-
-
-def setup(bot):
-    bot.add_cog(HelpCog(bot))
+import itertools
+from collections import defaultdict, namedtuple
+from contextlib import suppress
+from difflib import SequenceMatcher
+from functools import partial
+from typing import (
+    Callable,
+    DefaultDict,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from discord import Color, Embed, Guild, Member, TextChannel
+from discord.ext import commands
+from fuzzywuzzy.utils import full_process
+
+from config import CONFIG
+from pagination import LinePaginator
+
+COMMANDS_PER_PAGE = 8
+PREFIX = CONFIG.bot.prefix
+
+NOT_ALLOWED_TO_RUN_MESSAGE = '***You cannot run this command.***\n\n'
+
+SUGGESTION_CUTOFF = 60
+MAX_SUGGESTIONS = 5
+MAX_PERMISSION_SETS = 1000
+MAX_CACHED_PAGES = 5000
+
+# Help pages are prerendered for what members of these roles can run
+STAFF_ROLES = (
+    CONFIG.guild.roles.staff,
+    CONFIG.guild.roles.moderator,
+    CONFIG.guild.roles.helper,
+)
+
+Category = namedtuple('Category', ['name', 'description', 'cogs'])
+
+# Whether the author is an owner, the channel ID and the author's roles
+PermissionKey = Tuple[bool, int, FrozenSet[int]]
+
+
+async def permission_key(ctx: commands.Context) -> PermissionKey:
+    """
+    Returns what the bot's command checks depend on for an author.
+
+    Every check in the bot only looks at owner status, roles and the
+    channel the command was used in, so two invocations with the same
+    key can always run the same commands.
+    """
+
+    return (
+        await ctx.bot.is_owner(ctx.author),
+        ctx.channel.id,
+        frozenset(role.id for role in getattr(ctx.author, 'roles', ())),
+    )
+
+
+def bigrams(text: str) -> Set[str]:
+    padded = f' {text.lower()} '
+    return {padded[i : i + 2] for i in range(len(padded) - 1)}
+
+
+class HelpPage(NamedTuple):
+    embed: Embed
+    # Pages for the paginator, or None if the embed is sent as it is
+    pages: Optional[List[str]] = None
+
+
+Runnable = FrozenSet[commands.Command]
+
+
+class HelpIndex:
+    """
+    Every help choice and rendered help page, built once per extension
+    change.
+
+    Commands without checks are always runnable. Commands with checks
+    are run through `filter_commands` once per permission set, and the
+    result is cached. Choices and rendered pages only depend on which
+    commands can be run, so they're cached per set of runnable commands,
+    and permission sets that can run the same commands share them.
+
+    Suggestions come from a bigram index, so only choices sharing part
+    of the query are scored at all. Scores are the same as fuzzywuzzy's
+    `fuzz.ratio`, but every choice keeps its own `SequenceMatcher`, so
+    the work of analysing the choice is done once, and the cheap upper
+    bounds are checked before the full ratio is computed.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.open_commands: Runnable = frozenset()
+        self._open: Set[str] = set()
+        self._restricted: Dict[commands.Command, Set[str]] = {}
+        self._bigrams: DefaultDict[str, Set[str]] = defaultdict(set)
+        self._matchers: Dict[str, SequenceMatcher] = {}
+        self._runnable: Dict[PermissionKey, Runnable] = {}
+        self._choices: Dict[Runnable, FrozenSet[str]] = {}
+        self._pages: Dict[Tuple[str, str, Runnable], HelpPage] = {}
+
+    def invalidate(self) -> None:
+        self.built = False
+        self._runnable.clear()
+        self._choices.clear()
+        self._pages.clear()
+
+    def build(self, bot: commands.Bot) -> None:
+        # pylint: disable=protected-access
+
+        self.invalidate()
+        self._open.clear()
+        self._restricted.clear()
+        self._bigrams.clear()
+        self._matchers.clear()
+        open_commands = set()
+
+        for command in bot.walk_commands():
+            if command.hidden:
+                continue
+
+            # the command or group name
+            choices = {str(command)}
+
+            if command.parent is None:
+                # all aliases if it's a top level command
+                choices.update(command.aliases)
+            else:
+                # otherwise we need to add the parent name in
+                choices.update(
+                    f'{command.full_parent_name} {alias}'
+                    for alias in command.aliases
+                )
+
+            cog = command.cog
+            has_checks = (
+                bot._checks
+                or command.checks
+                or not command.enabled
+                or cog is not None
+                and cog._get_overridden_method(cog.cog_check) is not None
+            )
+
+            if has_checks:
+                self._restricted[command] = choices
+            else:
+                open_commands.add(command)
+                self._open.update(choices)
+
+        self.open_commands = frozenset(open_commands)
+
+        # all cog names
+        self._open.update(bot.cogs)
+
+        # all category names
+        self._open.update(
+            cog.category
+            for cog in bot.cogs.values()
+            if hasattr(cog, 'category')
+        )
+
+        for choice in self._open.union(*self._restricted.values()):
+            self._matchers[choice] = SequenceMatcher(None, '', choice)
+
+            for bigram in bigrams(choice):
+                self._bigrams[bigram].add(choice)
+
+        self.built = True
+
+    async def runnable(self, help_command: commands.HelpCommand) -> Runnable:
+        """Returns every command the invoking author is allowed to run."""
+
+        ctx = help_command.context
+
+        if not self.built:
+            self.build(ctx.bot)
+
+        key = await permission_key(ctx)
+        runnable = self._runnable.get(key)
+
+        if runnable is None:
+            runnable = self.open_commands.union(
+                await help_command.filter_commands(self._restricted)
+            )
+
+            if len(self._runnable) >= MAX_PERMISSION_SETS:
+                self._runnable.clear()
+
+            self._runnable[key] = runnable
+
+        return runnable
+
+    def choices(self, runnable: Runnable) -> FrozenSet[str]:
+        """Returns every choice for a set of runnable commands."""
+
+        choices = self._choices.get(runnable)
+
+        if choices is None:
+            choices = self._choices[runnable] = frozenset(
+                self._open.union(
+                    *(
+                        choices
+                        for command, choices in self._restricted.items()
+                        if command in runnable
+                    )
+                )
+            )
+
+        return choices
+
+    def page(
+        self,
+        kind: str,
+        name: str,
+        runnable: Runnable,
+        render: Callable[[Runnable], HelpPage],
+    ) -> HelpPage:
+        """Returns a rendered help page, rendering it if it isn't cached."""
+
+        key = (kind, name, runnable)
+        page = self._pages.get(key)
+
+        if page is None:
+            if len(self._pages) >= MAX_CACHED_PAGES:
+                self._pages.clear()
+
+            page = self._pages[key] = render(runnable)
+
+        return page
+
+    def suggest(
+        self, query: str, allowed: FrozenSet[str]
+    ) -> List[Tuple[str, int]]:
+        """Returns the allowed choices most like the query, best first."""
+
+        candidates = set()
+
+        for bigram in bigrams(query):
+            candidates.update(self._bigrams.get(bigram, ()))
+
+        scored = []
+
+        for choice in candidates & allowed:
+            matcher = self._matchers[choice]
+            matcher.set_seq1(query)
+
+            if (
+                round(100 * matcher.real_quick_ratio()) < SUGGESTION_CUTOFF
+                or round(100 * matcher.quick_ratio()) < SUGGESTION_CUTOFF
+            ):
+                continue
+
+            score = round(100 * matcher.ratio())
+
+            if score >= SUGGESTION_CUTOFF:
+                scored.append((choice, score))
+
+        scored.sort(key=lambda match: match[1], reverse=True)
+
+        return scored[:MAX_SUGGESTIONS]
+
+
+HELP_INDEX = HelpIndex()
+
+
+class WarmUpContext:
+    """
+    Stands in for a command context when working out what a member can
+    run before they've asked for help.
+
+    Command checks only look at the bot, the author and the channel.
+    """
+
+    def __init__(
+        self, bot: commands.Bot, author: Member, channel: TextChannel
+    ):
+        self.bot = bot
+        self.author = author
+        self.guild = author.guild
+        self.channel = channel
+        self.message = None
+        self.command = None
+
+
+class HelpQueryNotFound(ValueError):
+    """
+    Raised when a HelpSession Query doesn't match a command or cog.
+
+    Contains the custom attribute of ``possible_matches``.
+
+    Instances of this object contain a dictionary of any command(s) that
+    were close to matching the query, where keys are the possible
+    matched command names and values are the likeness match scores.
+    """
+
+    def __init__(self, arg: str, possible_matches: dict = None):
+        super().__init__(arg)
+        self.possible_matches = possible_matches
+
+
+class CustomHelpCommand(commands.HelpCommand):
+    """
+    An interactive instance for the bot help command.
+
+    Cogs can be grouped into custom categories. All cogs with the same
+    category will be displayed under a single category name in the help
+    output. Custom categories are defined inside the cogs as a class
+    attribute named `category`. A description can also be specified with
+    the attribute `category_description`. If a description is not found
+    in at least one cog, the default will be the regular description
+    (class docstring) of the first cog found in the category.
+    """
+
+    def __init__(self):
+        super().__init__(command_attrs={'help': 'Shows help for bot commands'})
+
+    async def command_callback(
+        self, ctx: commands.Context, *, command: str = None
+    ) -> None:
+        """Attempts to match the provided query with a valid command or cog."""
+
+        # the only reason we need to tamper with this is because d.py does not support "categories",
+        # so we need to deal with them ourselves.
+
+        bot = ctx.bot
+
+        if command is None:
+            # quick and easy, send bot help if command is none
+            mapping = self.get_bot_mapping()
+            await self.send_bot_help(mapping)
+            return
+
+        cog_matches = []
+        description = None
+        for cog in bot.cogs.values():
+            if hasattr(cog, 'category') and cog.category == command:
+                cog_matches.append(cog)
+                if hasattr(cog, 'category_description'):
+                    description = cog.category_description
+
+        if cog_matches:
+            category = Category(
+                name=command, description=description, cogs=cog_matches
+            )
+            await self.send_category_help(category)
+            return
+
+        # it's either a cog, group, command or subcommand; let the parent class deal with it
+        await super().command_callback(ctx, command=command)
+
+    async def get_all_help_choices(self) -> FrozenSet[str]:
+        """
+        Get all the possible options for getting help in the bot.
+
+        This will only display commands the author has permission to run.
+
+        These include:
+        - Category names
+        - Cog names
+        - Group command names (and aliases)
+        - Command names (and aliases)
+        - Subcommand names (with parent group and aliases for
+          subcommand, but not including aliases for group)
+
+        Options and choices are case sensitive.
+        """
+
+        return HELP_INDEX.choices(await HELP_INDEX.runnable(self))
+
+    async def command_not_found(self, string: str) -> 'HelpQueryNotFound':
+        """
+        Handles when a query does not match a valid command, group, cog
+        or category.
+
+        Will return an instance of the `HelpQueryNotFound` exception
+        with the error message and possible matches.
+        """
+
+        choices = await self.get_all_help_choices()
+
+        # Run fuzzywuzzy's processor beforehand, and avoid matching if processed string is empty
+        # This avoids fuzzywuzzy from raising a warning on inputs with only non-alphanumeric characters
+        processed = full_process(string)
+        if processed:
+            result = HELP_INDEX.suggest(processed, choices)
+        else:
+            result = []
+
+        return HelpQueryNotFound(f'Query "{string}" not found.', dict(result))
+
+    async def subcommand_not_found(
+        self, command: commands.Command, string: str
+    ) -> 'HelpQueryNotFound':
+        """
+        Redirects the error to `command_not_found`.
+
+        `command_not_found` deals with searching and getting best
+        choices for both commands and subcommands.
+        """
+
+        return await self.command_not_found(
+            f'{command.qualified_name} {string}'
+        )
+
+    async def send_error_message(self, error: HelpQueryNotFound) -> None:
+        """Send the error message to the channel."""
+
+        embed = Embed(colour=Color.red(), title=str(error))
+
+        if getattr(error, 'possible_matches', None):
+            matches = '\n'.join(
+                f'`{match}`' for match in error.possible_matches
+            )
+            embed.description = f'**Did you mean:**\n{matches}'
+
+        await self.context.send(embed=embed)
+
+    async def send_page(
+        self, kind: str, name: str, render: Callable[[Runnable], HelpPage]
+    ) -> None:
+        """Send a help page, rendered for what the author can run."""
+
+        runnable = await HELP_INDEX.runnable(self)
+        page = HELP_INDEX.page(kind, name, runnable, render)
+
+        # the paginator edits the embed, so the cached one is never sent
+        if page.pages is None:
+            await self.context.send(embed=page.embed.copy())
+        else:
+            await LinePaginator.paginate(
+                [], self.context, page.embed.copy(), pages=page.pages
+            )
+
+    @staticmethod
+    def filter_runnable(
+        commands_: List[commands.Command], runnable: Runnable
+    ) -> List[commands.Command]:
+        """Removes commands that can't be run, and sorts the rest by name."""
+
+        return sorted(
+            (command for command in commands_ if command in runnable),
+            key=lambda command: command.name,
+        )
+
+    @staticmethod
+    def command_formatting(
+        command: commands.Command, runnable: Runnable
+    ) -> Embed:
+        """
+        Takes a command and turns it into an embed.
+
+        It will add an author, command signature + help, aliases and a
+        note if the user can't run the command.
+        """
+
+        embed = Embed()
+        embed.set_author(name='Command Help')
+
+        parent = command.full_parent_name
+
+        name = str(command) if not parent else f'{parent} {command.name}'
+        command_details = f'**```{PREFIX}{name} {command.signature}```**\n'
+
+        # show command aliases
+        aliases = [
+            f'`{alias}`' if not parent else f'`{parent} {alias}`'
+            for alias in command.aliases
+        ]
+        aliases += [
+            f'`{alias}`' for alias in getattr(command, 'root_aliases', ())
+        ]
+        aliases = ', '.join(sorted(aliases))
+        if aliases:
+            command_details += f'**Can also use:** {aliases}\n\n'
+
+        # when command is disabled, show message about it,
+        # when user is not allowed to run command, add this to help message.
+        if not command.enabled:
+            command_details += '***This command is disabled.***\n\n'
+        elif command not in runnable:
+            command_details += NOT_ALLOWED_TO_RUN_MESSAGE
+
+        command_details += f"*{command.help or 'No details provided.'}*\n"
+        embed.description = command_details
+
+        return embed
+
+    def render_command_help(
+        self, command: commands.Command, runnable: Runnable
+    ) -> HelpPage:
+        return HelpPage(self.command_formatting(command, runnable))
+
+    async def send_command_help(self, command: commands.Command) -> None:
+        """Send help for a single command."""
+
+        await self.send_page(
+            'command',
+            command.qualified_name,
+            partial(self.render_command_help, command),
+        )
+
+    @staticmethod
+    def get_commands_brief_details(
+        commands_: List[commands.Command], return_as_list: bool = False
+    ) -> Union[List[str], str]:
+        """
+        Formats the prefix, command name and signature, and short doc
+        for an iterable of commands.
+
+        return_as_list is helpful for passing these command details into
+        the paginator as a list of command details.
+        """
+
+        details = []
+        for command in commands_:
+            signature = f' {command.signature}' if command.signature else ''
+            details.append(
+                f"\n**`{PREFIX}{command.qualified_name}{signature}`**\n*{command.short_doc or 'No details provided'}*"
+            )
+        if return_as_list:
+            return details
+        else:
+            return ''.join(details)
+
+    def render_group_help(
+        self, group: commands.Group, runnable: Runnable
+    ) -> HelpPage:
+        # remove commands that the user can't run and are hidden, and sort by name
+        commands_ = self.filter_runnable(group.commands, runnable)
+
+        embed = self.command_formatting(group, runnable)
+
+        command_details = self.get_commands_brief_details(commands_)
+        if command_details:
+            embed.description += f'\n**Subcommands:**\n{command_details}'
+
+        return HelpPage(embed)
+
+    async def send_group_help(self, group: commands.Group) -> None:
+        """Sends help for a group command."""
+
+        if len(group.commands) == 0:
+            # no subcommands, just treat it like a regular command
+            await self.send_command_help(group)
+            return
+
+        await self.send_page(
+            'group',
+            group.qualified_name,
+            partial(self.render_group_help, group),
+        )
+
+    def render_cog_help(
+        self, cog: commands.Cog, runnable: Runnable
+    ) -> HelpPage:
+        # sort commands by name, and remove any the user can't run or are hidden.
+        commands_ = self.filter_runnable(cog.get_commands(), runnable)
+
+        embed = Embed()
+        embed.set_author(name='Command Help')
+        embed.description = f'**{cog.qualified_name}**\n*{cog.description}*'
+
+        command_details = self.get_commands_brief_details(commands_)
+        if command_details:
+            embed.description += f'\n\n**Commands:**\n{command_details}'
+
+        return HelpPage(embed)
+
+    async def send_cog_help(self, cog: commands.Cog) -> None:
+        """Send help for a cog."""
+
+        await self.send_page(
+            'cog', cog.qualified_name, partial(self.render_cog_help, cog)
+        )
+
+    @staticmethod
+    def _category_key(command: commands.Command) -> str:
+        """
+        Returns a cog name of a given command for use as a key for
+        `sorted` and `groupby`.
+
+        A zero width space is used as a prefix for results with no cogs
+        to force them last in ordering.
+        """
+
+        if not command.cog:
+            return '**\u200bNo Category:**'
+
+        with suppress(AttributeError):
+            if command.cog.category:
+                return f'**{command.cog.category}**'
+        return f'**{command.cog_name}**'
+
+    def render_category_help(
+        self, category: Category, runnable: Runnable
+    ) -> HelpPage:
+        embed = Embed()
+        embed.set_author(name='Command Help')
+
+        all_commands = []
+        for cog in category.cogs:
+            all_commands.extend(cog.get_commands())
+
+        filtered_commands = self.filter_runnable(all_commands, runnable)
+
+        command_detail_lines = self.get_commands_brief_details(
+            filtered_commands, return_as_list=True
+        )
+        description = f'**{category.name}**\n*{category.description}*'
+
+        if command_detail_lines:
+            description += '\n\n**Commands:**'
+
+        return HelpPage(
+            embed,
+            LinePaginator.build_pages(
+                command_detail_lines,
+                prefix=description,
+                max_lines=COMMANDS_PER_PAGE,
+                max_size=2000,
+            ),
+        )
+
+    async def send_category_help(self, category: Category) -> None:
+        """
+        Sends help for a bot category.
+
+        This sends a brief help for all commands in all cogs registered
+        to the category.
+        """
+
+        await self.send_page(
+            'category',
+            category.name,
+            partial(self.render_category_help, category),
+        )
+
+    def render_bot_help(
+        self, bot: commands.Bot, runnable: Runnable
+    ) -> HelpPage:
+        embed = Embed()
+        embed.set_author(name='Command Help')
+
+        filter_commands = sorted(
+            (command for command in bot.commands if command in runnable),
+            key=self._category_key,
+        )
+
+        cog_or_category_pages = []
+
+        for cog_or_category, _commands in itertools.groupby(
+            filter_commands, key=self._category_key
+        ):
+            sorted_commands = sorted(_commands, key=lambda c: c.name)
+
+            if len(sorted_commands) == 0:
+                continue
+
+            command_detail_lines = self.get_commands_brief_details(
+                sorted_commands, return_as_list=True
+            )
+
+            # Split cogs or categories which have too many commands to fit in one page.
+            # The length of commands is included for later use when aggregating into pages for the paginator.
+            for index in range(0, len(sorted_commands), COMMANDS_PER_PAGE):
+                truncated_lines = command_detail_lines[
+                    index : index + COMMANDS_PER_PAGE
+                ]
+                joined_lines = ''.join(truncated_lines)
+                cog_or_category_pages.append(
+                    (
+                        f'**{cog_or_category}**{joined_lines}',
+                        len(truncated_lines),
+                    )
+                )
+
+        pages = []
+        counter = 0
+        page = ''
+        for page_details, length in cog_or_category_pages:
+            counter += length
+            if counter > COMMANDS_PER_PAGE:
+                # force a new page on paginator even if it falls short of the max pages
+                # since we still want to group categories/cogs.
+                counter = length
+                pages.append(page)
+                page = f'{page_details}\n\n'
+            else:
+                page += f'{page_details}\n\n'
+
+        if page:
+            # add any remaining command help that didn't get added in the last iteration above.
+            pages.append(page)
+
+        return HelpPage(
+            embed, LinePaginator.build_pages(pages, max_lines=1, max_size=2000)
+        )
+
+    async def send_bot_help(self, mapping: dict) -> None:
+        """Sends help for all bot commands and cogs."""
+
+        await self.send_page(
+            'bot', '', partial(self.render_bot_help, self.context.bot)
+        )
+
+    async def warm_up(self, bot: commands.Bot) -> None:
+        """
+        Prebuilds the help pages most people asking for help will see.
+
+        Pages are rendered for the commands that have no checks, which
+        is what nearly everyone can run, and for what the owner and a
+        member of each staff role can run in the chat channel. Members
+        with other combinations of roles have their pages rendered the
+        first time they ask.
+        """
+
+        HELP_INDEX.build(bot)
+        self.prerender(bot, HELP_INDEX.open_commands)
+
+        guild = bot.get_guild(CONFIG.guild.id)
+        channel = guild and guild.get_channel(CONFIG.guild.channels.chat)
+
+        if channel is None:
+            return
+
+        for member in await self.staff_members(bot, guild):
+            self.context = WarmUpContext(bot, member, channel)
+
+            try:
+                runnable = await HELP_INDEX.runnable(self)
+            finally:
+                self.context = None
+
+            self.prerender(bot, runnable)
+
+    @staticmethod
+    async def staff_members(bot: commands.Bot, guild: Guild) -> List[Member]:
+        """Returns the owner and a member of each staff role, if found"""
+
+        # is_owner fills in the owner IDs the first time it's called
+        await bot.is_owner(guild.me)
+        owner_ids = bot.owner_ids or {bot.owner_id}
+        members = [guild.get_member(owner_id) for owner_id in owner_ids]
+
+        for role_id in STAFF_ROLES:
+            role = guild.get_role(role_id)
+
+            if role is not None and role.members:
+                members.append(role.members[0])
+
+        return [member for member in members if member is not None]
+
+    def prerender(self, bot: commands.Bot, runnable: Runnable) -> None:
+        """Renders every help page for a set of runnable commands."""
+
+        HELP_INDEX.page(
+            'bot', '', runnable, partial(self.render_bot_help, bot)
+        )
+
+        categories: Dict[str, Category] = {}
+
+        for cog in bot.cogs.values():
+            HELP_INDEX.page(
+                'cog',
+                cog.qualified_name,
+                runnable,
+                partial(self.render_cog_help, cog),
+            )
+
+            if hasattr(cog, 'category'):
+                category = categories.get(cog.category)
+                categories[cog.category] = Category(
+                    name=cog.category,
+                    description=getattr(
+                        cog,
+                        'category_description',
+                        category.description if category else None,
+                    ),
+                    cogs=[*(category.cogs if category else ()), cog],
+                )
+
+        for category in categories.values():
+            HELP_INDEX.page(
+                'category',
+                category.name,
+                runnable,
+                partial(self.render_category_help, category),
+            )
+
+        for command in bot.walk_commands():
+            if isinstance(command, commands.Group) and command.commands:
+                kind, render = 'group', self.render_group_help
+            else:
+                kind, render = 'command', self.render_command_help
+
+            HELP_INDEX.page(
+                kind,
+                command.qualified_name,
+                runnable,
+                partial(render, command),
+            )
+
+
+class HelpCog(commands.Cog, name='Help'):
+    """Custom Embed Pagination Help feature."""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.old_help_command = bot.help_command
+        bot.help_command = CustomHelpCommand()
+        bot.help_command.cog = self
+        HELP_INDEX.invalidate()
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        """Prebuild the common help pages before anyone asks for them."""
+        await self.bot.help_command.warm_up(self.bot)
+
+    @commands.Cog.listener()
+    async def on_extensions_changed(self) -> None:
+        """Rebuild the help index once the bot's commands have changed."""
+        await self.bot.help_command.warm_up(self.bot)
+
+    def cog_unload(self) -> None:
+        """Reset the help command when the cog is unloaded."""
+        self.bot.help_command = self.old_help_command
+
+
+def setup(bot):
+    bot.add_cog(HelpCog(bot))
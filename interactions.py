@@ -0,0 +1,338 @@
+import asyncio
+import hmac
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from hashlib import sha256
+from math import ceil
+from sys import stderr
+from time import monotonic
+from traceback import print_exception
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from discord import Color, Embed, Message
+from dislash import MessageInteraction
+
+from config import CONFIG
+
+Handler = Callable[[MessageInteraction], Awaitable[None]]
+PersistentHandler = Callable[[MessageInteraction, bytes], Awaitable[None]]
+
+WHEEL_RESOLUTION = 1  # seconds
+WHEEL_SIZE = 512
+
+CUSTOM_ID_LIMIT = 100
+SIGNATURE_SIZE = 6  # bytes
+
+# The key only has to stay the same across restarts and deploys, so it's
+# derived from the token instead of being yet another secret to manage
+SIGNING_KEY = sha256(b'custom_id:' + CONFIG.bot.token.encode()).digest()
+
+NOT_THE_AUTHOR = Embed(title="You're not the author", color=Color.red())
+
+
+def _b64encode(data: bytes) -> str:
+    return urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(action: str, payload: bytes) -> bytes:
+    return hmac.new(
+        SIGNING_KEY, action.encode() + b':' + payload, sha256
+    ).digest()[:SIGNATURE_SIZE]
+
+
+def encode_custom_id(action: str, payload: bytes = b'') -> str:
+    """Packs an action and its payload into a signed custom ID
+
+    The ID is `action:payload:signature`, with the payload and signature
+    base64 encoded. Raises `ValueError` if it doesn't fit in a custom ID.
+    """
+
+    custom_id = '{}:{}:{}'.format(
+        action, _b64encode(payload), _b64encode(_signature(action, payload))
+    )
+
+    if len(custom_id) > CUSTOM_ID_LIMIT:
+        raise ValueError(
+            f'custom ID for {action!r} is {len(custom_id)} characters long'
+        )
+
+    return custom_id
+
+
+def decode_custom_id(custom_id: str) -> Optional[Tuple[str, bytes]]:
+    """Returns the action and payload of a custom ID signed by the bot"""
+
+    try:
+        action, payload, signature = custom_id.split(':')
+        payload = _b64decode(payload)
+        signature = _b64decode(signature)
+    except ValueError:
+        return None
+
+    if not hmac.compare_digest(signature, _signature(action, payload)):
+        return None
+
+    return action, payload
+
+
+class TimerWheel:
+    """Calls back keys once their deadlines pass, using a single task
+
+    Deadlines are hashed into `size` slots of `resolution` seconds, so
+    scheduling, rescheduling and cancelling a key are all O(1), and each
+    tick only looks at the keys in the slots it passes. Deadlines more
+    than one turn of the wheel away stay in their slot until they're due.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Hashable], None],
+        resolution: float = WHEEL_RESOLUTION,
+        size: int = WHEEL_SIZE,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.callback = callback
+        self.resolution = resolution
+        self.size = size
+        self.clock = clock
+        self._slots: List[Dict[Hashable, float]] = [{} for _ in range(size)]
+        self._slot_of: Dict[Hashable, int] = {}
+        self._tick = int(clock() / resolution)
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Calls back `key` at `deadline`, replacing any earlier deadline"""
+
+        self.cancel(key)
+
+        # Rounding up means a key is always due by the time its slot is
+        # reached, and it's never put in a slot the wheel has passed
+        slot = max(ceil(deadline / self.resolution), self._tick + 1)
+        slot %= self.size
+
+        self._slots[slot][key] = deadline
+        self._slot_of[key] = slot
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self, key: Hashable) -> None:
+        slot = self._slot_of.pop(key, None)
+
+        if slot is not None:
+            del self._slots[slot][key]
+
+    def advance(self, now: float) -> None:
+        """Calls back every key that's due by `now`"""
+
+        target = int(now / self.resolution)
+
+        # A full turn covers every slot, however long the wheel stalled
+        for tick in range(
+            max(self._tick + 1, target - self.size + 1), target + 1
+        ):
+            slot = self._slots[tick % self.size]
+            due = [key for key, deadline in slot.items() if deadline <= now]
+
+            for key in due:
+                del slot[key]
+                del self._slot_of[key]
+
+                try:
+                    self.callback(key)
+                except Exception as error:
+                    print_exception(
+                        type(error), error, error.__traceback__, file=stderr
+                    )
+
+        self._tick = max(self._tick, target)
+
+    async def _run(self) -> None:
+        while self._slot_of:
+            await asyncio.sleep(self.resolution)
+            self.advance(self.clock())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+
+class Session:
+    """The components under one message, and what clicking them does
+
+    Handlers are looked up by the clicked component's `custom_id`. If the
+    session is restricted to a user, anyone else is told so and none of
+    the handlers run. Every handled click pushes the timeout back, unless
+    the session only takes one click, like a confirmation does.
+    """
+
+    def __init__(
+        self,
+        router: 'InteractionRouter',
+        message_id: int,
+        duration: float,
+        check: Optional[Callable[[MessageInteraction], bool]] = None,
+        once: bool = False,
+    ):
+        self.router = router
+        self.message_id = message_id
+        self.duration = duration
+        self.check = check
+        self.once = once
+        self.handlers: Dict[str, Handler] = {}
+        self.fallback: Optional[Handler] = None
+        self.on_timeout: Optional[Callable[[], Awaitable[None]]] = None
+
+    def matching_id(self, custom_id: str) -> Callable[[Handler], Handler]:
+        """Decorates the handler for one `custom_id`"""
+
+        def decorator(handler: Handler) -> Handler:
+            self.handlers[custom_id] = handler
+            return handler
+
+        return decorator
+
+    def no_checks(self, handler: Handler) -> Handler:
+        """Decorates the handler for clicks no other handler matches"""
+
+        self.fallback = handler
+        return handler
+
+    def timeout(
+        self, handler: Callable[[], Awaitable[None]]
+    ) -> Callable[[], Awaitable[None]]:
+        """Decorates what to do when the session expires"""
+
+        self.on_timeout = handler
+        return handler
+
+    def close(self) -> None:
+        """Stops handling clicks without calling the timeout handler"""
+
+        self.router.close(self.message_id)
+
+    async def handle(self, inter: MessageInteraction) -> None:
+        if self.check is not None and not self.check(inter):
+            await inter.reply(embed=NOT_THE_AUTHOR, ephemeral=True)
+            return
+
+        handler = self.handlers.get(inter.component.custom_id, self.fallback)
+
+        if handler is None:
+            return
+
+        if self.once:
+            self.close()
+        else:
+            self.router.wheel.schedule(
+                self.message_id, self.router.wheel.clock() + self.duration
+            )
+
+        await handler(inter)
+
+
+class InteractionRouter:
+    """Routes component clicks to the session of the clicked message
+
+    Each click costs one dict lookup, however many menus are open, and
+    every session expires through the same timer wheel instead of a
+    task of its own.
+
+    Clicks on messages without a session go to the persistent handler of
+    the action in their signed custom ID. Everything those handlers need
+    is in the custom ID or the message itself, so they keep working
+    after a restart and hold no memory for the menus that are open.
+    """
+
+    def __init__(self):
+        self.sessions: Dict[int, Session] = {}
+        self.handlers: Dict[str, PersistentHandler] = {}
+        self.wheel = TimerWheel(self._expire)
+
+    def register(self, action: str, handler: PersistentHandler) -> None:
+        self.handlers[action] = handler
+
+    def unregister(self, action: str) -> None:
+        self.handlers.pop(action, None)
+
+    def persistent(
+        self, action: str
+    ) -> Callable[[PersistentHandler], PersistentHandler]:
+        """Decorates the persistent handler for an action"""
+
+        def decorator(handler: PersistentHandler) -> PersistentHandler:
+            self.register(action, handler)
+            return handler
+
+        return decorator
+
+    def open(
+        self,
+        message: Message,
+        timeout: float,
+        check: Optional[Callable[[MessageInteraction], bool]] = None,
+        once: bool = False,
+    ) -> Session:
+        session = self.sessions[message.id] = Session(
+            self, message.id, timeout, check, once
+        )
+        self.wheel.schedule(message.id, self.wheel.clock() + timeout)
+
+        return session
+
+    def close(self, message_id: int) -> None:
+        self.sessions.pop(message_id, None)
+        self.wheel.cancel(message_id)
+
+    async def dispatch(self, inter: MessageInteraction) -> None:
+        session = self.sessions.get(inter.message.id)
+
+        if session is not None:
+            await session.handle(inter)
+            return
+
+        custom_id = inter.component.custom_id
+        handler = self.handlers.get(custom_id.partition(':')[0])
+
+        if handler is None:
+            return
+
+        decoded = decode_custom_id(custom_id)
+
+        if decoded is not None:
+            await handler(inter, decoded[1])
+
+    def _expire(self, message_id: int) -> None:
+        session = self.sessions.pop(message_id, None)
+
+        if session is not None and session.on_timeout is not None:
+            asyncio.create_task(self._run_timeout(session))
+
+    @staticmethod
+    async def _run_timeout(session: Session) -> None:
+        try:
+            await session.on_timeout()
+        except Exception as error:
+            print_exception(
+                type(error), error, error.__traceback__, file=stderr
+            )
+
+    def stop(self) -> None:
+        self.wheel.stop()
+
+
+INTERACTIONS = InteractionRouter()
@@ -0,0 +1,70 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class Leaderboard:
+    """XP rankings kept in memory so ranks don't need a count scan
+
+    Entries are kept sorted by `(-xp, user_id)`, which is the same order
+    as sorting accounts by XP descending and then by ID. Lookups are
+    binary searches; updates shift the underlying list, which is a
+    single `memmove` and stays cheap well past our member count.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._keys: List[Tuple[int, int]] = []
+        self._xp: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self, rows: Iterable[Tuple[int, int]]) -> None:
+        """Fills the leaderboard from `(user_id, xp)` rows
+
+        Users updated while the rows were being fetched keep their
+        newer value.
+        """
+
+        for user_id, xp in rows:
+            self._xp.setdefault(user_id, xp)
+
+        self._keys = sorted(
+            (-xp, user_id) for user_id, xp in self._xp.items()
+        )
+        self.loaded = True
+
+    def xp(self, user_id: int) -> Optional[int]:
+        return self._xp.get(user_id)
+
+    def update(self, user_id: int, xp: int) -> None:
+        self.remove(user_id)
+        self._xp[user_id] = xp
+        insort(self._keys, (-xp, user_id))
+
+    def remove(self, user_id: int) -> None:
+        old_xp = self._xp.pop(user_id, None)
+
+        if old_xp is not None:
+            del self._keys[bisect_left(self._keys, (-old_xp, user_id))]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """Returns the 1-based rank of a user, or None if they're unranked"""
+
+        xp = self._xp.get(user_id)
+
+        if xp is None:
+            return None
+
+        return bisect_left(self._keys, (-xp, user_id)) + 1
+
+    def top(self, limit: int, offset: int = 0) -> List[Tuple[int, int]]:
+        """Returns `(user_id, xp)` pairs, best first"""
+
+        return [
+            (user_id, -negative_xp)
+            for negative_xp, user_id in self._keys[offset : offset + limit]
+        ]
+
+
+LEADERBOARD = Leaderboard()
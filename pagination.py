@@ -1,386 +1,704 @@
-import asyncio
-import typing as t
-from contextlib import suppress
-
-import discord
-from discord import Member
-from discord.abc import User
-from discord.ext.commands import Context, Paginator
-
-FIRST_EMOJI = '\u23EE'  # [:track_previous:]
-LEFT_EMOJI = '\u2B05'  # [:arrow_left:]
-RIGHT_EMOJI = '\u27A1'  # [:arrow_right:]
-LAST_EMOJI = '\u23ED'  # [:track_next:]
-DELETE_EMOJI = '\u274C'  # [:x:]
-
-PAGINATION_EMOJI = (
-    FIRST_EMOJI,
-    LEFT_EMOJI,
-    RIGHT_EMOJI,
-    LAST_EMOJI,
-    DELETE_EMOJI,
-)
-
-
-class EmptyPaginatorEmbed(Exception):
-    """Raised when attempting to paginate with empty contents."""
-
-
-class LinePaginator(Paginator):
-    """
-    A class that aids in paginating code blocks for Discord messages.
-    Available attributes include:
-    * prefix: `str`
-        The prefix inserted to every page. e.g. three backticks.
-    * suffix: `str`
-        The suffix appended at the end of every page. e.g. three backticks.
-    * max_size: `int`
-        The maximum amount of codepoints allowed in a page.
-    * scale_to_size: `int`
-        The maximum amount of characters a single line can scale up to.
-    * max_lines: `int`
-        The maximum amount of lines allowed in a page.
-    """
-
-    def __init__(
-        self,
-        prefix: str = '```',
-        suffix: str = '```',
-        max_size: int = 2000,
-        scale_to_size: int = 2000,
-        max_lines: t.Optional[int] = None,
-    ):
-        """
-        This function overrides the Paginator.__init__ from inside discord.ext.commands.
-        It overrides in order to allow us to configure the maximum number of lines per page.
-        """
-
-        self.prefix = prefix
-        self.suffix = suffix
-
-        # Embeds that exceed 2048 characters will result in an HTTPException
-        # (Discord API limit), so we've set a limit of 2000
-        if max_size > 2000:
-            raise ValueError(
-                f'max_size must be <= 2,000 characters. ({max_size} > 2000)'
-            )
-
-        self.max_size = max_size - len(suffix)
-
-        if scale_to_size < max_size:
-            raise ValueError(
-                f'scale_to_size must be >= max_size. ({scale_to_size} < {max_size})'
-            )
-
-        if scale_to_size > 2000:
-            raise ValueError(
-                f'scale_to_size must be <= 2,000 characters. ({scale_to_size} > 2000)'
-            )
-
-        self.scale_to_size = scale_to_size - len(suffix)
-        self.max_lines = max_lines
-        self._current_page = [prefix]
-        self._linecount = 0
-        self._count = len(prefix) + 1  # prefix + newline
-        self._pages = []
-
-    def add_line(self, line: str = '', *, empty: bool = False) -> None:
-        """
-        Adds a line to the current page.
-        If a line on a page exceeds `max_size` characters, then `max_size` will go up to
-        `scale_to_size` for a single line before creating a new page for the overflow words. If it
-        is still exceeded, the excess characters are stored and placed on the next pages unti
-        there are none remaining (by word boundary). The line is truncated if `scale_to_size` is
-        still exceeded after attempting to continue onto the next page.
-        In the case that the page already contains one or more lines and the new lines would cause
-        `max_size` to be exceeded, a new page is created. This is done in order to make a best
-        effort to avoid breaking up single lines across pages, while keeping the total length of the
-        page at a reasonable size.
-        This function overrides the `Paginator.add_line` from inside `discord.ext.commands`.
-        It overrides in order to allow us to configure the maximum number of lines per page.
-        """
-
-        remaining_words = None
-        max_chars = self.max_size - len(self.prefix) - 2
-        if len(line) > max_chars:
-            if len(line) > self.scale_to_size:
-                line, remaining_words = self._split_remaining_words(
-                    line, max_chars
-                )
-            if len(line) > self.scale_to_size:
-                line = line[: self.scale_to_size]
-
-        # Check if we should start a new page or continue the line on the current one
-        if self.max_lines is not None and self._linecount >= self.max_lines:
-            self._new_page()
-        elif (
-            self._count + len(line) + 1 > self.max_size and self._linecount > 0
-        ):
-            self._new_page()
-
-        self._linecount += 1
-
-        self._count += len(line) + 1
-        self._current_page.append(line)
-
-        if empty:
-            self._current_page.append('')
-            self._count += 1
-
-        # Start a new page if there were any overflow words
-        if remaining_words:
-            self._new_page()
-            self.add_line(remaining_words)
-
-    def _new_page(self) -> None:
-        """
-        Internal: start a new page for the paginator.
-        This closes the current page and resets the counters for the new page's line count and
-        character count.
-        """
-
-        self._linecount = 0
-        self._count = len(self.prefix) + 1
-        self.close_page()
-
-    def _split_remaining_words(
-        self, line: str, max_chars: int
-    ) -> t.Tuple[str, t.Optional[str]]:
-        """
-        Internal: split a line into two strings -- reduced_words and remaining_words.
-        reduced_words: the remaining words in `line`, after attempting to remove all words that
-            exceed `max_chars` (rounding down to the nearest word boundary).
-        remaining_words: the words in `line` which exceed `max_chars`. This value is None if
-            no words could be split from `line`.
-        If there are any remaining_words, an ellipses is appended to reduced_words and a
-        continuation header is inserted before remaining_words to visually communicate the line
-        continuation.
-        Return a tuple in the format (reduced_words, remaining_words).
-        """
-
-        reduced_words = []
-        remaining_words = []
-
-        # "(Continued)" is used on a line by itself to indicate the continuation of last page
-        continuation_header = '(Continued)\n-----------\n'
-        reduced_char_count = 0
-        is_full = False
-
-        for word in line.split(' '):
-            if is_full:
-                remaining_words.append(word)
-
-            elif len(word) + reduced_char_count <= max_chars:
-                reduced_words.append(word)
-                reduced_char_count += len(word) + 1
-            else:
-                # If reduced_words is empty, we were unable to split the words across pages
-                if not reduced_words:
-                    return line, None
-                is_full = True
-                remaining_words.append(word)
-        return (
-            ' '.join(reduced_words) + '...' if remaining_words else '',
-            continuation_header + ' '.join(remaining_words)
-            if remaining_words
-            else None,
-        )
-
-    @classmethod
-    async def paginate(
-        cls,
-        lines: t.List[str],
-        ctx: Context,
-        embed: discord.Embed,
-        prefix: str = '',
-        suffix: str = '',
-        max_lines: t.Optional[int] = None,
-        max_size: int = 500,
-        scale_to_size: int = 2000,
-        empty: bool = True,
-        restrict_to_user: User = None,
-        timeout: int = 300,
-        footer_text: str = None,
-        url: str = None,
-        exception_on_empty_embed: bool = False,
-    ) -> t.Optional[discord.Message]:
-        """
-        Use a paginator and set of reactions to provide pagination over a set of lines.
-        The reactions are used to switch page, or to finish with pagination.
-        When used, this will send a message using `ctx.send()` and apply a set of reactions to it. These reactions may
-        be used to change page, or to remove pagination from the message.
-        Pagination will also be removed automatically if no reaction is added for five minutes (300 seconds).
-        The interaction will be limited to `restrict_to_user` (ctx.author by default) or
-        to any user with a moderation role.
-        Example:
-        >>> embed = discord.Embed()
-        >>> embed.set_author(name="Some Operation", url=url, icon_url=icon)
-        >>> await LinePaginator.paginate([line for line in lines], ctx, embed)
-        """
-
-        def event_check(
-            reaction_: discord.Reaction, user_: discord.Member
-        ) -> bool:
-            """Make sure that this reaction is what we want to operate on."""
-            no_restrictions = (
-                # The reaction was by a whitelisted user
-                user_.id == restrict_to_user.id
-                # The reaction was by a moderator
-                or isinstance(user_, Member)
-                and any(role.id == 805165739903287367 for role in user_.roles)
-            )
-
-            return (
-                # Conditions for a successful pagination:
-                all(
-                    (
-                        # Reaction is on this message
-                        reaction_.message.id == message.id,
-                        # Reaction is one of the pagination emotes
-                        str(reaction_.emoji) in PAGINATION_EMOJI,
-                        # Reaction was not made by the Bot
-                        user_.id != ctx.bot.user.id,
-                        # There were no restrictions
-                        no_restrictions,
-                    )
-                )
-            )
-
-        paginator = cls(
-            prefix=prefix,
-            suffix=suffix,
-            max_size=max_size,
-            max_lines=max_lines,
-            scale_to_size=scale_to_size,
-        )
-        current_page = 0
-
-        if not restrict_to_user:
-            restrict_to_user = ctx.author
-
-        if not lines:
-            if exception_on_empty_embed:
-                raise EmptyPaginatorEmbed('No lines to paginate')
-
-            lines.append('(nothing to display)')
-
-        for line in lines:
-            try:
-                paginator.add_line(line, empty=empty)
-            except Exception:
-                raise  # Should propagate
-
-        embed.description = paginator.pages[current_page]
-
-        if len(paginator.pages) <= 1:
-            if footer_text:
-                embed.set_footer(text=footer_text)
-
-            if url:
-                embed.url = url
-
-            return await ctx.send(embed=embed)
-        else:
-            if footer_text:
-                embed.set_footer(
-                    text=f'{footer_text} (Page {current_page + 1}/{len(paginator.pages)})'
-                )
-            else:
-                embed.set_footer(
-                    text=f'Page {current_page + 1}/{len(paginator.pages)}'
-                )
-
-            if url:
-                embed.url = url
-
-            message = await ctx.send(embed=embed)
-
-        for emoji in PAGINATION_EMOJI:
-            # Add all the applicable emoji to the message
-            await message.add_reaction(emoji)
-
-        while True:
-            try:
-                reaction, user = await ctx.bot.wait_for(
-                    'reaction_add', timeout=timeout, check=event_check
-                )
-            except asyncio.TimeoutError:
-                break  # We're done, no reactions for the last 5 minutes
-
-            if str(reaction.emoji) == DELETE_EMOJI:
-                return await message.delete()
-
-            if reaction.emoji == FIRST_EMOJI:
-                await message.remove_reaction(reaction.emoji, user)
-                current_page = 0
-
-                embed.description = paginator.pages[current_page]
-                if footer_text:
-                    embed.set_footer(
-                        text=f'{footer_text} (Page {current_page + 1}/{len(paginator.pages)})'
-                    )
-                else:
-                    embed.set_footer(
-                        text=f'Page {current_page + 1}/{len(paginator.pages)}'
-                    )
-                await message.edit(embed=embed)
-
-            if reaction.emoji == LAST_EMOJI:
-                await message.remove_reaction(reaction.emoji, user)
-                current_page = len(paginator.pages) - 1
-
-                embed.description = paginator.pages[current_page]
-                if footer_text:
-                    embed.set_footer(
-                        text=f'{footer_text} (Page {current_page + 1}/{len(paginator.pages)})'
-                    )
-                else:
-                    embed.set_footer(
-                        text=f'Page {current_page + 1}/{len(paginator.pages)}'
-                    )
-                await message.edit(embed=embed)
-
-            if reaction.emoji == LEFT_EMOJI:
-                await message.remove_reaction(reaction.emoji, user)
-
-                if current_page <= 0:
-                    continue
-
-                current_page -= 1
-
-                embed.description = paginator.pages[current_page]
-
-                if footer_text:
-                    embed.set_footer(
-                        text=f'{footer_text} (Page {current_page + 1}/{len(paginator.pages)})'
-                    )
-                else:
-                    embed.set_footer(
-                        text=f'Page {current_page + 1}/{len(paginator.pages)}'
-                    )
-
-                await message.edit(embed=embed)
-
-            if reaction.emoji == RIGHT_EMOJI:
-                await message.remove_reaction(reaction.emoji, user)
-
-                if current_page >= len(paginator.pages) - 1:
-                    continue
-
-                current_page += 1
-
-                embed.description = paginator.pages[current_page]
-
-                if footer_text:
-                    embed.set_footer(
-                        text=f'{footer_text} (Page {current_page + 1}/{len(paginator.pages)})'
-                    )
-                else:
-                    embed.set_footer(
-                        text=f'Page {current_page + 1}/{len(paginator.pages)}'
-                    )
-
-                await message.edit(embed=embed)
-
-        with suppress(discord.NotFound):
-            await message.clear_reactions()
+import asyncio
+import typing as t
+from contextlib import suppress
+
+import discord
+from discord import Member
+from discord.abc import User
+from discord.ext.commands import Context, Paginator
+from dislash import (
+    ActionRow,
+    Button,
+    ButtonStyle,
+    MessageInteraction,
+    ResponseType,
+    auto_rows,
+)
+
+from interactions import INTERACTIONS
+
+FIRST_EMOJI = '\u23EE'  # [:track_previous:]
+LEFT_EMOJI = '\u2B05'  # [:arrow_left:]
+RIGHT_EMOJI = '\u27A1'  # [:arrow_right:]
+LAST_EMOJI = '\u23ED'  # [:track_next:]
+DELETE_EMOJI = '\u274C'  # [:x:]
+HOME_EMOJI = '\U0001F4CD'  # [:round_pushpin:]
+
+PAGINATION_EMOJI = (
+    FIRST_EMOJI,
+    LEFT_EMOJI,
+    RIGHT_EMOJI,
+    LAST_EMOJI,
+    DELETE_EMOJI,
+)
+
+# Custom IDs of the pagination buttons, and the emoji each one shows
+PAGINATION_IDS = {
+    'page_first': FIRST_EMOJI,
+    'page_left': LEFT_EMOJI,
+    'page_right': RIGHT_EMOJI,
+    'page_last': LAST_EMOJI,
+    'page_home': HOME_EMOJI,
+    'page_delete': DELETE_EMOJI,
+}
+PAGINATION_CUSTOM_IDS = {
+    emoji: custom_id for custom_id, emoji in PAGINATION_IDS.items()
+}
+
+MODERATOR_ROLE = 805165739903287367
+
+# Discord fails a click that isn't acknowledged within three seconds
+ACKNOWLEDGE_WITHIN = 2  # seconds
+
+
+def pagination_components(emojis: t.Sequence[str]) -> t.List[ActionRow]:
+    """Lay out a button for each of the given pagination emojis."""
+    return auto_rows(
+        *(
+            Button(
+                style=ButtonStyle.grey,
+                emoji=emoji,
+                custom_id=PAGINATION_CUSTOM_IDS[emoji],
+            )
+            for emoji in emojis
+        )
+    )
+
+
+class EmptyPaginatorEmbed(Exception):
+    """Raised when attempting to paginate with empty contents."""
+
+
+class LinePaginator(Paginator):
+    """
+    A class that aids in paginating code blocks for Discord messages.
+    Available attributes include:
+    * prefix: `str`
+        The prefix inserted to every page. e.g. three backticks.
+    * suffix: `str`
+        The suffix appended at the end of every page. e.g. three backticks.
+    * max_size: `int`
+        The maximum amount of codepoints allowed in a page.
+    * scale_to_size: `int`
+        The maximum amount of characters a single line can scale up to.
+    * max_lines: `int`
+        The maximum amount of lines allowed in a page.
+    """
+
+    def __init__(
+        self,
+        prefix: str = '```',
+        suffix: str = '```',
+        max_size: int = 2000,
+        scale_to_size: int = 2000,
+        max_lines: t.Optional[int] = None,
+    ):
+        """
+        This function overrides the Paginator.__init__ from inside discord.ext.commands.
+        It overrides in order to allow us to configure the maximum number of lines per page.
+        """
+
+        self.prefix = prefix
+        self.suffix = suffix
+        self.linesep = '\n'
+
+        # Embeds that exceed 2048 characters will result in an HTTPException
+        # (Discord API limit), so we've set a limit of 2000
+        if max_size > 2000:
+            raise ValueError(
+                f'max_size must be <= 2,000 characters. ({max_size} > 2000)'
+            )
+
+        self.max_size = max_size - len(suffix)
+
+        if scale_to_size < max_size:
+            raise ValueError(
+                f'scale_to_size must be >= max_size. ({scale_to_size} < {max_size})'
+            )
+
+        if scale_to_size > 2000:
+            raise ValueError(
+                f'scale_to_size must be <= 2,000 characters. ({scale_to_size} > 2000)'
+            )
+
+        self.scale_to_size = scale_to_size - len(suffix)
+        self.max_lines = max_lines
+        self._current_page = [prefix]
+        self._linecount = 0
+        self._count = len(prefix) + 1  # prefix + newline
+        self._pages = []
+
+    def add_line(self, line: str = '', *, empty: bool = False) -> None:
+        """
+        Adds a line to the current page.
+        If a line on a page exceeds `max_size` characters, then `max_size` will go up to
+        `scale_to_size` for a single line before creating a new page for the overflow words. If it
+        is still exceeded, the excess characters are stored and placed on the next pages unti
+        there are none remaining (by word boundary). The line is truncated if `scale_to_size` is
+        still exceeded after attempting to continue onto the next page.
+        In the case that the page already contains one or more lines and the new lines would cause
+        `max_size` to be exceeded, a new page is created. This is done in order to make a best
+        effort to avoid breaking up single lines across pages, while keeping the total length of the
+        page at a reasonable size.
+        This function overrides the `Paginator.add_line` from inside `discord.ext.commands`.
+        It overrides in order to allow us to configure the maximum number of lines per page.
+        """
+
+        remaining_words = None
+        max_chars = self.max_size - len(self.prefix) - 2
+        if len(line) > max_chars:
+            if len(line) > self.scale_to_size:
+                line, remaining_words = self._split_remaining_words(
+                    line, max_chars
+                )
+            if len(line) > self.scale_to_size:
+                line = line[: self.scale_to_size]
+
+        # Check if we should start a new page or continue the line on the current one
+        if self.max_lines is not None and self._linecount >= self.max_lines:
+            self._new_page()
+        elif (
+            self._count + len(line) + 1 > self.max_size and self._linecount > 0
+        ):
+            self._new_page()
+
+        self._linecount += 1
+
+        self._count += len(line) + 1
+        self._current_page.append(line)
+
+        if empty:
+            self._current_page.append('')
+            self._count += 1
+
+        # Start a new page if there were any overflow words
+        if remaining_words:
+            self._new_page()
+            self.add_line(remaining_words)
+
+    def _new_page(self) -> None:
+        """
+        Internal: start a new page for the paginator.
+        This closes the current page and resets the counters for the new page's line count and
+        character count.
+        """
+
+        self._linecount = 0
+        self._count = len(self.prefix) + 1
+        self.close_page()
+
+    def _split_remaining_words(
+        self, line: str, max_chars: int
+    ) -> t.Tuple[str, t.Optional[str]]:
+        """
+        Internal: split a line into two strings -- reduced_words and remaining_words.
+        reduced_words: the remaining words in `line`, after attempting to remove all words that
+            exceed `max_chars` (rounding down to the nearest word boundary).
+        remaining_words: the words in `line` which exceed `max_chars`. This value is None if
+            no words could be split from `line`.
+        If there are any remaining_words, an ellipses is appended to reduced_words and a
+        continuation header is inserted before remaining_words to visually communicate the line
+        continuation.
+        Return a tuple in the format (reduced_words, remaining_words).
+        """
+
+        reduced_words = []
+        remaining_words = []
+
+        # "(Continued)" is used on a line by itself to indicate the continuation of last page
+        continuation_header = '(Continued)\n-----------\n'
+        reduced_char_count = 0
+        is_full = False
+
+        for word in line.split(' '):
+            if is_full:
+                remaining_words.append(word)
+
+            elif len(word) + reduced_char_count <= max_chars:
+                reduced_words.append(word)
+                reduced_char_count += len(word) + 1
+            else:
+                # If reduced_words is empty, we were unable to split the words across pages
+                if not reduced_words:
+                    return line, None
+                is_full = True
+                remaining_words.append(word)
+        return (
+            ' '.join(reduced_words) + '...' if remaining_words else '',
+            continuation_header + ' '.join(remaining_words)
+            if remaining_words
+            else None,
+        )
+
+    @classmethod
+    def build_pages(
+        cls,
+        lines: t.List[str],
+        prefix: str = '',
+        suffix: str = '',
+        max_lines: t.Optional[int] = None,
+        max_size: int = 500,
+        scale_to_size: int = 2000,
+        empty: bool = True,
+        exception_on_empty_embed: bool = False,
+    ) -> t.List[str]:
+        """
+        Lay out lines into pages the same way `paginate` does.
+        The result can be kept and passed back to `paginate` as `pages` to skip laying them out again.
+        """
+
+        paginator = cls(
+            prefix=prefix,
+            suffix=suffix,
+            max_size=max_size,
+            max_lines=max_lines,
+            scale_to_size=scale_to_size,
+        )
+
+        if not lines:
+            if exception_on_empty_embed:
+                raise EmptyPaginatorEmbed('No lines to paginate')
+
+            lines = ['(nothing to display)']
+
+        for line in lines:
+            paginator.add_line(line, empty=empty)
+
+        return paginator.pages
+
+    @staticmethod
+    def _listen(
+        message: discord.Message,
+        embed: discord.Embed,
+        emojis: t.Sequence[str],
+        restrict_to_user: User,
+        timeout: int,
+        turn: t.Callable[[str], t.Awaitable[bool]],
+        on_close: t.Optional[t.Callable[[], t.Awaitable[None]]] = None,
+    ) -> None:
+        """
+        Route clicks on the pagination buttons under `message` to `turn`.
+        `turn` is awaited with the emoji of the clicked button, and returns whether it changed the embed.
+        The buttons are removed once nobody has clicked them for `timeout` seconds.
+        """
+
+        def check(inter: MessageInteraction) -> bool:
+            """Make sure that this click is by someone allowed to paginate."""
+            return inter.author.id == restrict_to_user.id or (
+                isinstance(inter.author, Member)
+                and any(
+                    role.id == MODERATOR_ROLE for role in inter.author.roles
+                )
+            )
+
+        session = INTERACTIONS.open(message, timeout, check)
+        lock = asyncio.Lock()
+
+        async def close() -> None:
+            if on_close is not None:
+                await on_close()
+
+        @session.no_checks
+        async def on_click(inter: MessageInteraction) -> None:
+            emoji = PAGINATION_IDS.get(inter.component.custom_id)
+
+            if emoji not in emojis:
+                await inter.create_response(
+                    type=ResponseType.DeferredUpdateMessage
+                )
+                return
+
+            if emoji == DELETE_EMOJI:
+                session.close()
+                await inter.create_response(
+                    type=ResponseType.DeferredUpdateMessage
+                )
+                await message.delete()
+                await close()
+                return
+
+            async with lock:
+                turning = asyncio.ensure_future(turn(emoji))
+                done, _ = await asyncio.wait(
+                    {turning}, timeout=ACKNOWLEDGE_WITHIN
+                )
+
+                if done and turning.result():
+                    # Changing page is the response itself, a single edit
+                    await inter.create_response(
+                        type=ResponseType.UpdateMessage, embed=embed
+                    )
+                    return
+
+                # Clicks have to be acknowledged quickly, even if the page is slow to load
+                await inter.create_response(
+                    type=ResponseType.DeferredUpdateMessage
+                )
+
+                if not done and await turning:
+                    await message.edit(embed=embed)
+
+        @session.timeout
+        async def on_timeout() -> None:
+            try:
+                with suppress(discord.NotFound):
+                    await message.edit(components=[])
+            finally:
+                await close()
+
+    @classmethod
+    async def paginate(
+        cls,
+        lines: t.List[str],
+        ctx: Context,
+        embed: discord.Embed,
+        prefix: str = '',
+        suffix: str = '',
+        max_lines: t.Optional[int] = None,
+        max_size: int = 500,
+        scale_to_size: int = 2000,
+        empty: bool = True,
+        restrict_to_user: User = None,
+        timeout: int = 300,
+        footer_text: str = None,
+        url: str = None,
+        exception_on_empty_embed: bool = False,
+        pages: t.Optional[t.List[str]] = None,
+    ) -> t.Optional[discord.Message]:
+        """
+        Use a paginator and set of buttons to provide pagination over a set of lines.
+        The buttons are used to switch page, or to finish with pagination.
+        When used, this will send a message using `ctx.send()` with a set of buttons under it. These buttons may
+        be used to change page, or to remove pagination from the message.
+        Pagination will also be removed automatically if no button is clicked for five minutes (300 seconds).
+        The interaction will be limited to `restrict_to_user` (ctx.author by default) or
+        to any user with a moderation role.
+        Clicks are handled by the shared interaction router, so this returns as soon as the message is sent.
+        Example:
+        >>> embed = discord.Embed()
+        >>> embed.set_author(name="Some Operation", url=url, icon_url=icon)
+        >>> await LinePaginator.paginate([line for line in lines], ctx, embed)
+        Pages that were already laid out with `build_pages` can be passed as `pages`, in which
+        case `lines` and the layout arguments are ignored.
+        """
+
+        current_page = 0
+
+        if not restrict_to_user:
+            restrict_to_user = ctx.author
+
+        if pages is None:
+            pages = cls.build_pages(
+                lines,
+                prefix=prefix,
+                suffix=suffix,
+                max_lines=max_lines,
+                max_size=max_size,
+                scale_to_size=scale_to_size,
+                empty=empty,
+                exception_on_empty_embed=exception_on_empty_embed,
+            )
+
+        def show(page: int) -> None:
+            embed.description = pages[page]
+
+            if footer_text:
+                embed.set_footer(
+                    text=f'{footer_text} (Page {page + 1}/{len(pages)})'
+                )
+            else:
+                embed.set_footer(text=f'Page {page + 1}/{len(pages)}')
+
+        if url:
+            embed.url = url
+
+        if len(pages) <= 1:
+            embed.description = pages[current_page]
+
+            if footer_text:
+                embed.set_footer(text=footer_text)
+
+            return await ctx.send(embed=embed)
+
+        show(current_page)
+        message = await ctx.send(
+            embed=embed, components=pagination_components(PAGINATION_EMOJI)
+        )
+
+        async def turn(emoji: str) -> bool:
+            nonlocal current_page
+
+            new_page = {
+                FIRST_EMOJI: 0,
+                LEFT_EMOJI: max(current_page - 1, 0),
+                RIGHT_EMOJI: min(current_page + 1, len(pages) - 1),
+                LAST_EMOJI: len(pages) - 1,
+            }[emoji]
+
+            if new_page == current_page:
+                return False
+
+            current_page = new_page
+            show(current_page)
+            return True
+
+        cls._listen(
+            message, embed, PAGINATION_EMOJI, restrict_to_user, timeout, turn
+        )
+
+        return message
+
+    @classmethod
+    async def paginate_lazily(
+        cls,
+        fetch_page: t.Callable[[int], t.Awaitable[t.List[str]]],
+        page_count: t.Optional[int],
+        ctx: Context,
+        embed: discord.Embed,
+        prefix: str = '',
+        suffix: str = '',
+        max_size: int = 2000,
+        scale_to_size: int = 2000,
+        empty: bool = True,
+        restrict_to_user: User = None,
+        timeout: int = 300,
+        footer_text: str = None,
+        url: str = None,
+        home_page: t.Optional[int] = None,
+        on_close: t.Optional[t.Callable[[], t.Awaitable[None]]] = None,
+    ) -> t.Optional[discord.Message]:
+        """
+        Like `paginate`, but only fetches the lines of a page when it's needed.
+        `fetch_page` is awaited with a 0-based page number and must return the lines of that page.
+        While a page is displayed, the following page is fetched in the background so that
+        moving forward doesn't wait on it. Only the pages next to the current one are kept.
+        If `home_page` is given, an extra button jumps straight to that page.
+        `page_count` can be `None` when the number of pages isn't known up front. The total is then
+        shown as unknown, there's no button to jump to the last page, and the first empty page
+        that is fetched marks the end.
+        `on_close` is awaited once the pagination has ended, for cleaning up whatever pages are read from.
+        Example:
+        >>> async def fetch_page(page: int) -> t.List[str]:
+        ...     return await get_lines(offset=page * 10, limit=10)
+        >>> await LinePaginator.paginate_lazily(fetch_page, page_count, ctx, embed)
+        """
+
+        if not restrict_to_user:
+            restrict_to_user = ctx.author
+
+        emojis = PAGINATION_EMOJI
+        if page_count is None:
+            emojis = tuple(emoji for emoji in emojis if emoji != LAST_EMOJI)
+        if home_page is not None:
+            emojis = (*emojis[:-1], HOME_EMOJI, DELETE_EMOJI)
+
+        fetches: t.Dict[int, asyncio.Task] = {}
+
+        def prefetch(page: int) -> None:
+            if (
+                page >= 0
+                and (page_count is None or page < page_count)
+                and page not in fetches
+            ):
+                fetches[page] = asyncio.create_task(fetch_page(page))
+
+        async def render(page: int) -> bool:
+            """Show a page, or return False if it turns out to be past the end."""
+            prefetch(page)
+            prefetch(page + 1)
+            lines = await fetches[page]
+
+            if not lines and page > 0:
+                return False
+
+            # Keep only the neighbouring pages so memory stays flat
+            for stale in [p for p in fetches if abs(p - page) > 1]:
+                fetches.pop(stale).cancel()
+
+            embed.description = cls.build_pages(
+                lines,
+                prefix=prefix,
+                suffix=suffix,
+                max_size=max_size,
+                scale_to_size=scale_to_size,
+                empty=empty,
+            )[0]
+
+            if page_count is None or page_count > 1:
+                total = '?' if page_count is None else page_count
+                if footer_text:
+                    embed.set_footer(
+                        text=f'{footer_text} (Page {page + 1}/{total})'
+                    )
+                else:
+                    embed.set_footer(text=f'Page {page + 1}/{total}')
+            elif footer_text:
+                embed.set_footer(text=footer_text)
+
+            return True
+
+        async def close() -> None:
+            for fetch in fetches.values():
+                fetch.cancel()
+
+            if on_close is not None:
+                await on_close()
+
+        current_page = 0
+
+        try:
+            if page_count is None:
+                # Whether there's more than one page decides if buttons are added at all
+                prefetch(current_page)
+                prefetch(current_page + 1)
+                if not await fetches[current_page + 1]:
+                    page_count = 1
+
+            await render(current_page)
+
+            if url:
+                embed.url = url
+
+            if page_count is not None and page_count <= 1:
+                message = await ctx.send(embed=embed)
+                await close()
+                return message
+
+            message = await ctx.send(
+                embed=embed, components=pagination_components(emojis)
+            )
+        except BaseException:
+            await close()
+            raise
+
+        async def turn(emoji: str) -> bool:
+            nonlocal current_page, page_count
+
+            last_page = (
+                current_page + 1 if page_count is None else page_count - 1
+            )
+            new_page = {
+                FIRST_EMOJI: 0,
+                LEFT_EMOJI: max(current_page - 1, 0),
+                RIGHT_EMOJI: min(current_page + 1, last_page),
+                LAST_EMOJI: last_page,
+                HOME_EMOJI: home_page,
+            }[emoji]
+
+            if new_page == current_page:
+                return False
+
+            if await render(new_page):
+                current_page = new_page
+            elif page_count is None and new_page == current_page + 1:
+                # The page after this one is empty, so this is the last
+                page_count = new_page
+                await render(current_page)
+            else:
+                return False
+
+            return True
+
+        cls._listen(
+            message, embed, emojis, restrict_to_user, timeout, turn, close
+        )
+
+        return message
+
+    @classmethod
+    async def paginate_stream(
+        cls,
+        lines: t.AsyncIterable[str],
+        ctx: Context,
+        embed: discord.Embed,
+        prefix: str = '',
+        suffix: str = '',
+        max_lines: int = 10,
+        max_size: int = 500,
+        empty: bool = True,
+        **kwargs: t.Any,
+    ) -> t.Optional[discord.Message]:
+        """
+        Like `paginate`, but takes its lines from an async iterator as the pages are shown.
+        Lines are only read when a page that hasn't been seen yet (or the one after it) is needed,
+        so the first page of a huge result set is sent without waiting for the rest of it.
+        The total number of pages stays unknown until the iterator runs out. Pages that were
+        already read are kept so that going back doesn't need the iterator to restart.
+        The iterator is closed once the pagination has ended.
+        Other keyword arguments are passed on to `paginate_lazily`.
+        Example:
+        >>> async def lines() -> t.AsyncIterator[str]:
+        ...     async for row in cursor:
+        ...         yield format_row(row)
+        >>> await LinePaginator.paginate_stream(lines(), ctx, embed, max_lines=10)
+        """
+
+        iterator = lines.__aiter__()
+        pages: t.List[t.List[str]] = []
+        lock = asyncio.Lock()
+        exhausted = False
+        held_over: t.Optional[str] = None
+
+        async def read_page() -> t.List[str]:
+            nonlocal exhausted, held_over
+
+            # Pages are broken up the same way `add_line` does it
+            page_lines: t.List[str] = []
+            size = len(prefix) + 1
+
+            while len(page_lines) < max_lines:
+                if held_over is None:
+                    try:
+                        held_over = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+
+                if page_lines and size + len(held_over) + 1 > max_size:
+                    break
+
+                page_lines.append(held_over)
+                size += len(held_over) + (2 if empty else 1)
+                held_over = None
+
+            return page_lines
+
+        async def read_up_to(page: int) -> None:
+            # Pages are read in order, even when the next one is prefetched
+            async with lock:
+                while len(pages) <= page and not exhausted:
+                    page_lines = await read_page()
+                    if page_lines:
+                        pages.append(page_lines)
+
+        reads: t.Set[asyncio.Task] = set()
+
+        async def fetch_page(page: int) -> t.List[str]:
+            # Dropped prefetches are cancelled, which mustn't interrupt the iterator mid-line
+            read = asyncio.create_task(read_up_to(page))
+            reads.add(read)
+            read.add_done_callback(reads.discard)
+            await asyncio.shield(read)
+
+            return pages[page] if page < len(pages) else []
+
+        async def close() -> None:
+            for read in reads:
+                read.cancel()
+            await asyncio.gather(*reads, return_exceptions=True)
+
+            if hasattr(iterator, 'aclose'):
+                await iterator.aclose()
+
+        return await cls.paginate_lazily(
+            fetch_page,
+            None,
+            ctx,
+            embed,
+            prefix=prefix,
+            suffix=suffix,
+            max_size=max_size,
+            empty=empty,
+            on_close=close,
+            **kwargs,
+        )
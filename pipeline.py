@@ -0,0 +1,100 @@
+import asyncio
+from sys import stderr
+from time import perf_counter
+from traceback import print_exception
+from typing import Awaitable, Callable, Dict, List
+
+from discord import Member, Message
+
+from config import CONFIG
+
+XP_CHANNELS = frozenset(CONFIG.xp.channels)
+
+
+class MessageContext:
+    """Everything the message stages need to know about one message
+
+    The channel and mentions are classified once when the context is
+    built, so each stage doesn't have to repeat the work.
+    """
+
+    def __init__(self, message: Message):
+        self.message = message
+        self.author = message.author
+        self.is_bot = message.author.bot
+        self.channel_id = message.channel.id
+        self.is_xp_channel = self.channel_id in XP_CHANNELS
+        self.is_outside_heists = (
+            self.channel_id == CONFIG.guild.channels.outside_heists
+        )
+        self.mentions: List[Member] = [
+            user for user in message.mentions if not user.bot
+        ]
+
+
+Stage = Callable[[MessageContext], Awaitable[None]]
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def record(self, elapsed: float) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+
+class MessagePipeline:
+    """Runs every registered stage on each guild message
+
+    Stages run concurrently, like separate `on_message` listeners would,
+    but share one `MessageContext`. The time each stage takes is recorded
+    so slow stages show up in `!pipelinestats`.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self.stats: Dict[str, StageStats] = {}
+
+    def register(self, name: str, stage: Stage) -> None:
+        self.stages[name] = stage
+        self.stats.setdefault(name, StageStats())
+
+    def unregister(self, name: str) -> None:
+        self.stages.pop(name, None)
+
+    async def _run(
+        self, name: str, stage: Stage, context: MessageContext
+    ) -> None:
+        start = perf_counter()
+
+        try:
+            await stage(context)
+        except Exception as error:
+            print_exception(
+                type(error), error, error.__traceback__, file=stderr
+            )
+        finally:
+            self.stats[name].record(perf_counter() - start)
+
+    async def process(self, message: Message) -> MessageContext:
+        context = MessageContext(message)
+
+        await asyncio.gather(
+            *(
+                self._run(name, stage, context)
+                for name, stage in list(self.stages.items())
+            )
+        )
+
+        return context
+
+
+PIPELINE = MessagePipeline()
@@ -0,0 +1,273 @@
+import asyncio
+from sys import stderr
+from time import monotonic, perf_counter
+from traceback import print_exception
+from typing import (
+    Any,
+    Awaitable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from discord import Embed, Member
+from discord.utils import escape_markdown
+
+from config import CONFIG
+from database import User as DbUser
+from database import xp_to_level
+from leaderboard import LEADERBOARD
+from repository import get_user
+from unbelievaboat import UNBELIEVABOAT, UnbelievaBoatError
+
+T = TypeVar('T')
+
+PROFILE_TTL = 30  # seconds
+MAX_CACHED_PROFILES = 500
+
+PRONOUN_ROLES = frozenset(CONFIG.guild.pronoun_roles)
+AGE_ROLES = frozenset(CONFIG.guild.age_roles)
+NOTIFICATION_ROLES: Dict[int, str] = {
+    CONFIG.guild.notification_roles.announcements: 'Announcements',
+    CONFIG.guild.notification_roles.partnerships: 'Partnerships',
+    CONFIG.guild.notification_roles.giveaways: 'Giveaways',
+    CONFIG.guild.notification_roles.events: 'Events',
+    CONFIG.guild.notification_roles.heists: 'Heists',
+    CONFIG.guild.notification_roles.outside_heists: 'Outside heists',
+    CONFIG.guild.notification_roles.suggestions: 'Suggestions',
+    CONFIG.guild.notification_roles.new_members: 'New members',
+    CONFIG.guild.notification_roles.chat_revival: 'Chat revival',
+    CONFIG.guild.notification_roles.bump_reminders: 'Bump reminders',
+}
+
+# Roles that are already shown elsewhere in the profile
+HIDDEN_ROLES = frozenset(
+    {
+        *CONFIG.xp.roles.values(),
+        CONFIG.guild.roles.member,
+        *PRONOUN_ROLES,
+        *AGE_ROLES,
+        *NOTIFICATION_ROLES,
+    }
+)
+
+
+class RoleGroups(NamedTuple):
+    pronouns: List[str]
+    age: Optional[str]
+    notifications: List[str]
+    other: List[str]
+
+
+def classify_roles(member: Member) -> RoleGroups:
+    """Sorts a member's roles into profile sections in a single pass"""
+
+    pronouns = []
+    age = None
+    notifications = []
+    other = []
+
+    # Highest roles first, skipping @everyone
+    for role in reversed(member.roles[1:]):
+        role_id = role.id
+
+        if role_id in PRONOUN_ROLES:
+            pronouns.append(role.mention)
+        elif role_id in AGE_ROLES:
+            age = role.mention
+        elif role_id in NOTIFICATION_ROLES:
+            notifications.append(NOTIFICATION_ROLES[role_id])
+
+        if role_id not in HIDDEN_ROLES:
+            other.append(role.mention)
+
+    pronouns.reverse()
+
+    return RoleGroups(pronouns, age, notifications, other)
+
+
+async def timed(
+    timings: Dict[str, float], name: str, awaitable: Awaitable[T]
+) -> T:
+    start = perf_counter()
+
+    try:
+        return await awaitable
+    finally:
+        timings[name] = perf_counter() - start
+
+
+class ProfileCache:
+    """Builds `!me` profiles and keeps them for a short time
+
+    The account and the UnbelievaBoat balance are fetched at the same
+    time. A cached profile is only reused while the member's XP, roles,
+    name and avatar are unchanged, so it never shows stale levels or
+    roles; AFK changes invalidate it explicitly.
+    """
+
+    def __init__(self, ttl: float = PROFILE_TTL):
+        self.ttl = ttl
+        self._profiles: Dict[int, Tuple[float, Tuple[Any, ...], Embed]] = {}
+
+    @staticmethod
+    def _fingerprint(member: Member) -> Tuple[Any, ...]:
+        return (
+            LEADERBOARD.xp(member.id),
+            frozenset(role.id for role in member.roles),
+            member.display_name,
+            str(member.avatar_url),
+        )
+
+    def invalidate(self, user_id: int) -> None:
+        self._profiles.pop(user_id, None)
+
+    async def get(
+        self, member: Member, timings: Optional[Dict[str, float]] = None
+    ) -> Embed:
+        """Returns a member's profile embed
+
+        Pass a dict as `timings` to have it filled with how long each
+        data source took, in seconds. Timings are only recorded for
+        profiles that weren't cached.
+        """
+
+        if timings is None:
+            timings = {}
+
+        fingerprint = self._fingerprint(member)
+        cached = self._profiles.get(member.id)
+
+        if (
+            cached is not None
+            and monotonic() - cached[0] < self.ttl
+            and cached[1] == fingerprint
+        ):
+            return cached[2]
+
+        start = perf_counter()
+        account, balance = await asyncio.gather(
+            timed(timings, 'MongoDB', get_user(member.id)),
+            timed(timings, 'UnbelievaBoat', self._balance(member.id)),
+        )
+        timings['Total'] = perf_counter() - start
+
+        embed = self._render(member, account, balance)
+
+        # Profiles that lack their balance are worth rebuilding
+        if balance is not None:
+            self._store(member.id, fingerprint, embed)
+
+        return embed
+
+    @staticmethod
+    async def _balance(user_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            return await UNBELIEVABOAT.get_balance(user_id)
+        except UnbelievaBoatError as error:
+            print_exception(
+                type(error), error, error.__traceback__, file=stderr
+            )
+            return None
+
+    def _store(
+        self, user_id: int, fingerprint: Tuple[Any, ...], embed: Embed
+    ) -> None:
+        self._profiles[user_id] = (monotonic(), fingerprint, embed)
+
+        # Drop expired profiles so the cache doesn't grow with every user
+        if len(self._profiles) > MAX_CACHED_PROFILES:
+            now = monotonic()
+            self._profiles = {
+                key: value
+                for key, value in self._profiles.items()
+                if now - value[0] < self.ttl
+            }
+
+    @staticmethod
+    def _render(
+        member: Member, account: DbUser, balance: Optional[Dict[str, Any]]
+    ) -> Embed:
+        embed = Embed(
+            title=member.display_name,
+            description=f'{member.mention} - `{escape_markdown(str(member))}`',
+            color=member.color,
+            timestamp=member.joined_at,
+        )
+
+        if account.afk is not None:
+            embed.add_field(
+                name='AFK Reason', value=account.afk.reason, inline=False
+            )
+
+        roles = classify_roles(member)
+
+        if roles.pronouns:
+            embed.add_field(name='Pronouns', value=', '.join(roles.pronouns))
+
+        if roles.age:
+            embed.add_field(name='Age Range', value=roles.age)
+
+        # The leaderboard includes XP that hasn't been flushed yet
+        xp = LEADERBOARD.xp(member.id)
+
+        if xp is None:
+            xp = account.xp
+
+        experience = 'Level {:,} ({:,} XP)'.format(xp_to_level(xp), xp)
+        rank = LEADERBOARD.rank(member.id)
+
+        if rank is not None:
+            experience += ' (Rank: {:,})'.format(rank)
+
+        embed.add_field(name='Experience', value=experience)
+
+        if balance is not None:
+            value = '{} {:,} (Rank: {:,})'.format(
+                '<:sunset_coin:815373344832487524>',
+                balance['total'],
+                int(balance['rank']),
+            )
+        else:
+            value = 'Unavailable right now'
+
+        embed.add_field(name='UnbelievaBoat Balance', value=value)
+
+        if roles.other:
+            embed.add_field(
+                name='Other Roles', value=', '.join(roles.other), inline=False
+            )
+
+        if roles.notifications:
+            embed.add_field(
+                name='Notification Roles',
+                value=', '.join(roles.notifications),
+            )
+
+        embed.set_footer(text=f'{member.id} - Joined at')
+        embed.set_thumbnail(url=member.avatar_url)
+
+        return embed
+
+
+def timings_embed(embed: Embed, timings: Dict[str, float]) -> Embed:
+    """Returns a copy of a profile with its data source timings added"""
+
+    embed = embed.copy()
+    embed.add_field(
+        name='Timings',
+        value='\n'.join(
+            f'{name}: {seconds * 1000:.1f} ms'
+            for name, seconds in timings.items()
+        )
+        or 'Cached',
+        inline=False,
+    )
+
+    return embed
+
+
+PROFILES = ProfileCache()
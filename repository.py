@@ -0,0 +1,285 @@
+from asyncio import (
+    CancelledError,
+    Future,
+    ensure_future,
+    get_running_loop,
+    shield,
+)
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from pymongo import UpdateOne
+
+import database
+from config import CONFIG
+from database import USER_CACHE, User
+from leaderboard import LEADERBOARD
+
+T = TypeVar('T')
+
+# pymongo blocks, so every query runs on this pool instead of the event
+# loop. It never needs more threads than the client has sockets.
+_executor = ThreadPoolExecutor(
+    max_workers=CONFIG.database.pool_size, thread_name_prefix='mongo'
+)
+
+
+async def run_sync(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a blocking database call on the database thread pool"""
+
+    return await get_running_loop().run_in_executor(
+        _executor, partial(func, *args, **kwargs)
+    )
+
+
+async def get_user(user_id: int) -> User:
+    return await run_sync(database.get_user, user_id)
+
+
+async def update_user(account: User, **changes: Any) -> User:
+    """Applies the given field changes to an account and saves it"""
+
+    for field, value in changes.items():
+        setattr(account, field, value)
+
+    return await run_sync(account.save)
+
+
+async def all_xp() -> List[Tuple[int, int]]:
+    """Returns every account's `(user_id, xp)` from a single query"""
+
+    def fetch() -> List[Tuple[int, int]]:
+        # pylint: disable=protected-access
+        return [
+            (document['_id'], document.get('xp', 0))
+            for document in User._get_collection().find({}, {'xp': 1})
+        ]
+
+    return await run_sync(fetch)
+
+
+async def load_leaderboard() -> None:
+    """Fills the in-memory leaderboard with every account's XP"""
+
+    LEADERBOARD.load(await all_xp())
+
+
+async def leaderboard_page(
+    after: Optional[Tuple[int, int]], limit: int
+) -> List[Tuple[int, int]]:
+    """Fetches `(user_id, xp)` rows ranked after the given `(user_id, xp)`
+
+    This is keyset pagination on `(xp, _id)`, so it costs the same no
+    matter how deep into the leaderboard the page is.
+    """
+
+    query = {}
+
+    if after is not None:
+        user_id, xp = after
+        query = {
+            '$or': [
+                {'xp': {'$lt': xp}},
+                {'xp': xp, '_id': {'$gt': user_id}},
+            ]
+        }
+
+    def fetch() -> List[Tuple[int, int]]:
+        # pylint: disable=protected-access
+        cursor = (
+            User._get_collection()
+            .find(query, {'xp': 1})
+            .sort([('xp', -1), ('_id', 1)])
+            .limit(limit)
+        )
+        return [
+            (document['_id'], document.get('xp', 0)) for document in cursor
+        ]
+
+    return await run_sync(fetch)
+
+
+async def leaderboard_entry(index: int) -> Optional[Tuple[int, int]]:
+    """Returns the `(user_id, xp)` row at a 0-based position in the database
+
+    Only used to start paging from the database until the in-memory
+    leaderboard finishes loading.
+    """
+
+    rows = await run_sync(
+        lambda: [
+            (account.id, account.xp)
+            for account in User.objects()  # pylint: disable=no-member
+            .order_by('-xp', '+user_id')
+            .only('xp')
+            .skip(index)
+            .limit(1)
+        ]
+    )
+
+    return rows[0] if rows else None
+
+
+async def count_users() -> int:
+    if LEADERBOARD.loaded:
+        return len(LEADERBOARD)
+
+    return await run_sync(User.objects.count)  # pylint: disable=no-member
+
+
+async def stream_user_ids(batch_size: int) -> AsyncIterator[List[int]]:
+    """Yields every user ID in batches, only holding one batch at a time"""
+
+    # pylint: disable=protected-access
+    cursor = User._get_collection().find(
+        {}, {'_id': 1}, batch_size=batch_size
+    )
+
+    try:
+        while True:
+            batch = await run_sync(
+                lambda: [
+                    document['_id']
+                    for document in islice(cursor, batch_size)
+                ]
+            )
+
+            if not batch:
+                return
+
+            yield batch
+    finally:
+        cursor.close()
+
+
+async def delete_users(user_ids: List[int]) -> int:
+    """Deletes many users with a single server-side delete
+
+    Their unwritten XP is dropped first, so a flush can't recreate them.
+    """
+
+    for user_id in user_ids:
+        XP_ACCUMULATOR.discard(user_id)
+
+    # pylint: disable=protected-access
+    result = await run_sync(
+        User._get_collection().delete_many, {'_id': {'$in': user_ids}}
+    )
+
+    for user_id in user_ids:
+        USER_CACHE.invalidate(user_id)
+        LEADERBOARD.remove(user_id)
+
+    return result.deleted_count
+
+
+class XPAccumulator:
+    """Buffers XP gains in memory and writes them to Mongo in bulk
+
+    `pending` holds the increments that haven't been written yet. Users'
+    latest XP, stored plus pending, is read from and written back to the
+    in-memory leaderboard, so level-ups can be detected without reading
+    the account on every message. Deleting a user removes them from the
+    leaderboard, so a user who comes back starts over from their account.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.pending: Dict[int, int] = {}
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.pending) >= self.max_pending
+
+    async def add(self, user_id: int, amount: int) -> Tuple[int, int]:
+        """Adds XP to a user, returning their XP before and after"""
+
+        before = LEADERBOARD.xp(user_id)
+
+        if before is None:
+            account = await get_user(user_id)
+
+            # Another message may have been counted while this one waited
+            before = LEADERBOARD.xp(user_id)
+
+            if before is None:
+                before = account.xp
+
+        # Taking away more than a user has would leave them with negative XP
+        amount = max(amount, -before)
+
+        LEADERBOARD.update(user_id, before + amount)
+        self.pending[user_id] = self.pending.get(user_id, 0) + amount
+
+        return before, before + amount
+
+    def discard(self, user_id: int) -> None:
+        """Drops a user's unwritten XP, for when they're deleted"""
+
+        self.pending.pop(user_id, None)
+
+    def _take_pending(self) -> Dict[int, int]:
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def _restore_pending(self, pending: Dict[int, int]) -> None:
+        for user_id, amount in pending.items():
+            self.pending[user_id] = self.pending.get(user_id, 0) + amount
+
+    @staticmethod
+    def _write(pending: Dict[int, int]) -> None:
+        # pylint: disable=protected-access
+        User._get_collection().bulk_write(
+            [
+                UpdateOne(
+                    {'_id': user_id}, {'$inc': {'xp': amount}}, upsert=True
+                )
+                for user_id, amount in pending.items()
+            ],
+            ordered=False,
+        )
+
+        # $inc bypasses the document API, so cached copies are now stale
+        for user_id in pending:
+            USER_CACHE.invalidate(user_id)
+
+    def _restore_if_failed(
+        self, pending: Dict[int, int], write: 'Future[None]'
+    ) -> None:
+        if write.cancelled() or write.exception() is not None:
+            self._restore_pending(pending)
+
+    async def flush(self) -> None:
+        """Writes every pending increment in one unordered bulk write"""
+
+        pending = self._take_pending()
+
+        if not pending:
+            return
+
+        write = ensure_future(run_sync(self._write, pending))
+
+        try:
+            await shield(write)
+        except CancelledError:
+            # The write carries on in its thread after the flush is
+            # cancelled, so the increments only go back if it fails
+            write.add_done_callback(partial(self._restore_if_failed, pending))
+            raise
+        except Exception:
+            self._restore_pending(pending)
+            raise
+
+
+XP_ACCUMULATOR = XPAccumulator(CONFIG.xp.flush_threshold)
@@ -0,0 +1,269 @@
+from typing import (
+    AbstractSet,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Sequence,
+    Tuple,
+)
+
+from discord import Member, Object
+from dislash import (
+    ActionRow,
+    Button,
+    ButtonStyle,
+    MessageInteraction,
+    SelectMenu,
+    SelectOption,
+    auto_rows,
+)
+
+from config import CONFIG
+from interactions import INTERACTIONS, encode_custom_id
+
+TOGGLE_ACTION = 'role'
+SELECT_ACTION = 'roles'
+
+NO_PERMISSION = "You don't have permission to access those roles."
+
+
+class RoleCategory:
+    """One category of self roles, compiled once when the bot starts
+
+    Components only depend on which of the category's roles a member
+    already has, so they're built once for each combination and reused.
+    Their custom IDs carry the role or category they're for, so the
+    persistent handlers below can serve them without any state.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        label: str,
+        description: str,
+        roles: Sequence[Tuple[str, int]],
+        required_roles: Iterable[int] = (),
+    ):
+        self.key = key
+        self.label = label
+        self.description = description
+        self.roles = tuple(roles)
+        self.role_ids = frozenset(role_id for _, role_id in self.roles)
+        self.required_roles = frozenset(required_roles)
+        self.option = SelectOption(label, key, description)
+        self._components: Dict[FrozenSet[int], List[ActionRow]] = {}
+
+    def is_allowed(self, held: AbstractSet[int]) -> bool:
+        return not self.required_roles or not self.required_roles.isdisjoint(
+            held
+        )
+
+    def components(self, held: AbstractSet[int]) -> List[ActionRow]:
+        """Returns toggle buttons and a multi-select menu for a member"""
+
+        held = self.role_ids.intersection(held)
+        components = self._components.get(held)
+
+        if components is None:
+            components = self._components[held] = [
+                *auto_rows(
+                    *(
+                        Button(
+                            style=ButtonStyle.green
+                            if role_id in held
+                            else ButtonStyle.red,
+                            label=name,
+                            custom_id=encode_custom_id(
+                                TOGGLE_ACTION, role_id.to_bytes(8, 'big')
+                            ),
+                        )
+                        for name, role_id in self.roles
+                    )
+                ),
+                ActionRow(
+                    SelectMenu(
+                        custom_id=encode_custom_id(
+                            SELECT_ACTION, self.key.encode()
+                        ),
+                        placeholder='Or pick several roles at once',
+                        min_values=0,
+                        max_values=len(self.roles),
+                        options=[
+                            SelectOption(
+                                name, str(role_id), default=role_id in held
+                            )
+                            for name, role_id in self.roles
+                        ],
+                    )
+                ),
+            ]
+
+        return components
+
+    async def apply(
+        self, member: Member, selected: AbstractSet[int]
+    ) -> Tuple[FrozenSet[int], FrozenSet[int]]:
+        """Gives a member exactly the selected roles from this category
+
+        Only the roles that change are added or removed, so roles the
+        member gains or loses elsewhere in the meantime are left alone.
+        Returns the added and removed role IDs.
+        """
+
+        selected = self.role_ids.intersection(selected)
+        current = self.role_ids.intersection(role.id for role in member.roles)
+        added = selected - current
+        removed = current - selected
+
+        if removed:
+            await member.remove_roles(
+                *(Object(role_id) for role_id in removed), reason='Self roles'
+            )
+
+        if added:
+            await member.add_roles(
+                *(Object(role_id) for role_id in added), reason='Self roles'
+            )
+
+        return added, removed
+
+
+CATEGORIES: Dict[str, RoleCategory] = {
+    category.key: category
+    for category in (
+        RoleCategory(
+            'pings',
+            'Ping roles',
+            "Stay up-to-date with what's going on in our server",
+            [
+                ('Announements', 805309692720054313),
+                ('Giveaways', 805309733808111626),
+                ('Events', 808618482592645160),
+                ('Heists', 844020589060423680),
+                ('Outside heists', 844009948828663841),
+                ('Suggestions', 806217674739810315),
+                ('New members', 806661390512947201),
+                ('Chat revival', 822189272298815509),
+                ('Disboard bumps', 815398025430171679),
+            ],
+        ),
+        RoleCategory(
+            'colors',
+            'Color roles',
+            'Change the color of your name',
+            [
+                ('Bronze', 816911841468481567),
+                ('Lemon', 816911905851572246),
+                ('Emerald', 816911951657041920),
+                ('Sky', 816912055675125760),
+                ('Indigo', 816912112206872576),
+                ('Grape', 816912161485488129),
+            ],
+            required_roles=[
+                CONFIG.guild.roles.staff,
+                CONFIG.guild.roles.vip,
+                816915687133151254,
+            ],
+        ),
+        RoleCategory(
+            'ages',
+            'Age roles',
+            'Tell others how old you are',
+            [
+                ('13-17', 831420695018733598),
+                ('18-24', 831420733006544906),
+                ('25+', 831420769024213023),
+            ],
+        ),
+        RoleCategory(
+            'megaphones',
+            'Megaphone roles',
+            'Get access to our fun megaphone channels',
+            [
+                ('Questions', 835011913430597642),
+                ('Facts', 835011978304946207),
+                ('Photos', 835012036642865153),
+            ],
+        ),
+        RoleCategory(
+            'pronouns',
+            'Pronoun roles',
+            'Tell others how to refer to you',
+            [
+                ('He/him', 854076070127337472),
+                ('She/her', 854076069350342667),
+                ('They/them', 854076068952801320),
+                ('Ask me', 854076068406362172),
+                ('Any pronouns', 854076067392389141),
+            ],
+        ),
+        RoleCategory(
+            'continents',
+            'Continent roles',
+            'Tell others where you live',
+            [
+                ('North America', 855185170705416203),
+                ('South America', 855185263428370451),
+                ('Africa', 855185368306155593),
+                ('Asia', 855185423873081385),
+                ('Antarctica', 855185477925208074),
+                ('Europe', 855185537853292554),
+                ('Australia', 855185621295169547),
+            ],
+        ),
+    )
+}
+
+ROLE_CATEGORIES: Dict[int, RoleCategory] = {
+    role_id: category
+    for category in CATEGORIES.values()
+    for role_id in category.role_ids
+}
+
+
+@INTERACTIONS.persistent(TOGGLE_ACTION)
+async def toggle_role(inter: MessageInteraction, payload: bytes) -> None:
+    role_id = int.from_bytes(payload, 'big')
+    category = ROLE_CATEGORIES.get(role_id)
+
+    if category is None:
+        return
+
+    if not category.is_allowed({role.id for role in inter.author.roles}):
+        await inter.reply(NO_PERMISSION, ephemeral=True)
+        return
+
+    role = inter.guild.get_role(role_id)
+
+    if role in inter.author.roles:
+        await inter.author.remove_roles(role, reason='Self role')
+        await inter.reply(f'Removed the {role.mention} role', ephemeral=True)
+    else:
+        await inter.author.add_roles(role, reason='Self role')
+        await inter.reply(f'Gave you the {role.mention} role', ephemeral=True)
+
+
+@INTERACTIONS.persistent(SELECT_ACTION)
+async def select_roles(inter: MessageInteraction, payload: bytes) -> None:
+    category = CATEGORIES.get(payload.decode())
+
+    if category is None:
+        return
+
+    if not category.is_allowed({role.id for role in inter.author.roles}):
+        await inter.reply(NO_PERMISSION, ephemeral=True)
+        return
+
+    options = inter.select_menu.selected_options
+    added, removed = await category.apply(
+        inter.author, {int(option.value) for option in options}
+    )
+    changes = [f'Gave you <@&{role_id}>' for role_id in added] + [
+        f'Removed <@&{role_id}>' for role_id in removed
+    ]
+
+    await inter.reply(
+        '\n'.join(changes) or 'Your roles are already up to date',
+        ephemeral=True,
+    )
@@ -1,330 +1,398 @@
-from copy import copy
-from datetime import timedelta
-from typing import Optional
-from uuid import uuid4
-
-from better_profanity import profanity
-from discord import Color, Embed, Member, Message
-from discord.ext import commands
-from discord.utils import get
-from dislash import Button, ButtonStyle, SelectMenu, SelectOption
-from tweepy import API as TwitterAPI
-from tweepy import OAuthHandler as TwitterOAuthHandler
-
-from config import CONFIG
-from database import Topic, User
-from utils import confirm_buttons, get_random_documents, send_webhook
-
-
-def chat_only(ctx: commands.Context) -> bool:
-    return ctx.channel.id == CONFIG.guild.channels.chat
-
-
-def giveaways_only(ctx: commands.Context) -> bool:
-    return ctx.channel.id == CONFIG.guild.channels.giveaways
-
-
-twitter_auth = TwitterOAuthHandler(
-    CONFIG.twitter.api_key, CONFIG.twitter.api_secret_key
-)
-twitter_auth.set_access_token(
-    CONFIG.twitter.access_token, CONFIG.twitter.access_token_secret
-)
-
-twitter_api = TwitterAPI(twitter_auth)
-
-
-class StaffCog(commands.Cog, name='Staff Tools'):
-    def __init__(self, bot: commands.Bot):
-        self.bot = bot
-
-    @commands.command()
-    @commands.has_role(CONFIG.guild.roles.staff)
-    async def leave(
-        self, ctx: commands.Context, *, message: Optional[str] = None
-    ) -> None:
-        """Toggles your leave status"""
-
-        leave_role = get(ctx.guild.roles, id=CONFIG.guild.roles.staff_leave)
-
-        if leave_role in ctx.author.roles:
-            msg, on_click = await confirm_buttons(
-                ctx, "Are you sure you'd like to turn off your leave status?"
-            )
-
-            @on_click.matching_id('yes_button')
-            async def on_yes_button(inter):
-                await ctx.author.remove_roles(
-                    leave_role, reason='Self-toggled staff leave role'
-                )
-
-                await msg.edit(
-                    components=[],
-                    embed=Embed(
-                        title='Turned staff leave off',
-                        color=Color.green(),
-                    ),
-                )
-
-        else:
-            msg, on_click = await confirm_buttons(
-                ctx, "Are you sure you'd like to turn on your leave status?"
-            )
-
-            @on_click.matching_id('yes_button')
-            async def on_yes_button(inter):
-                await ctx.author.add_roles(
-                    leave_role, reason='Self-toggled staff leave role'
-                )
-
-                await msg.edit(
-                    components=[],
-                    embed=Embed(
-                        title='Turned staff leave on',
-                        color=Color.green(),
-                    ),
-                )
-
-                if message:
-                    embed = Embed(
-                        description=profanity.censor(message, censor_char='•'),
-                        color=Color.blurple(),
-                    )
-                    embed.set_author(
-                        name=str(ctx.author), icon_url=ctx.author.avatar_url
-                    )
-
-                    await send_webhook(
-                        CONFIG.guild.webhooks.leave, embed=embed
-                    )
-
-    @commands.command(name='genselfroles')
-    @commands.is_owner()
-    async def generate_self_roles(self, ctx):
-        await ctx.send(
-            embed=Embed(
-                title='Select a category to view available roles',
-                color=Color.blurple(),
-            ),
-            components=[
-                SelectMenu(
-                    custom_id='selfroles',
-                    placeholder='Click me to select a category',
-                    options=[
-                        SelectOption(
-                            'Ping roles',
-                            'pings',
-                            "Stay up-to-date with what's going on in our server",
-                        ),
-                        SelectOption(
-                            'Color roles',
-                            'colors',
-                            'Change the color of your name',
-                        ),
-                        SelectOption(
-                            'Age roles', 'ages', 'Tell others how old you are'
-                        ),
-                        SelectOption(
-                            'Megaphone roles',
-                            'megaphones',
-                            'Get access to our fun megaphone channels',
-                        ),
-                        SelectOption(
-                            'Pronoun roles',
-                            'pronouns',
-                            'Tell others how to refer to you',
-                        ),
-                        SelectOption(
-                            'Continent roles',
-                            'continents',
-                            'Tell others where you live',
-                        ),
-                    ],
-                )
-            ],
-        )
-
-    def is_user_in_guild(self, user_id: int) -> bool:
-        guild = self.bot.guilds[0]
-        return guild.get_member(user_id) is not None
-
-    @commands.command(name='cleandb')
-    @commands.is_owner()
-    async def clean_database(self, ctx):
-        removed = 0
-
-        for document in User.objects:
-            if not self.is_user_in_guild(document.id):
-                document.delete()
-                removed += 1
-
-        await ctx.reply(
-            embed=Embed(
-                title=f'Removed {removed} users from the database',
-                color=Color.blurple(),
-            )
-        )
-
-    @commands.command()
-    @commands.is_owner()
-    async def blacklisted(
-        self, ctx: commands.Context, member: Member, time: str, *, reason: str
-    ) -> None:
-        """Notifies a user that they've been blacklisted from giveaways"""
-
-        embed = Embed(
-            title="You've been blacklisted from giveaways, lotteries, and events.",
-            description='You can appeal '
-            '[here](https://sunset.bsoyka.me/appeals) or undo this early by '
-            'purchasing `Escape Jail` from the UnbelievaBoat store.',
-            color=Color.red(),
-        )
-        embed.add_field(name='Time', value=time, inline=True)
-        embed.add_field(name='Reason', value=reason, inline=True)
-
-        try:
-            await member.send(embed=embed)
-        except:
-            await send_webhook(
-                CONFIG.guild.webhooks.blacklist, member.mention, embed=embed
-            )
-
-        await ctx.message.add_reaction('✅')
-
-    @commands.command(name='gawreqs')
-    @commands.is_owner()
-    async def did_not_meet_reqs(
-        self, ctx: commands.Context, member: Member
-    ) -> None:
-        """Notifies a user that their giveaway reaction has been removed"""
-
-        giveaway: Message = ctx.message.reference.resolved
-        jump = giveaway.jump_url
-
-        await giveaway.remove_reaction('🎉', member)
-
-        embed = Embed(
-            title='Your giveaway entry has been removed.',
-            description=f'You did not meet/complete the requirements for [this giveaway]({jump}).',
-            color=Color.red(),
-        )
-
-        await member.send(embed=embed)
-
-        await ctx.message.delete()
-
-    @commands.command()
-    @commands.has_role(CONFIG.guild.roles.moderator)
-    async def modnick(self, ctx: commands.Context, member: Member) -> None:
-        """Moderates the nickname of a member"""
-
-        await member.edit(
-            nick='Moderated name ' + str(uuid4())[:8],
-            reason=f'Moderated by {ctx.author}',
-        )
-        await ctx.message.add_reaction('✅')
-
-    @commands.command()
-    @commands.has_role(CONFIG.guild.roles.helper)
-    @commands.cooldown(1, 3600, commands.BucketType.guild)
-    @commands.check(chat_only)
-    async def revive(
-        self, ctx: commands.Context, *, topic: Optional[str] = None
-    ) -> None:
-        """Pings the chat revival role
-
-        Can only be used in <#805289244049932319>.
-        """
-
-        embed = Embed(title="Let's revive the chat!")
-        embed.set_author(name=ctx.author, icon_url=ctx.author.avatar_url)
-
-        if topic:
-            embed.description = topic
-        else:
-            document = get_random_documents(Topic, 1)[0]
-            embed.description = document.content
-
-            if document.thumbnail and document.thumbnail_approved:
-                embed.set_thumbnail(url=document.thumbnail)
-
-                if document.credit:
-                    embed.set_footer(text=document.credit)
-
-        await ctx.send(
-            f'<@&{CONFIG.guild.roles.reviver}>',
-            embed=embed,
-            components=[
-                Button(
-                    style=ButtonStyle.link,
-                    label='Share us on Twitter',
-                    url='https://twitter.com/intent/tweet?text=I%27m%20a%20member%20of%20%40SunsetVacation_%2C%20a%20%23DiscordServer%20dedicated%20to%20fostering%20%23FriendshipsThatLast%21%0A%0ACome%20join%20us%21&url=https%3A%2F%2Fdiscord.gg%2FfFPEFYUnVp&via=SunsetVacation_&related=discord',
-                )
-            ],
-        )
-
-        await ctx.message.delete()
-
-    @commands.command()
-    @commands.is_owner()
-    async def sudo(
-        self, ctx: commands.Context, user: Member, *, command: str
-    ) -> None:
-        """Processes a command as if it was sent by another user"""
-
-        fake_message = copy(ctx.message)
-
-        fake_message.author = user
-        fake_message.content = ctx.prefix + command
-
-        await self.bot.process_commands(fake_message)
-        await ctx.message.add_reaction('✅')
-
-    @commands.command()
-    @commands.check(giveaways_only)
-    async def claim(self, ctx: commands.Context, minutes: int) -> None:
-        """Shows a claim time limit for a giveaway
-
-        Must be used by replying to the giveaway winner message
-        """
-
-        winner_msg = ctx.message.reference.resolved
-        end_time = winner_msg.created_at + timedelta(minutes=minutes)
-
-        embed = Embed(timestamp=end_time, color=Color.blurple())
-        embed.set_footer(text='Must DM host (not sponsor) to claim by')
-
-        await winner_msg.reply('', embed=embed)
-        await ctx.message.delete()
-
-    @commands.command()
-    @commands.is_owner()
-    async def tweet(self, ctx: commands.Context, *, message: str) -> None:
-        """Tweets a message"""
-
-        length = len(message)
-
-        if length > 280:
-            await ctx.reply(
-                embed=Embed(
-                    title='Message too long',
-                    description=f'{length}/280 characters',
-                    color=Color.red(),
-                )
-            )
-            return
-
-        _, on_click = await confirm_buttons(
-            ctx, "Are you sure you'd like to send this Tweet?"
-        )
-
-        @on_click.matching_id('yes_button')
-        async def on_yes_button(inter):
-            status = twitter_api.update_status(message)
-            await ctx.reply(
-                f'https://twitter.com/{status.user.screen_name}/status/{status.id_str}'
-            )
-
-
-def setup(bot: commands.Bot) -> None:
-    bot.add_cog(StaffCog(bot))
+from copy import copy
+from datetime import timedelta
+from time import monotonic
+from typing import Optional
+from uuid import uuid4
+
+from better_profanity import profanity
+from discord import Color, Embed, Member, Message
+from discord.ext import commands
+from dislash import (
+    Button,
+    ButtonStyle,
+    MessageInteraction,
+    ResponseType,
+    SelectMenu,
+)
+from tweepy import API as TwitterAPI
+from tweepy import OAuthHandler as TwitterOAuthHandler
+from tweepy import TweepError
+
+from config import CONFIG
+from interactions import INTERACTIONS
+from repository import delete_users, stream_user_ids
+from selfroles import CATEGORIES
+from topics import TOPIC_POOL
+from utils import confirm_buttons, confirmation
+from webhooks import WEBHOOKS
+
+CLEAN_BATCH_SIZE = 1000
+CLEAN_PROGRESS_INTERVAL = 2  # seconds
+
+LEAVE_ACTION = 'leave'
+TWEET_ACTION = 'tweet'
+
+
+def chat_only(ctx: commands.Context) -> bool:
+    return ctx.channel.id == CONFIG.guild.channels.chat
+
+
+def giveaways_only(ctx: commands.Context) -> bool:
+    return ctx.channel.id == CONFIG.guild.channels.giveaways
+
+
+twitter_auth = TwitterOAuthHandler(
+    CONFIG.twitter.api_key, CONFIG.twitter.api_secret_key
+)
+twitter_auth.set_access_token(
+    CONFIG.twitter.access_token, CONFIG.twitter.access_token_secret
+)
+
+twitter_api = TwitterAPI(twitter_auth)
+
+
+class StaffCog(commands.Cog, name='Staff Tools'):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        INTERACTIONS.register(LEAVE_ACTION, confirmation(self.toggle_leave))
+        INTERACTIONS.register(TWEET_ACTION, confirmation(self.send_tweet))
+
+    def cog_unload(self) -> None:
+        INTERACTIONS.unregister(LEAVE_ACTION)
+        INTERACTIONS.unregister(TWEET_ACTION)
+
+    @commands.command()
+    @commands.has_role(CONFIG.guild.roles.staff)
+    async def leave(
+        self, ctx: commands.Context, *, message: Optional[str] = None
+    ) -> None:
+        """Toggles your leave status"""
+
+        turn_on = CONFIG.guild.roles.staff_leave not in (
+            role.id for role in ctx.author.roles
+        )
+
+        # The leave message rides along in the prompt until it's confirmed,
+        # so it's censored before anyone can see it there
+        if turn_on and message:
+            message = profanity.censor(message, censor_char='•')
+        else:
+            message = None
+
+        await confirm_buttons(
+            ctx,
+            "Are you sure you'd like to turn {} your leave status?".format(
+                'on' if turn_on else 'off'
+            ),
+            LEAVE_ACTION,
+            bytes([turn_on]),
+            description=message,
+        )
+
+    async def toggle_leave(
+        self, inter: MessageInteraction, payload: bytes
+    ) -> None:
+        leave_role = inter.guild.get_role(CONFIG.guild.roles.staff_leave)
+
+        if not payload[0]:
+            await inter.author.remove_roles(
+                leave_role, reason='Self-toggled staff leave role'
+            )
+
+            await inter.create_response(
+                type=ResponseType.UpdateMessage,
+                components=[],
+                embed=Embed(
+                    title='Turned staff leave off',
+                    color=Color.green(),
+                ),
+            )
+            return
+
+        await inter.author.add_roles(
+            leave_role, reason='Self-toggled staff leave role'
+        )
+
+        message = inter.message.embeds[0].description
+
+        await inter.create_response(
+            type=ResponseType.UpdateMessage,
+            components=[],
+            embed=Embed(
+                title='Turned staff leave on',
+                color=Color.green(),
+            ),
+        )
+
+        if message:
+            embed = Embed(description=message, color=Color.blurple())
+            embed.set_author(
+                name=str(inter.author), icon_url=inter.author.avatar_url
+            )
+
+            WEBHOOKS.send(
+                CONFIG.guild.webhooks.leave, embed=embed, coalesce=True
+            )
+
+    @commands.command(name='genselfroles')
+    @commands.is_owner()
+    async def generate_self_roles(self, ctx):
+        await ctx.send(
+            embed=Embed(
+                title='Select a category to view available roles',
+                color=Color.blurple(),
+            ),
+            components=[
+                SelectMenu(
+                    custom_id='selfroles',
+                    placeholder='Click me to select a category',
+                    options=[
+                        category.option
+                        for category in CATEGORIES.values()
+                    ],
+                )
+            ],
+        )
+
+    @commands.command(name='cleandb')
+    @commands.is_owner()
+    async def clean_database(
+        self, ctx: commands.Context, dry_run: bool = False
+    ) -> None:
+        """Removes users who have left the server from the database
+
+        Pass `true` to only count them without removing anything.
+        """
+
+        member_ids = {member.id for member in self.bot.guilds[0].members}
+        verb = 'Would remove' if dry_run else 'Removed'
+
+        scanned = stale = 0
+        last_progress = monotonic()
+
+        progress = await ctx.reply(
+            embed=Embed(title='Cleaning the database...', color=Color.gold())
+        )
+
+        async for user_ids in stream_user_ids(CLEAN_BATCH_SIZE):
+            stale_ids = [
+                user_id for user_id in user_ids if user_id not in member_ids
+            ]
+            scanned += len(user_ids)
+            stale += len(stale_ids)
+
+            if stale_ids and not dry_run:
+                await delete_users(stale_ids)
+
+            if monotonic() - last_progress >= CLEAN_PROGRESS_INTERVAL:
+                last_progress = monotonic()
+                await progress.edit(
+                    embed=Embed(
+                        title='Cleaning the database...',
+                        description=f'Scanned {scanned:,} users, '
+                        f'{verb.lower()} {stale:,}',
+                        color=Color.gold(),
+                    )
+                )
+
+        await progress.edit(
+            embed=Embed(
+                title=f'{verb} {stale:,} users from the database',
+                description=f'Scanned {scanned:,} users',
+                color=Color.blurple(),
+            )
+        )
+
+    @commands.command()
+    @commands.is_owner()
+    async def blacklisted(
+        self, ctx: commands.Context, member: Member, time: str, *, reason: str
+    ) -> None:
+        """Notifies a user that they've been blacklisted from giveaways"""
+
+        embed = Embed(
+            title="You've been blacklisted from giveaways, lotteries, and events.",
+            description='You can appeal '
+            '[here](https://sunset.bsoyka.me/appeals) or undo this early by '
+            'purchasing `Escape Jail` from the UnbelievaBoat store.',
+            color=Color.red(),
+        )
+        embed.add_field(name='Time', value=time, inline=True)
+        embed.add_field(name='Reason', value=reason, inline=True)
+
+        try:
+            await member.send(embed=embed)
+        except:
+            WEBHOOKS.send(
+                CONFIG.guild.webhooks.blacklist,
+                member.mention,
+                embed=embed,
+                coalesce=True,
+            )
+
+        await ctx.message.add_reaction('✅')
+
+    @commands.command(name='gawreqs')
+    @commands.is_owner()
+    async def did_not_meet_reqs(
+        self, ctx: commands.Context, member: Member
+    ) -> None:
+        """Notifies a user that their giveaway reaction has been removed"""
+
+        giveaway: Message = ctx.message.reference.resolved
+        jump = giveaway.jump_url
+
+        await giveaway.remove_reaction('🎉', member)
+
+        embed = Embed(
+            title='Your giveaway entry has been removed.',
+            description=f'You did not meet/complete the requirements for [this giveaway]({jump}).',
+            color=Color.red(),
+        )
+
+        await member.send(embed=embed)
+
+        await ctx.message.delete()
+
+    @commands.command()
+    @commands.has_role(CONFIG.guild.roles.moderator)
+    async def modnick(self, ctx: commands.Context, member: Member) -> None:
+        """Moderates the nickname of a member"""
+
+        await member.edit(
+            nick='Moderated name ' + str(uuid4())[:8],
+            reason=f'Moderated by {ctx.author}',
+        )
+        await ctx.message.add_reaction('✅')
+
+    @commands.command()
+    @commands.has_role(CONFIG.guild.roles.helper)
+    @commands.cooldown(1, 3600, commands.BucketType.guild)
+    @commands.check(chat_only)
+    async def revive(
+        self, ctx: commands.Context, *, topic: Optional[str] = None
+    ) -> None:
+        """Pings the chat revival role
+
+        Can only be used in <#805289244049932319>.
+        """
+
+        embed = Embed(title="Let's revive the chat!")
+        embed.set_author(name=ctx.author, icon_url=ctx.author.avatar_url)
+
+        if topic:
+            embed.description = topic
+        else:
+            document = await TOPIC_POOL.get()
+            embed.description = document.content
+
+            if document.thumbnail and document.thumbnail_approved:
+                embed.set_thumbnail(url=document.thumbnail)
+
+                if document.credit:
+                    embed.set_footer(text=document.credit)
+
+        await ctx.send(
+            f'<@&{CONFIG.guild.roles.reviver}>',
+            embed=embed,
+            components=[
+                Button(
+                    style=ButtonStyle.link,
+                    label='Share us on Twitter',
+                    url='https://twitter.com/intent/tweet?text=I%27m%20a%20member%20of%20%40SunsetVacation_%2C%20a%20%23DiscordServer%20dedicated%20to%20fostering%20%23FriendshipsThatLast%21%0A%0ACome%20join%20us%21&url=https%3A%2F%2Fdiscord.gg%2FfFPEFYUnVp&via=SunsetVacation_&related=discord',
+                )
+            ],
+        )
+
+        await ctx.message.delete()
+
+    @commands.command()
+    @commands.is_owner()
+    async def sudo(
+        self, ctx: commands.Context, user: Member, *, command: str
+    ) -> None:
+        """Processes a command as if it was sent by another user"""
+
+        fake_message = copy(ctx.message)
+
+        fake_message.author = user
+        fake_message.content = ctx.prefix + command
+
+        await self.bot.process_commands(fake_message)
+        await ctx.message.add_reaction('✅')
+
+    @commands.command()
+    @commands.check(giveaways_only)
+    async def claim(self, ctx: commands.Context, minutes: int) -> None:
+        """Shows a claim time limit for a giveaway
+
+        Must be used by replying to the giveaway winner message
+        """
+
+        winner_msg = ctx.message.reference.resolved
+        end_time = winner_msg.created_at + timedelta(minutes=minutes)
+
+        embed = Embed(timestamp=end_time, color=Color.blurple())
+        embed.set_footer(text='Must DM host (not sponsor) to claim by')
+
+        await winner_msg.reply('', embed=embed)
+        await ctx.message.delete()
+
+    @commands.command()
+    @commands.is_owner()
+    async def tweet(self, ctx: commands.Context, *, message: str) -> None:
+        """Tweets a message"""
+
+        length = len(message)
+
+        if length > 280:
+            await ctx.reply(
+                embed=Embed(
+                    title='Message too long',
+                    description=f'{length}/280 characters',
+                    color=Color.red(),
+                )
+            )
+            return
+
+        await confirm_buttons(
+            ctx,
+            "Are you sure you'd like to send this Tweet?",
+            TWEET_ACTION,
+            description=message,
+        )
+
+    async def send_tweet(
+        self, inter: MessageInteraction, payload: bytes
+    ) -> None:
+        # Tweeting can take longer than an interaction has to be answered
+        # in, and tweepy blocks, so the click is acknowledged first
+        await inter.create_response(type=ResponseType.DeferredUpdateMessage)
+
+        try:
+            status = await self.bot.loop.run_in_executor(
+                None,
+                twitter_api.update_status,
+                inter.message.embeds[0].description,
+            )
+        except TweepError as error:
+            await inter.message.edit(
+                content=None,
+                components=[],
+                embed=Embed(
+                    title='Failed to send the Tweet',
+                    description=str(error),
+                    color=Color.red(),
+                ),
+            )
+            return
+
+        await inter.message.edit(
+            content=f'https://twitter.com/{status.user.screen_name}/status/{status.id_str}',
+            components=[],
+            embed=None,
+        )
+
+
+def setup(bot: commands.Bot) -> None:
+    bot.add_cog(StaffCog(bot))
@@ -0,0 +1,124 @@
+"""Compares XP cooldown tracking with the ExpiringDict it replaced
+
+Replays a simulated two-minute flood of messages against a fake clock
+and counts how many of them are granted XP. "Ideal" is an exact check of
+every user's last grant. Run with `python tests/bench_cooldowns.py`.
+"""
+
+import tracemalloc
+from random import Random
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Callable, List, Tuple
+
+import expiringdict
+from expiringdict import ExpiringDict
+
+import conftest  # noqa: F401 - sets up the import path and settings
+from cooldowns import Cooldowns
+
+COOLDOWN = 12  # seconds
+FLOOD_LENGTH = 120  # seconds
+SCENARIOS = [(500, 50), (10_000, 500), (50_000, 2000)]  # users, msg/s
+
+Events = List[Tuple[float, int]]
+
+
+def flood(users: int, rate: int) -> Events:
+    random = Random(1)
+
+    return [
+        (i / rate, random.randrange(users))
+        for i in range(FLOOD_LENGTH * rate)
+    ]
+
+
+def ideal(events: Events) -> int:
+    granted_at = {}
+    grants = 0
+
+    for now, user in events:
+        if user in granted_at and now - granted_at[user] < COOLDOWN:
+            continue
+
+        granted_at[user] = now
+        grants += 1
+
+    return grants
+
+
+def replay(
+    events: Events, hit: Callable[[int], bool], clock: List[float]
+) -> Tuple[int, float]:
+    """Returns the XP grants and the time taken per message"""
+
+    grants = 0
+    start = perf_counter()
+
+    for clock[0], user in events:
+        if not hit(user):
+            grants += 1
+
+    return grants, (perf_counter() - start) / len(events)
+
+
+def expiring_dict(clock: List[float]) -> Callable[[int], bool]:
+    # The old cache, used as intended: check the cooldown, then start it
+    expiringdict.time = SimpleNamespace(time=lambda: clock[0])
+    cache = ExpiringDict(max_len=100, max_age_seconds=COOLDOWN)
+
+    def hit(user: int) -> bool:
+        if cache.get(user):
+            return True
+
+        cache[user] = True
+        return False
+
+    return hit
+
+
+def main() -> None:
+    print(
+        '{:<7} {:<6} {:<7} {:<7} {:<17}{}'.format(
+            'users', 'msg/s', 'msgs', 'ideal', 'ExpiringDict', 'Cooldowns'
+        )
+    )
+
+    for users, rate in SCENARIOS:
+        events = flood(users, rate)
+        clock = [0.0]
+        old_grants, old_time = replay(events, expiring_dict(clock), clock)
+        cooldowns = Cooldowns(COOLDOWN, clock=lambda: clock[0])
+        new_grants, new_time = replay(events, cooldowns.hit, clock)
+
+        print(
+            '{:<7} {:<6} {:<7} {:<7} {:<7} {:4.1f} us  {:<7} {:4.1f} us'
+            '  ({:,} live)'.format(
+                users,
+                rate,
+                len(events),
+                ideal(events),
+                old_grants,
+                old_time * 1e6,
+                new_grants,
+                new_time * 1e6,
+                len(cooldowns),
+            )
+        )
+
+    users = SCENARIOS[-1][0]
+    tracemalloc.start()
+    cooldowns = Cooldowns(COOLDOWN)
+
+    for user in range(users):
+        cooldowns.hit(user)
+
+    print(
+        '{:,} users on cooldown take {:.1f} MB'.format(
+            users, tracemalloc.get_traced_memory()[0] / 1e6
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
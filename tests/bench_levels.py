@@ -0,0 +1,47 @@
+"""Compares level lookups against counting up one level at a time
+
+Run with `python tests/bench_levels.py`.
+"""
+
+from random import Random
+from timeit import timeit
+
+import conftest  # noqa: F401 - sets up the import path and settings
+from database import _count_up_level, xp_to_level, xp_to_levels
+
+SAMPLE_SIZE = 1000
+REPEATS = 3
+
+
+def count_up(xp: int) -> int:
+    """How levels were computed before the threshold table"""
+
+    return _count_up_level(xp, 0)
+
+
+def main() -> None:
+    random = Random(0)
+
+    for magnitude in (10 ** 3, 10 ** 6, 10 ** 9):
+        values = [random.randrange(magnitude) for _ in range(SAMPLE_SIZE)]
+        assert [count_up(xp) for xp in values] == xp_to_levels(values)
+
+        timings = [
+            timeit(run, number=REPEATS) / REPEATS * 1000
+            for run in (
+                lambda: [count_up(xp) for xp in values],
+                lambda: [xp_to_level(xp) for xp in values],
+                lambda: xp_to_levels(values),
+            )
+        ]
+
+        print(
+            'xp < {:>13,}: count up {:8.2f} ms, table {:6.2f} ms, '
+            'batch {:6.2f} ms per {:,}'.format(
+                magnitude, *timings, SAMPLE_SIZE
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Measures topic index build, search and update times
+
+Builds an index of synthetic topics and times two-term queries whose
+first term matches exactly, as a prefix, or with a typo. Run with
+`python tests/bench_topic_search.py`.
+"""
+
+from itertools import islice
+from random import Random
+from statistics import median
+from time import perf_counter
+from typing import Dict, List
+
+from bson import ObjectId
+
+import conftest  # noqa: F401 - sets up the import path and settings
+from topics import TopicIndex
+
+TOPIC_COUNT = 30_000
+VOCABULARY_SIZE = 10_000
+QUERY_COUNT = 300
+RESULTS_READ = 100
+SYLLABLES = 'ka lo mi ne ra to su vi de an or el is un ba co'.split()
+
+
+def main() -> None:
+    random = Random(1)
+    words = sorted(
+        {
+            ''.join(random.choices(SYLLABLES, k=random.randint(2, 4)))
+            for _ in range(VOCABULARY_SIZE * 2)
+        }
+    )[:VOCABULARY_SIZE]
+    rows = [
+        (
+            ObjectId(),
+            'What is your favourite {}?'.format(
+                ' '.join(random.choices(words, k=random.randint(3, 9)))
+            ),
+        )
+        for _ in range(TOPIC_COUNT)
+    ]
+
+    index = TopicIndex()
+    start = perf_counter()
+    index.load(rows)
+    print(
+        'build: {:.0f} ms for {:,} topics, {:,} distinct words'.format(
+            (perf_counter() - start) * 1000, TOPIC_COUNT, len(words)
+        )
+    )
+
+    queries: Dict[str, List[str]] = {'exact': [], 'prefix': [], 'typo': []}
+
+    for kind, terms in queries.items():
+        while len(terms) < QUERY_COUNT // len(queries):
+            word = random.choice(words)
+
+            if kind == 'prefix':
+                word = word[: max(3, len(word) // 2)]
+            elif kind == 'typo':
+                if len(word) < 5:
+                    continue
+
+                i = random.randrange(len(word))
+                word = word[:i] + random.choice('xyzq') + word[i + 1 :]
+
+            terms.append(f'{word} {random.choice(words)}')
+
+    for kind, terms in queries.items():
+        timings = []
+
+        for query in terms:
+            start = perf_counter()
+            list(islice(index.ranked(query), RESULTS_READ))
+            timings.append((perf_counter() - start) * 1_000_000)
+
+        timings.sort()
+        print(
+            '{:<7} median {:.0f} us, p95 {:.0f} us'.format(
+                kind + ':', median(timings), timings[len(timings) * 95 // 100]
+            )
+        )
+
+    start = perf_counter()
+
+    for _ in range(1000):
+        index.add(ObjectId(), f'New topic {random.choice(words)}')
+
+    print('add: {:.1f} us per topic'.format((perf_counter() - start) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+from types import ModuleType
+
+from dynamic_yaml import load
+
+TESTS = Path(__file__).parent
+
+sys.path.insert(0, str(TESTS.parent))
+
+# The real config.yaml holds the bot's secrets and isn't checked in, so
+# the modules under test read placeholder settings instead
+config = ModuleType('config')
+
+with (TESTS / 'config.yaml').open() as f:
+    config.CONFIG = load(f)
+
+sys.modules['config'] = config
@@ -0,0 +1,56 @@
+from cooldowns import Cooldowns
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cooldowns_last_their_duration():
+    clock = Clock()
+    cooldowns = Cooldowns(10, clock=clock)
+
+    assert not cooldowns.hit('a')
+    assert 'a' in cooldowns
+
+    clock.now = 9.9
+    assert cooldowns.hit('a')
+
+    clock.now = 10
+    assert 'a' not in cooldowns
+    assert not cooldowns.hit('a')
+
+
+def test_hits_sweep_expired_cooldowns():
+    clock = Clock()
+    cooldowns = Cooldowns(10, clock=clock)
+
+    for key in range(100):
+        cooldowns.hit(key)
+
+    clock.now = 5
+    cooldowns.hit('late')
+
+    clock.now = 12
+    cooldowns.hit('new')
+
+    # Only cooldowns started in the last 10 seconds are still stored
+    assert list(cooldowns._expiry) == ['late', 'new']
+
+
+def test_memory_is_bounded_by_recent_activity():
+    clock = Clock()
+    cooldowns = Cooldowns(10, clock=clock)
+
+    # A thousand users each send one message, one every tenth of a second
+    for key in range(1000):
+        clock.now = key / 10
+        cooldowns.hit(key)
+        assert len(cooldowns._expiry) <= 100
+
+    clock.now = 1000
+    assert len(cooldowns) == 0
+    assert not cooldowns._expiry
@@ -0,0 +1,27 @@
+from random import Random
+
+from database import (
+    LEVEL_THRESHOLDS,
+    MAX_TABLE_LEVEL,
+    _count_up_level,
+    level_to_xp,
+    xp_to_level,
+    xp_to_levels,
+)
+
+
+def test_levels_match_counting_up():
+    random = Random(0)
+    values = [
+        0,
+        *(random.randrange(10 ** 9) for _ in range(1000)),
+        *(xp + offset for xp in LEVEL_THRESHOLDS[:50] for offset in (-1, 0)),
+        level_to_xp(MAX_TABLE_LEVEL) - 1,
+        # Past the end of the table, where levels are counted up again
+        level_to_xp(MAX_TABLE_LEVEL + 3) + 5,
+    ]
+    expected = [_count_up_level(xp, 0) for xp in values]
+
+    assert [xp_to_level(xp) for xp in values] == expected
+    assert xp_to_levels(values) == expected
+    assert expected[-1] == MAX_TABLE_LEVEL + 3
@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import repository
+from leaderboard import LEADERBOARD
+from repository import XP_ACCUMULATOR, XPAccumulator, delete_users
+
+
+@pytest.fixture(autouse=True)
+def accounts(monkeypatch):
+    """Stands in for the database, with every stored account at 100 XP"""
+
+    reads = []
+
+    async def get_user(user_id: int) -> SimpleNamespace:
+        reads.append(user_id)
+        return SimpleNamespace(xp=100)
+
+    monkeypatch.setattr(repository, 'get_user', get_user)
+    monkeypatch.setattr(LEADERBOARD, '_keys', [])
+    monkeypatch.setattr(LEADERBOARD, '_xp', {})
+
+    return reads
+
+
+def test_account_is_only_read_once(accounts):
+    accumulator = XPAccumulator(10)
+
+    async def run() -> list:
+        return [await accumulator.add(1, 1) for _ in range(3)]
+
+    assert asyncio.run(run()) == [(100, 101), (101, 102), (102, 103)]
+    assert accounts == [1]
+    assert accumulator.pending == {1: 3}
+    assert LEADERBOARD.xp(1) == 103
+
+
+def test_deleted_users_start_over_from_their_account(accounts, monkeypatch):
+    async def delete_many(*args) -> SimpleNamespace:
+        return SimpleNamespace(deleted_count=1)
+
+    monkeypatch.setattr(repository, 'run_sync', delete_many)
+    monkeypatch.setattr(XP_ACCUMULATOR, 'pending', {})
+
+    async def run() -> tuple:
+        await XP_ACCUMULATOR.add(1, 50)
+        await delete_users([1])
+
+        # Nothing is left to be written back for the deleted user
+        assert XP_ACCUMULATOR.pending == {}
+
+        return await XP_ACCUMULATOR.add(1, 1)
+
+    assert asyncio.run(run()) == (100, 101)
+    assert accounts == [1, 1]
+    assert XP_ACCUMULATOR.pending == {1: 1}
+
+
+def test_xp_never_goes_below_zero(accounts):
+    accumulator = XPAccumulator(10)
+
+    assert asyncio.run(accumulator.add(1, -999)) == (100, 0)
+    assert accumulator.pending == {1: -100}
+
+
+def test_cancelled_flush_keeps_increments_if_the_write_fails(monkeypatch):
+    accumulator = XPAccumulator(10)
+    accumulator.pending = {1: 5}
+
+    async def write(*args) -> None:
+        await asyncio.sleep(0.01)
+        raise ConnectionError('lost the connection mid-write')
+
+    monkeypatch.setattr(repository, 'run_sync', write)
+
+    async def run() -> None:
+        flush = asyncio.create_task(accumulator.flush())
+        await asyncio.sleep(0)
+        flush.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert accumulator.pending == {1: 5}
@@ -0,0 +1,147 @@
+import asyncio
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+import topics
+from topics import TopicIndex, TopicPool
+
+
+def test_topics_edited_during_a_search_are_skipped():
+    index = TopicIndex()
+    ids = [ObjectId() for _ in range(3)]
+    index.load(
+        [
+            (ids[0], 'Favourite pizza?'),
+            (ids[1], 'Best pizza topping?'),
+            (ids[2], 'Is pizza a sandwich, technically speaking?'),
+        ]
+    )
+    results = index.ranked('pizza')
+
+    assert next(results) == (ids[0], 'Favourite pizza?')
+
+    index.add(ids[1], 'Best pasta shape?')
+    index.remove(ids[2])
+
+    assert list(results) == []
+
+
+def search(index: TopicIndex, query: str) -> list:
+    return [content for _, content in index.ranked(query)]
+
+
+def test_exact_matches_rank_above_prefixes_and_typos():
+    index = TopicIndex()
+    index.load(
+        (ObjectId(), content)
+        for content in (
+            'Do you bake?',
+            'Which cakes have you tried?',
+            'Favourite kind of cake?',
+            'Tea or coffee?',
+        )
+    )
+
+    assert search(index, 'cake') == [
+        'Favourite kind of cake?',
+        'Which cakes have you tried?',
+        'Do you bake?',
+    ]
+
+
+def test_typos_are_one_edit_away():
+    index = TopicIndex()
+    index.load([(ObjectId(), 'Have you been to a pancake breakfast?')])
+
+    assert (
+        search(index, 'pancale')
+        == search(index, 'pancke')
+        == search(index, 'pancakke')
+        == search(index, 'pnacake')
+        != []
+    )
+    assert search(index, 'pxncakx') == []
+
+    # Deleting a letter from each leaves both as 'ancake', but they're two
+    # edits apart
+    assert search(index, 'ancakes') == []
+
+
+def test_rare_words_count_for_more():
+    index = TopicIndex()
+    index.load(
+        (ObjectId(), content)
+        for content in (
+            'What is your favourite movie?',
+            'What is your favourite song?',
+            'What is your favourite movie soundtrack?',
+            'Which movie made you cry?',
+        )
+    )
+
+    assert search(index, 'favourite soundtrack')[0] == (
+        'What is your favourite movie soundtrack?'
+    )
+    assert search(index, 'song favourite')[0] == (
+        'What is your favourite song?'
+    )
+
+
+def test_ties_go_to_shorter_topics():
+    index = TopicIndex()
+    index.load(
+        (ObjectId(), content)
+        for content in ('Cats or dogs, and why?', 'Cats or dogs?')
+    )
+
+    assert search(index, 'dogs') == ['Cats or dogs?', 'Cats or dogs, and why?']
+
+
+def fake_topics(monkeypatch, topic_ids: list) -> None:
+    """Serves the given topic IDs in place of the database"""
+
+    async def run_sync(func, *args):
+        if args:
+            return {
+                topic_id: SimpleNamespace(id=topic_id)
+                for topic_id in args[0]
+                if topic_id in topic_ids
+            }
+
+        return list(topic_ids)
+
+    monkeypatch.setattr(topics, 'run_sync', run_sync)
+
+
+def test_topics_added_before_the_first_load_are_not_the_whole_bag(
+    monkeypatch,
+):
+    stored = [ObjectId() for _ in range(5)]
+    fake_topics(monkeypatch, stored)
+    pool = TopicPool(prefetch_size=2)
+
+    added = ObjectId()
+    stored.append(added)
+    pool.add([added])
+
+    async def run() -> list:
+        return [(await pool.get()).id for _ in range(6)]
+
+    assert sorted(asyncio.run(run())) == sorted(stored)
+
+
+def test_reloads_skip_topics_that_are_still_ready(monkeypatch):
+    stored = [ObjectId() for _ in range(2)]
+    fake_topics(monkeypatch, stored)
+    pool = TopicPool(prefetch_size=4)
+
+    async def run() -> list:
+        # Serving one of the two topics leaves the bag empty, so the
+        # refill reloads every topic, one of which is still ready
+        await pool.get()
+        await pool._refill
+
+        return [document.id for document in pool._ready]
+
+    assert sorted(asyncio.run(run())) == sorted(stored)
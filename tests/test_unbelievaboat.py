@@ -0,0 +1,177 @@
+import asyncio
+import socket
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+from aiohttp import ClientConnectorError, web
+
+import unbelievaboat
+from unbelievaboat import UnbelievaBoatClient, UnbelievaBoatError, retry_after
+
+BALANCE = {'rank': '1', 'user_id': '2', 'cash': 30, 'bank': 0, 'total': 30}
+
+# A reply is a status and its headers, or HANG to outlast the timeout
+Reply = Optional[Tuple[int, Dict[str, str]]]
+HANG = None
+OK = (200, {})
+
+
+class StubServer:
+    """A local stand-in for the UnbelievaBoat API
+
+    It answers with the given replies in order, then with 200s, and
+    records the method of every request it receives.
+    """
+
+    def __init__(self, *replies: Reply):
+        self.replies = list(replies)
+        self.received: List[str] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(*self._runner.addresses[0])
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.received.append(request.method)
+        reply = self.replies.pop(0) if self.replies else OK
+
+        if reply is HANG:
+            await asyncio.sleep(1)
+            reply = OK
+
+        status, headers = reply
+
+        if status >= 400:
+            return web.Response(status=status, headers=headers)
+
+        return web.json_response(BALANCE, headers=headers)
+
+    async def __aenter__(self) -> 'StubServer':
+        app = web.Application()
+        app.router.add_route('*', '/{path:.*}', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', 0).start()
+
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(unbelievaboat, 'BACKOFF_BASE', 0)
+    monkeypatch.setattr(unbelievaboat, 'REQUEST_TIMEOUT', 0.2)
+
+
+async def send(url: str, method: str, times: int = 1) -> Dict[str, Any]:
+    client = UnbelievaBoatClient('token', 1, base_url=url)
+
+    try:
+        for _ in range(times):
+            if method == 'GET':
+                balance = await client.get_balance(2)
+            else:
+                balance = await client.add_balance(2, cash=20, reason='test')
+
+        return balance
+    finally:
+        await client.close()
+
+
+def attempts(method: str, *replies: Reply, fails: bool = False) -> List[str]:
+    """Sends one request to a stub server and returns what reached it"""
+
+    async def run() -> List[str]:
+        async with StubServer(*replies) as server:
+            if fails:
+                with pytest.raises(UnbelievaBoatError):
+                    await send(server.url, method)
+            else:
+                assert await send(server.url, method) == BALANCE
+
+        return server.received
+
+    return asyncio.run(run())
+
+
+def test_get_retries_server_errors():
+    assert attempts('GET', (500, {}), (503, {}), OK) == ['GET'] * 3
+
+
+def test_get_retries_timeouts():
+    assert attempts('GET', HANG, OK) == ['GET'] * 2
+
+
+def test_get_gives_up_after_max_retries():
+    received = attempts('GET', *[(500, {})] * 10, fails=True)
+
+    assert len(received) == unbelievaboat.MAX_RETRIES + 1
+
+
+def test_client_errors_are_not_retried():
+    assert attempts('GET', (404, {}), fails=True) == ['GET']
+
+
+def test_patch_is_not_retried_after_server_errors():
+    assert attempts('PATCH', (502, {}), fails=True) == ['PATCH']
+
+
+def test_patch_is_not_retried_after_timeouts():
+    assert attempts('PATCH', HANG, fails=True) == ['PATCH']
+
+
+def test_patch_waits_out_rate_limits():
+    assert attempts('PATCH', (429, {'Retry-After': '0.01'}), OK) == (
+        ['PATCH'] * 2
+    )
+
+
+def test_patch_survives_date_retry_after():
+    date = format_datetime(datetime.now(timezone.utc), usegmt=True)
+
+    assert attempts('PATCH', (429, {'Retry-After': date}), OK) == (
+        ['PATCH'] * 2
+    )
+
+
+def test_patch_retries_refused_connections():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    with pytest.raises(UnbelievaBoatError) as raised:
+        asyncio.run(send(f'http://127.0.0.1:{port}', 'PATCH'))
+
+    assert isinstance(raised.value.__cause__, ClientConnectorError)
+
+
+def test_balances_are_cached():
+    async def run() -> List[str]:
+        async with StubServer() as server:
+            await send(server.url, 'GET', times=2)
+
+        return server.received
+
+    assert asyncio.run(run()) == ['GET']
+
+
+def test_retry_after_seconds():
+    assert retry_after('2', 1) == 2
+    assert retry_after('-5', 1) == 0
+
+
+def test_retry_after_http_date():
+    date = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert 25 < retry_after(format_datetime(date, usegmt=True), 1) <= 30
+    assert retry_after('Wed, 21 Oct 2015 07:28:00 GMT', 1) == 0
+
+
+def test_retry_after_falls_back():
+    assert retry_after(None, 1.5) == 1.5
+    assert retry_after('soon', 1.5) == 1.5
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, List, Optional
+
+from aiohttp import ClientError
+
+from webhooks import QueuedMessage, WebhookDispatcher
+
+
+class FlakyWebhook:
+    """Fails to send its first message, then records the rest"""
+
+    def __init__(self, error: Exception):
+        self.error: Optional[Exception] = error
+        self.sent: List[Optional[str]] = []
+
+    async def send(self, content: Optional[str], **kwargs: Any) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+        self.sent.append(content)
+
+
+def test_worker_survives_send_errors():
+    async def run() -> List[Optional[str]]:
+        webhook = FlakyWebhook(ClientError('connection reset'))
+        queue = asyncio.Queue()
+        worker = asyncio.create_task(
+            WebhookDispatcher()._run(webhook, queue)
+        )
+
+        for content in ('lost', 'delivered'):
+            queue.put_nowait(QueuedMessage(content, [], {}, False))
+
+        await asyncio.wait_for(queue.join(), 1)
+        assert not worker.done()
+        worker.cancel()
+
+        return webhook.sent
+
+    assert asyncio.run(run()) == ['delivered']
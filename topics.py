@@ -0,0 +1,356 @@
+import re
+from asyncio import Lock, Task, create_task
+from bisect import bisect_left, insort
+from collections import defaultdict, deque
+from heapq import heapify, heappop
+from math import log
+from random import randrange, shuffle
+from typing import (
+    DefaultDict,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from bson import ObjectId
+
+from database import Topic
+from repository import run_sync
+
+# How many topic documents are kept loaded ahead of time
+PREFETCH_SIZE = 10
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# How much a query term counts for, depending on how it matched a word
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.6
+FUZZY_WEIGHT = 0.4
+
+# Short terms match too many words as prefixes or with a typo
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+MAX_PREFIX_MATCHES = 100
+
+
+class TopicPool:
+    """Serves random topics without repeats until every one has been shown
+
+    Topic IDs are kept in a shuffled bag that is drawn from until it
+    runs out and is then reloaded. Documents are fetched from the bag in
+    batches, and the next batch is loaded in the background before the
+    current one runs dry, so serving a topic normally costs no round
+    trips at all.
+    """
+
+    def __init__(self, prefetch_size: int = PREFETCH_SIZE):
+        self.prefetch_size = prefetch_size
+        self._bag: List[ObjectId] = []
+        self._ready: Deque[Topic] = deque()
+        self._lock = Lock()
+        self._refill: Optional[Task] = None
+
+    async def _fill(self) -> None:
+        async with self._lock:
+            if len(self._ready) >= self.prefetch_size:
+                return
+
+            if not self._bag:
+                # pylint: disable=no-member
+                topic_ids = await run_sync(
+                    lambda: list(Topic.objects.scalar('id'))
+                )
+
+                # Topics still waiting to be served would otherwise be
+                # shown twice in a row
+                ready = {document.id for document in self._ready}
+                self._bag = [
+                    topic_id for topic_id in topic_ids if topic_id not in ready
+                ]
+                shuffle(self._bag)
+
+            batch = self._bag[-self.prefetch_size :]
+            del self._bag[-self.prefetch_size :]
+
+            # pylint: disable=no-member
+            documents = await run_sync(Topic.objects.in_bulk, batch)
+
+            # Topics deleted since the bag was loaded are skipped
+            self._ready.extend(
+                documents[topic_id]
+                for topic_id in reversed(batch)
+                if topic_id in documents
+            )
+
+    async def get(self) -> Topic:
+        """Returns the next topic, raising IndexError if there are none"""
+
+        if not self._ready:
+            await self._fill()
+
+            while not self._ready and self._bag:
+                await self._fill()
+
+        document = self._ready.popleft()
+
+        if len(self._ready) <= self.prefetch_size // 2 and (
+            self._refill is None or self._refill.done()
+        ):
+            self._refill = create_task(self._fill())
+
+        return document
+
+    def add(self, topic_ids: Iterable[ObjectId]) -> None:
+        """Shuffles new topics into the bag that's currently being drawn
+
+        An empty bag, before the first load or once it runs out, is left
+        alone. The full load that refills it picks the new topics up.
+        """
+
+        if not self._bag:
+            return
+
+        for topic_id in topic_ids:
+            self._bag.insert(randrange(len(self._bag) + 1), topic_id)
+
+
+def tokenize(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def deletions(word: str) -> Set[str]:
+    """Returns the word along with every way to delete one letter from it"""
+
+    return {word, *(word[:i] + word[i + 1 :] for i in range(len(word)))}
+
+
+def one_edit_apart(term: str, word: str) -> bool:
+    """Returns whether one insertion, deletion, substitution or swap of
+    neighbouring letters turns the term into the word"""
+
+    if len(term) > len(word):
+        term, word = word, term
+
+    if len(word) - len(term) > 1:
+        return False
+
+    # Everything up to the first difference is shared
+    i = next(
+        (i for i, (a, b) in enumerate(zip(term, word)) if a != b), len(term)
+    )
+
+    if len(term) < len(word):
+        return term[i:] == word[i + 1 :]
+
+    # Either the differing letter was substituted, or it was swapped with
+    # the next one
+    return term[i + 1 :] == word[i + 1 :] or (
+        term[i] == word[i + 1]
+        and term[i + 1] == word[i]
+        and term[i + 2 :] == word[i + 2 :]
+    )
+
+
+class TopicIndex:
+    """An in-memory inverted index over topic content
+
+    Query terms match indexed words exactly, as a prefix, or with a
+    typo. Typos are found by looking up the term's single-letter
+    deletions in a table of every indexed word's deletions, which finds
+    words one insertion, deletion, substitution or swap of neighbouring
+    letters away without comparing the term against the whole
+    vocabulary. The table also turns up some words two edits away, so
+    every candidate is checked before it counts.
+
+    Topics are numbered internally, since hashing small ints is much
+    cheaper than hashing ObjectIds.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._numbers: Dict[ObjectId, int] = {}
+        self._topics: Dict[int, Tuple[ObjectId, str]] = {}
+        self._next_number = 0
+        self._postings: DefaultDict[str, Set[int]] = defaultdict(set)
+        self._deletions: DefaultDict[str, Set[str]] = defaultdict(set)
+        self._vocabulary: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._topics)
+
+    def load(self, rows: Iterable[Tuple[ObjectId, str]]) -> None:
+        for topic_id, content in rows:
+            self.add(topic_id, content)
+
+        self.loaded = True
+
+    def add(self, topic_id: ObjectId, content: str) -> None:
+        self.remove(topic_id)
+
+        number = self._next_number
+        self._next_number += 1
+        self._numbers[topic_id] = number
+        self._topics[number] = (topic_id, content)
+
+        for word in set(tokenize(content)):
+            if word not in self._postings:
+                insort(self._vocabulary, word)
+
+                for variant in deletions(word):
+                    self._deletions[variant].add(word)
+
+            self._postings[word].add(number)
+
+    def remove(self, topic_id: ObjectId) -> None:
+        number = self._numbers.pop(topic_id, None)
+
+        if number is None:
+            return
+
+        _, content = self._topics.pop(number)
+
+        for word in set(tokenize(content)):
+            postings = self._postings[word]
+            postings.discard(number)
+
+            if postings:
+                continue
+
+            del self._postings[word]
+            del self._vocabulary[bisect_left(self._vocabulary, word)]
+
+            for variant in deletions(word):
+                self._deletions[variant].discard(word)
+
+                if not self._deletions[variant]:
+                    del self._deletions[variant]
+
+    def _matches(self, term: str) -> Dict[str, float]:
+        """Returns every indexed word the term matches, with its weight"""
+
+        matches: Dict[str, float] = {}
+
+        if len(term) >= MIN_FUZZY_LENGTH:
+            for variant in deletions(term):
+                for word in self._deletions.get(variant, ()):
+                    if one_edit_apart(term, word):
+                        matches[word] = FUZZY_WEIGHT
+
+        if len(term) >= MIN_PREFIX_LENGTH:
+            start = bisect_left(self._vocabulary, term)
+
+            for word in self._vocabulary[start : start + MAX_PREFIX_MATCHES]:
+                if not word.startswith(term):
+                    break
+
+                matches[word] = PREFIX_WEIGHT
+
+        if term in self._postings:
+            matches[term] = EXACT_WEIGHT
+
+        return matches
+
+    def ranked(self, query: str) -> Iterator[Tuple[ObjectId, str]]:
+        """Yields matching `(topic_id, content)` pairs, best first
+
+        Matches are only put in order as they're taken, so reading the
+        first few of a broad query doesn't sort every match.
+        """
+
+        scores: DefaultDict[int, float] = defaultdict(float)
+        total = len(self._topics)
+
+        for term in set(tokenize(query)):
+            # Each topic only counts its best match for every term
+            best: Dict[int, float] = {}
+
+            for word, weight in self._matches(term).items():
+                postings = self._postings[word]
+                score = weight * log(1 + total / len(postings))
+
+                for number in postings:
+                    if score > best.get(number, 0):
+                        best[number] = score
+
+            for number, score in best.items():
+                scores[number] += score
+
+        by_score: DefaultDict[float, List[int]] = defaultdict(list)
+
+        for number, score in scores.items():
+            by_score[score].append(number)
+
+        heap = [-score for score in by_score]
+        heapify(heap)
+
+        while heap:
+            # Topics edited or removed while the results are being read,
+            # which can happen between any two of them, are skipped
+            tied = [
+                number
+                for number in by_score.pop(-heappop(heap))
+                if number in self._topics
+            ]
+
+            # Ties are broken in favour of shorter topics
+            tied.sort(key=lambda number: len(self._topics[number][1]))
+
+            for number in tied:
+                topic = self._topics.get(number)
+
+                if topic is not None:
+                    yield topic
+
+
+async def load_topic_index() -> None:
+    def fetch() -> List[Tuple[ObjectId, str]]:
+        # pylint: disable=protected-access
+        return [
+            (document['_id'], document.get('content') or '')
+            for document in Topic._get_collection().find({}, {'content': 1})
+        ]
+
+    TOPIC_INDEX.load(await run_sync(fetch))
+
+
+async def pending_photos(limit: int) -> List[Topic]:
+    """Returns the oldest topics whose photos are waiting for review
+
+    This walks the partial index of unapproved photos in ID order, so it
+    only ever reads the documents it returns.
+    """
+
+    # pylint: disable=no-member
+    return await run_sync(
+        lambda: list(
+            Topic.objects(thumbnail__exists=True, thumbnail_approved=False)
+            .order_by('id')
+            .limit(limit)
+        )
+    )
+
+
+async def review_photos(topic_ids: List[ObjectId], *, approve: bool) -> None:
+    """Approves or rejects the photos of several topics in one update"""
+
+    # pylint: disable=no-member
+    topics = Topic.objects(id__in=topic_ids)
+
+    if approve:
+        await run_sync(topics.update, set__thumbnail_approved=True)
+    else:
+        await run_sync(
+            topics.update,
+            unset__thumbnail=True,
+            unset__credit=True,
+            unset__thumbnail_approved=True,
+        )
+
+
+TOPIC_POOL = TopicPool()
+TOPIC_INDEX = TopicIndex()
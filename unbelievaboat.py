@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import monotonic
+from typing import Any, Dict, Optional, Tuple
+
+from aiohttp import (
+    ClientConnectorError,
+    ClientError,
+    ClientSession,
+    ClientTimeout,
+    TCPConnector,
+)
+
+from config import CONFIG
+
+API_URL = 'https://unbelievaboat.com/api/v1'
+
+MAX_CONNECTIONS = 10
+REQUEST_TIMEOUT = 10  # seconds
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # seconds, doubled after every attempt
+BALANCE_TTL = 30  # seconds
+MAX_CACHED_BALANCES = 1000
+
+# Only these are safe to repeat when it's unclear whether they went through
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD'})
+
+
+class UnbelievaBoatError(Exception):
+    """Raised when the UnbelievaBoat API fails or refuses a request."""
+
+
+def retry_after(value: Optional[str], default: float) -> float:
+    """Returns how many seconds a `Retry-After` header asks to wait
+
+    The header is either a number of seconds or an HTTP date. Anything
+    else falls back to `default`.
+    """
+
+    if value is None:
+        return default
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+class UnbelievaBoatClient:
+    """A pooled client for the UnbelievaBoat API
+
+    One session is kept for the lifetime of the bot so requests reuse
+    connections. GET requests are retried with exponential backoff after
+    connection errors, timeouts and 5xx responses. Other requests, like
+    the PATCH that pays a user, are only retried when they can't have
+    been applied: when no connection could be made or after a 429. 429
+    responses wait out `Retry-After`.
+    Balances are cached for a short time, since `!me` is often run
+    several times in a row.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        guild_id: int,
+        *,
+        base_url: str = API_URL,
+        balance_ttl: float = BALANCE_TTL,
+    ):
+        self.token = token
+        self.guild_id = guild_id
+        self.base_url = base_url
+        self.balance_ttl = balance_ttl
+        self._session: Optional[ClientSession] = None
+        self._balances: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=TCPConnector(limit=MAX_CONNECTIONS),
+                timeout=ClientTimeout(total=REQUEST_TIMEOUT),
+                headers={'Authorization': self.token},
+            )
+
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    async def request(
+        self, method: str, path: str, **kwargs: Any
+    ) -> Dict[str, Any]:
+        url = f'{self.base_url}{path}'
+
+        # A timeout, a dropped connection or a 5xx doesn't say whether the
+        # request was applied, so only idempotent ones are tried again
+        idempotent = method in IDEMPOTENT_METHODS
+        retried = (
+            (ClientError, asyncio.TimeoutError)
+            if idempotent
+            else ClientConnectorError
+        )
+
+        for attempt in range(MAX_RETRIES + 1):
+            delay = BACKOFF_BASE * 2 ** attempt
+
+            try:
+                async with self.session.request(
+                    method, url, **kwargs
+                ) as response:
+                    if response.status == 429:
+                        delay = retry_after(
+                            response.headers.get('Retry-After'), delay
+                        )
+                    elif response.status < 400:
+                        return await response.json()
+                    elif response.status < 500 or not idempotent:
+                        raise UnbelievaBoatError(
+                            f'{method} {path} returned {response.status}'
+                        )
+            except retried as error:
+                if attempt == MAX_RETRIES:
+                    raise UnbelievaBoatError(
+                        f'{method} {path} failed'
+                    ) from error
+            except (ClientError, asyncio.TimeoutError) as error:
+                raise UnbelievaBoatError(f'{method} {path} failed') from error
+
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(delay)
+
+        raise UnbelievaBoatError(f'{method} {path} kept failing')
+
+    async def get_balance(self, user_id: int) -> Dict[str, Any]:
+        cached = self._balances.get(user_id)
+
+        if cached is not None and monotonic() - cached[0] < self.balance_ttl:
+            return cached[1]
+
+        balance = await self.request(
+            'GET', f'/guilds/{self.guild_id}/users/{user_id}'
+        )
+        self._balances[user_id] = (monotonic(), balance)
+
+        # Drop expired balances so the cache doesn't grow with every user
+        if len(self._balances) > MAX_CACHED_BALANCES:
+            now = monotonic()
+            self._balances = {
+                key: value
+                for key, value in self._balances.items()
+                if now - value[0] < self.balance_ttl
+            }
+
+        return balance
+
+    async def add_balance(
+        self, user_id: int, *, cash: int = 0, bank: int = 0, reason: str
+    ) -> Dict[str, Any]:
+        balance = await self.request(
+            'PATCH',
+            f'/guilds/{self.guild_id}/users/{user_id}',
+            json={'cash': cash, 'bank': bank, 'reason': reason},
+        )
+        self._balances[user_id] = (monotonic(), balance)
+
+        return balance
+
+
+UNBELIEVABOAT = UnbelievaBoatClient(
+    CONFIG.secrets.unbelievaboat_auth, CONFIG.guild.id
+)
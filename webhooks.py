@@ -0,0 +1,169 @@
+import asyncio
+from collections import deque
+from sys import stderr
+from time import monotonic
+from traceback import print_exception
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+from aiohttp import ClientSession
+from discord import AsyncWebhookAdapter, Embed, Webhook
+
+# Discord allows five requests every two seconds per webhook
+RATE_LIMIT = 5
+RATE_PERIOD = 2  # seconds
+
+# How long a coalescible message waits for others to join it
+COALESCE_WINDOW = 1.5  # seconds
+MAX_EMBEDS = 10
+MAX_CONTENT_LENGTH = 2000
+
+# How long closing waits for queued messages to go out
+CLOSE_TIMEOUT = 10  # seconds
+
+
+class QueuedMessage(NamedTuple):
+    content: Optional[str]
+    embeds: List[Embed]
+    options: Dict[str, Any]
+    coalesce: bool
+
+    def can_merge(self, other: 'QueuedMessage') -> bool:
+        content = '\n'.join(filter(None, (self.content, other.content)))
+
+        return (
+            other.coalesce
+            and other.options == self.options
+            and len(self.embeds) + len(other.embeds) <= MAX_EMBEDS
+            and len(content) <= MAX_CONTENT_LENGTH
+        )
+
+    def merge(self, other: 'QueuedMessage') -> 'QueuedMessage':
+        return self._replace(
+            content='\n'.join(filter(None, (self.content, other.content)))
+            or None,
+            embeds=self.embeds + other.embeds,
+        )
+
+
+class WebhookDispatcher:
+    """Sends webhook messages through one session and a queue per webhook
+
+    Each webhook URL gets its own queue and worker, which keeps under the
+    webhook's rate limit locally instead of running into 429s. Messages
+    sent with `coalesce=True` wait briefly so that others sent to the
+    same webhook can be combined with them into a single message.
+    """
+
+    def __init__(self, coalesce_window: float = COALESCE_WINDOW):
+        self.coalesce_window = coalesce_window
+        self._session: Optional[ClientSession] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = ClientSession()
+
+        return self._session
+
+    def send(
+        self,
+        webhook_url: str,
+        content: Optional[str] = None,
+        *,
+        embed: Optional[Embed] = None,
+        embeds: Optional[List[Embed]] = None,
+        coalesce: bool = False,
+        **options: Any,
+    ) -> None:
+        """Queues a message to be sent through a webhook"""
+
+        if webhook_url not in self._queues:
+            webhook = Webhook.from_url(
+                webhook_url, adapter=AsyncWebhookAdapter(self.session)
+            )
+            self._queues[webhook_url] = asyncio.Queue()
+            self._workers[webhook_url] = asyncio.create_task(
+                self._run(webhook, self._queues[webhook_url])
+            )
+
+        self._queues[webhook_url].put_nowait(
+            QueuedMessage(
+                content,
+                [*(embeds or ()), *((embed,) if embed else ())],
+                options,
+                coalesce,
+            )
+        )
+
+    async def _run(self, webhook: Webhook, queue: asyncio.Queue) -> None:
+        sent_at: Deque[float] = deque(maxlen=RATE_LIMIT)
+        held: Optional[QueuedMessage] = None
+
+        while True:
+            message = held or await queue.get()
+            held = None
+            taken = 1
+
+            if message.coalesce:
+                deadline = monotonic() + self.coalesce_window
+
+                while True:
+                    try:
+                        other = await asyncio.wait_for(
+                            queue.get(), max(deadline - monotonic(), 0)
+                        )
+                    except asyncio.TimeoutError:
+                        break
+
+                    if not message.can_merge(other):
+                        held = other
+                        break
+
+                    message = message.merge(other)
+                    taken += 1
+
+            if len(sent_at) == RATE_LIMIT:
+                await asyncio.sleep(RATE_PERIOD - (monotonic() - sent_at[0]))
+
+            # Whatever goes wrong with one message, the worker carries on
+            # with the next, so the webhook's queue never stalls for good
+            try:
+                await webhook.send(
+                    message.content, embeds=message.embeds, **message.options
+                )
+            except Exception as error:
+                print_exception(
+                    type(error), error, error.__traceback__, file=stderr
+                )
+            finally:
+                sent_at.append(monotonic())
+
+                for _ in range(taken):
+                    queue.task_done()
+
+    async def close(self) -> None:
+        """Waits for queued messages to go out, then closes the session"""
+
+        queues = self._queues.values()
+
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in queues)),
+                CLOSE_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            pass
+
+        for worker in self._workers.values():
+            worker.cancel()
+
+        self._queues.clear()
+        self._workers.clear()
+
+        if self._session is not None:
+            await self._session.close()
+
+
+WEBHOOKS = WebhookDispatcher()
@@ -1,128 +1,301 @@
-from typing import Dict
-
-from discord import Color, Embed, Guild, Member, Message, Role
-from discord.ext.commands import Bot, Cog, Context, command, is_owner
-from expiringdict import ExpiringDict
-
-from config import CONFIG
-from database import User as DbUser
-from database import get_user, level_to_xp
-from utils import min_max_int, optional_mention
-
-
-class XPCog(Cog, name='XP and Leveling'):
-    def __init__(self, bot: Bot):
-        self.bot = bot
-        self.cooldowns = ExpiringDict(
-            max_len=100, max_age_seconds=CONFIG.xp.cooldown
-        )
-        self.rewards: Dict[int, Role] = {
-            int(level): role for level, role in CONFIG.xp.roles.items()
-        }
-
-    @Cog.listener()
-    async def on_message(self, message: Message) -> None:
-        if message.author.bot or message.guild is None:
-            return
-
-        if message.channel.id not in CONFIG.xp.channels:
-            return
-
-        user_id = message.author.id
-        account = get_user(user_id)
-
-        if self.cooldowns.get(user_id):
-            return
-
-        before_level = account.level
-        account.xp += 1
-        after_level = account.level
-
-        if after_level > before_level:
-            await self.level_up(message, after_level)
-
-        account.save()
-
-    async def level_up(self, message: Message, new_level: int) -> None:
-        account = get_user(message.author.id)
-
-        to_next = level_to_xp(new_level + 1) - account.xp
-        congrats = 'Congrats, you are now at level {:,}! You need {:,} more XP to reach the next level.'.format(
-            new_level, to_next
-        )
-
-        await self.add_level_roles(message.author, new_level, message.guild)
-
-        try:
-            await message.author.send(congrats)
-        except:
-            await message.reply(f'{message.author.mention} - {congrats}')
-
-    async def add_level_roles(
-        self, user: Member, new_level: int, guild: Guild
-    ) -> None:
-        get_role = lambda role_id: guild.get_role(role_id)
-
-        earned_rewards = [
-            get_role(role)
-            for level, role in self.rewards.items()
-            if new_level >= level
-        ]
-
-        await user.add_roles(*earned_rewards, reason='Level role update')
-
-    @command(name='addxp')
-    @is_owner()
-    async def add_xp(self, ctx: Context, user: Member, amount: int) -> None:
-        """Adds the specified amount of XP to a user"""
-
-        account = get_user(user.id)
-        account.xp += amount
-        account.save()
-
-        await ctx.message.add_reaction('✅')
-
-    @command(aliases=['lb', 'top'])
-    async def leaderboard(
-        self, ctx: Context, limit: min_max_int(1, 20) = 10
-    ) -> None:
-        """Retrieves the specified number of top users by XP"""
-
-        # pylint: disable=no-member
-
-        top_ten = DbUser.objects().order_by('-xp')[:limit]
-
-        lines = [
-            '__**`{}`**__ {} - **{:,}** ({:,} XP)'.format(
-                index,
-                optional_mention(account.id, ctx.guild),
-                account.level,
-                account.xp,
-            )
-            for index, account in enumerate(top_ten, start=1)
-        ]
-
-        await ctx.reply(
-            embed=Embed(
-                title='Top Ten XP Users',
-                description='\n'.join(lines),
-                color=Color.blurple(),
-            )
-        )
-
-    @command(name='fixalllevels')
-    @is_owner()
-    async def fix_all_levels(self, ctx: Context) -> None:
-        for index, user in enumerate(ctx.guild.members):
-            if user.bot:
-                continue
-
-            account = get_user(user.id)
-
-            if account is not None:
-                await self.add_level_roles(user, account.level, ctx.guild)
-                await ctx.send(f'{index}. {user}')
-
-
-def setup(bot: Bot) -> None:
-    bot.add_cog(XPCog(bot))
+from asyncio import Queue, gather, wait
+from math import ceil
+from sys import stderr
+from traceback import print_exception
+from typing import Dict, List, Tuple
+
+from discord import Color, Embed, Guild, Member, Message, Role
+from discord.ext import tasks
+from discord.ext.commands import Bot, Cog, Context, command, is_owner
+from pymongo.errors import PyMongoError
+
+from config import CONFIG
+from cooldowns import Cooldowns
+from database import User as DbUser
+from database import level_to_xp, xp_to_level, xp_to_levels
+from leaderboard import LEADERBOARD
+from pagination import LinePaginator
+from pipeline import PIPELINE, MessageContext
+from repository import (
+    XP_ACCUMULATOR,
+    all_xp,
+    count_users,
+    leaderboard_entry,
+    leaderboard_page,
+    load_leaderboard,
+    run_sync,
+)
+from utils import min_max_int, optional_mention
+
+LEADERBOARD_PAGE_SIZE = 10
+ROLE_SYNC_WORKERS = 4
+ROLE_SYNC_PROGRESS_INTERVAL = 5  # seconds
+
+
+def leaderboard_lines(
+    rows: List[Tuple[int, int]], guild: Guild, start: int = 1
+) -> List[str]:
+    levels = xp_to_levels(xp for _, xp in rows)
+
+    return [
+        '__**`{}`**__ {} - **{:,}** ({:,} XP)'.format(
+            index, optional_mention(user_id, guild), level, xp
+        )
+        for index, ((user_id, xp), level) in enumerate(
+            zip(rows, levels), start=start
+        )
+    ]
+
+
+class XPCog(Cog, name='XP and Leveling'):
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.cooldowns = Cooldowns(CONFIG.xp.cooldown)
+        self.rewards: Dict[int, int] = {
+            int(level): role for level, role in CONFIG.xp.roles.items()
+        }
+        self.flush_xp.start()
+        PIPELINE.register('xp', self.process_message)
+
+        if not LEADERBOARD.loaded:
+            self.bot.loop.create_task(load_leaderboard())
+
+    def cog_unload(self) -> None:
+        PIPELINE.unregister('xp')
+        self.flush_xp.cancel()
+
+        # Pending XP outlives the cog: a reloaded cog's loop writes it, and
+        # so does the bot when it closes
+
+    @tasks.loop(seconds=CONFIG.xp.flush_interval)
+    async def flush_xp(self) -> None:
+        try:
+            await XP_ACCUMULATOR.flush()
+        except PyMongoError as error:
+            print_exception(
+                type(error), error, error.__traceback__, file=stderr
+            )
+
+    async def process_message(self, context: MessageContext) -> None:
+        if context.is_bot or not context.is_xp_channel:
+            return
+
+        message = context.message
+        user_id = context.author.id
+
+        if self.cooldowns.hit(user_id):
+            return
+
+        before, after = await XP_ACCUMULATOR.add(user_id, 1)
+        after_level = xp_to_level(after)
+
+        if after_level > xp_to_level(before):
+            await self.level_up(message, after_level, after)
+
+        if XP_ACCUMULATOR.is_full:
+            self.bot.loop.create_task(self.flush_xp())
+
+    async def level_up(
+        self, message: Message, new_level: int, xp: int
+    ) -> None:
+        to_next = level_to_xp(new_level + 1) - xp
+        congrats = 'Congrats, you are now at level {:,}! You need {:,} more XP to reach the next level.'.format(
+            new_level, to_next
+        )
+
+        await self.add_level_roles(message.author, new_level, message.guild)
+
+        try:
+            await message.author.send(congrats)
+        except:
+            await message.reply(f'{message.author.mention} - {congrats}')
+
+    def missing_level_roles(
+        self, user: Member, level: int, guild: Guild
+    ) -> List[Role]:
+        """Returns the level roles a member has earned but doesn't have"""
+
+        current = {role.id for role in user.roles}
+
+        return [
+            guild.get_role(role_id)
+            for reward_level, role_id in self.rewards.items()
+            if level >= reward_level and role_id not in current
+        ]
+
+    async def add_level_roles(
+        self, user: Member, new_level: int, guild: Guild
+    ) -> None:
+        missing = self.missing_level_roles(user, new_level, guild)
+
+        if not missing:
+            return
+
+        # Adding roles atomically costs one request per role, while a
+        # non-atomic add is a single member edit
+        await user.add_roles(
+            *missing, reason='Level role update', atomic=len(missing) == 1
+        )
+
+    @command(name='addxp')
+    @is_owner()
+    async def add_xp(self, ctx: Context, user: Member, amount: int) -> None:
+        """Adds the specified amount of XP to a user"""
+
+        await XP_ACCUMULATOR.add(user.id, amount)
+
+        await ctx.message.add_reaction('✅')
+
+    @command(aliases=['lb', 'top'])
+    async def leaderboard(
+        self, ctx: Context, limit: min_max_int(1, 20) = 10
+    ) -> None:
+        """Retrieves the specified number of top users by XP"""
+
+        if LEADERBOARD.loaded:
+            top_ten = LEADERBOARD.top(limit)
+        else:
+            # pylint: disable=no-member
+            top_ten = await run_sync(
+                lambda: [
+                    (account.id, account.xp)
+                    for account in DbUser.objects()
+                    .order_by('-xp')
+                    .only('xp')[:limit]
+                ]
+            )
+
+        lines = leaderboard_lines(top_ten, ctx.guild)
+
+        await ctx.reply(
+            embed=Embed(
+                title='Top Ten XP Users',
+                description='\n'.join(lines),
+                color=Color.blurple(),
+            )
+        )
+
+    @command(name='fullleaderboard', aliases=['flb'])
+    async def full_leaderboard(self, ctx: Context) -> None:
+        """Browses the XP leaderboard of the whole server"""
+
+        user_count = await count_users()
+        page_count = max(ceil(user_count / LEADERBOARD_PAGE_SIZE), 1)
+
+        # Until the leaderboard is loaded, pages are read from the database,
+        # where the last row of a page is the keyset cursor of the next one
+        page_ends: Dict[int, Tuple[int, int]] = {}
+
+        async def fetch_page(page: int) -> List[str]:
+            start = page * LEADERBOARD_PAGE_SIZE
+
+            # Pages, ranks and the jump to the author's page must all come
+            # from the same data, and only the in-memory leaderboard has
+            # XP that hasn't been flushed yet
+            if LEADERBOARD.loaded:
+                rows = LEADERBOARD.top(LEADERBOARD_PAGE_SIZE, offset=start)
+                return leaderboard_lines(rows, ctx.guild, start + 1)
+
+            after = page_ends.get(page - 1)
+
+            if after is None and page > 0:
+                after = await leaderboard_entry(start - 1)
+
+            rows = await leaderboard_page(after, LEADERBOARD_PAGE_SIZE)
+
+            if rows:
+                page_ends[page] = rows[-1]
+
+            for stale in [p for p in page_ends if abs(p - page) > 1]:
+                del page_ends[stale]
+
+            return leaderboard_lines(rows, ctx.guild, start + 1)
+
+        rank = LEADERBOARD.rank(ctx.author.id)
+
+        await LinePaginator.paginate_lazily(
+            fetch_page,
+            page_count,
+            ctx,
+            Embed(title='XP Leaderboard', color=Color.blurple()),
+            empty=False,
+            footer_text=f'{user_count:,} users',
+            home_page=None
+            if rank is None
+            else (rank - 1) // LEADERBOARD_PAGE_SIZE,
+        )
+
+    @command(name='fixalllevels')
+    @is_owner()
+    async def fix_all_levels(self, ctx: Context) -> None:
+        """Gives every member the level roles they're missing"""
+
+        members = {
+            member.id: member
+            for member in ctx.guild.members
+            if not member.bot
+        }
+        rows = [row for row in await all_xp() if row[0] in members]
+        levels = xp_to_levels(xp for _, xp in rows)
+
+        # Only members whose roles actually differ cost an API call
+        queue: Queue = Queue()
+
+        for (user_id, _), level in zip(rows, levels):
+            if self.missing_level_roles(members[user_id], level, ctx.guild):
+                queue.put_nowait((members[user_id], level))
+
+        total = queue.qsize()
+        updated = 0
+        failed = 0
+
+        async def worker() -> None:
+            nonlocal updated, failed
+
+            while not queue.empty():
+                member, level = queue.get_nowait()
+
+                # One member failing mustn't stop the rest from being fixed
+                try:
+                    await self.add_level_roles(member, level, ctx.guild)
+                    updated += 1
+                except Exception as error:
+                    failed += 1
+                    print_exception(
+                        type(error), error, error.__traceback__, file=stderr
+                    )
+
+        def progress_embed(title: str) -> Embed:
+            description = 'Updated {:,}/{:,} members ({:,} checked)'.format(
+                updated, total, len(rows)
+            )
+
+            if failed:
+                description += '\n{:,} failed'.format(failed)
+
+            return Embed(
+                title=title,
+                description=description,
+                color=Color.blurple() if not failed else Color.red(),
+            )
+
+        progress = await ctx.reply(embed=progress_embed('Fixing levels...'))
+
+        # discord.py waits out rate limits itself; the pool size just keeps
+        # us from queueing hundreds of requests behind the same bucket
+        workers = gather(*(worker() for _ in range(ROLE_SYNC_WORKERS)))
+
+        while not workers.done():
+            await wait([workers], timeout=ROLE_SYNC_PROGRESS_INTERVAL)
+
+            if not workers.done():
+                await progress.edit(embed=progress_embed('Fixing levels...'))
+
+        await workers
+
+        title = 'Fixed all levels' if not failed else 'Some levels failed'
+        await progress.edit(embed=progress_embed(title))
+
+
+def setup(bot: Bot) -> None:
+    bot.add_cog(XPCog(bot))